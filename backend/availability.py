@@ -0,0 +1,259 @@
+# Archivo: backend/availability.py
+# Modelo de lectura desnormalizado de la disponibilidad de cada producto (SQLAlchemy Core).
+# productos_disponibilidad guarda, por producto, el `sucursales_info` listo para servir
+# (sucursal, precio, stock, disponible) más los totales, para que las lecturas del catálogo
+# no repitan el JOIN productos/productos_sucursales/sucursales en cada petición.
+#
+# Se actualiza en la misma transacción que cambia productos_sucursales:
+#   - app.py lo hace antes de cada commit para los cambios hechos con el ORM;
+#   - los servidores gRPC, al insertar productos.
+# Salvo en el checkout: inventory.py (descuentos, reservas, liberaciones y vencimientos) solo anota
+# los productos con defer_refresh, y app.py los recalcula después del commit en una transacción
+# corta propia. Así la transacción del pago no bloquea el documento del producto ni hace NOTIFY;
+# el documento puede ir unos milisegundos detrás del stock (y si el proceso cae entre medio,
+# `flask check-availability --repair` lo corrige).
+# `flask rebuild-availability` lo reconstruye completo y `flask check-availability` lo verifica.
+#
+# Cada recálculo se anuncia como cambio del catálogo (para invalidar la caché de búsqueda):
+# en session.info['catalog_changes'] y, en PostgreSQL, con NOTIFY en CATALOG_CHANNEL, que se
+# entrega a los demás procesos solo si la transacción confirma.
+import json
+from decimal import Decimal
+
+from sqlalchemy import (JSON, Column, DateTime, ForeignKey, Integer, MetaData, Numeric, Table,
+                        bindparam, delete, func, insert, select, update)
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection
+
+import log_config
+from catalog_queries import held_quantity, productos, productos_sucursales, sucursales
+
+log = log_config.get_logger('availability')
+
+# Mismo esquema que el modelo ProductoDisponibilidad de app.py (ver migrations/0007_productos_disponibilidad.sql)
+productos_disponibilidad = Table(
+    'productos_disponibilidad', MetaData(),
+    Column('producto_id', Integer, ForeignKey(productos.c.id, ondelete='CASCADE'), primary_key=True),
+    Column('sucursales', JSON, nullable=False), # [{sucursal_id, nombre, precio, stock, disponible}]
+    Column('stock_total', Integer, nullable=False),
+    Column('disponible_total', Integer, nullable=False),
+    Column('precio_min', Numeric(10, 2), nullable=True), # NULL si el producto no está en ninguna sucursal
+    Column('updated_at', DateTime, server_default=func.current_timestamp(),
+           onupdate=func.current_timestamp()),
+)
+
+DOCUMENT_FIELDS = ('sucursales', 'stock_total', 'disponible_total', 'precio_min')
+CATALOG_CHANNEL = 'ferremas_catalog'
+MAX_NOTIFY_PAYLOAD = 7900 # NOTIFY admite hasta 8000 bytes
+
+
+def _dialect_name(conn):
+    return conn.dialect.name if isinstance(conn, Connection) else conn.get_bind().dialect.name
+
+
+def source_rows_stmt(ids):
+    # Filas de origen de los documentos; un producto sin sucursales trae una fila con sucursal NULL
+    joined = (productos
+              .outerjoin(productos_sucursales, productos_sucursales.c.producto_id == productos.c.id)
+              .outerjoin(sucursales, sucursales.c.id == productos_sucursales.c.sucursal_id))
+    return (select(productos.c.id.label('producto_id'), productos_sucursales.c.sucursal_id,
+                   sucursales.c.nombre.label('sucursal_nombre'), productos_sucursales.c.precio,
+                   productos_sucursales.c.stock, held_quantity().label('reservado'))
+            .select_from(joined)
+            .where(productos.c.id.in_(list(ids)))
+            .order_by(productos.c.id, productos_sucursales.c.sucursal_id))
+
+
+def build_documents(rows):
+    # Filas de source_rows_stmt -> {producto_id: documento}
+    documents = {}
+    for row in rows:
+        document = documents.setdefault(row.producto_id, {
+            'sucursales': [], 'stock_total': 0, 'disponible_total': 0, 'precio_min': None,
+        })
+        if row.sucursal_id is None or row.sucursal_nombre is None:
+            continue
+        disponible = row.stock - (row.reservado or 0)
+        document['sucursales'].append({
+            'sucursal_id': row.sucursal_id,
+            'nombre': row.sucursal_nombre,
+            'precio': float(row.precio),
+            'stock': row.stock,
+            'disponible': disponible,
+        })
+        document['stock_total'] += row.stock
+        document['disponible_total'] += disponible
+        precio = Decimal(row.precio)
+        if document['precio_min'] is None or precio < document['precio_min']:
+            document['precio_min'] = precio
+    return documents
+
+
+def compute_documents(conn, ids):
+    # Documentos calculados desde las tablas de origen (sin leer el modelo de lectura)
+    if not ids:
+        return {}
+    return build_documents(conn.execute(source_rows_stmt(sorted(ids))))
+
+
+def _insert_missing(conn, ids):
+    # Crea las filas que falten para poder bloquearlas y devuelve sus ids (productos nuevos);
+    # en PostgreSQL una inserción concurrente del mismo producto espera a que la otra confirme.
+    dialect = _dialect_name(conn)
+    values = [{'producto_id': producto_id, 'sucursales': [], 'stock_total': 0, 'disponible_total': 0}
+              for producto_id in ids]
+    if dialect in ('postgresql', 'sqlite'):
+        dialect_insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        return conn.execute(dialect_insert(productos_disponibilidad)
+                            .on_conflict_do_nothing(index_elements=['producto_id'])
+                            .returning(productos_disponibilidad.c.producto_id), values).scalars().all()
+    present = set(conn.execute(select(productos_disponibilidad.c.producto_id)
+                               .where(productos_disponibilidad.c.producto_id.in_(ids))).scalars())
+    missing = [value for value in values if value['producto_id'] not in present]
+    if missing:
+        conn.execute(insert(productos_disponibilidad), missing)
+    return [value['producto_id'] for value in missing]
+
+
+def announce_changes(conn, ids, new_ids=()):
+    # `new` lleva el texto buscable de los productos sin documento previo, para que cada
+    # proceso invalide las búsquedas que ahora los encontrarían
+    new = {}
+    if new_ids:
+        rows = conn.execute(select(productos.c.id, productos.c.nombre, productos.c.marca, productos.c.description)
+                            .where(productos.c.id.in_(list(new_ids))))
+        new = {row.id: ' '.join(filter(None, (row.nombre, row.marca, row.description))) for row in rows}
+    changes = {'ids': list(ids), 'new': new}
+    if not isinstance(conn, Connection): # Session (o scoped_session): lo consumen sus hooks de commit
+        conn.info.setdefault('catalog_changes', []).append(changes)
+    if _dialect_name(conn) == 'postgresql':
+        payload = json.dumps(changes)
+        if len(payload.encode('utf-8')) > MAX_NOTIFY_PAYLOAD:
+            payload = json.dumps({'all': True})
+        conn.execute(select(func.pg_notify(CATALOG_CHANNEL, payload)))
+    return changes
+
+
+def refresh_products(conn, ids):
+    # Recalcula los documentos de `ids` dentro de la transacción de `conn` (Session o Connection).
+    # Se bloquea primero la fila del documento (en orden de id): dos transacciones que cambian
+    # sucursales distintas del mismo producto se serializan aquí, y la segunda recalcula viendo
+    # lo que confirmó la primera, de modo que ninguna pisa el documento con datos viejos.
+    ids = sorted({int(producto_id) for producto_id in ids})
+    if not ids:
+        return 0
+    present = sorted(conn.execute(select(productos.c.id).where(productos.c.id.in_(ids))).scalars())
+    gone = sorted(set(ids) - set(present))
+    if gone:
+        conn.execute(delete(productos_disponibilidad).where(productos_disponibilidad.c.producto_id.in_(gone)))
+    if not present:
+        announce_changes(conn, gone)
+        return 0
+    new_ids = _insert_missing(conn, present)
+    conn.execute(select(productos_disponibilidad.c.producto_id)
+                 .where(productos_disponibilidad.c.producto_id.in_(present))
+                 .order_by(productos_disponibilidad.c.producto_id)
+                 .with_for_update()).all()
+    documents = compute_documents(conn, present)
+    if documents:
+        conn.execute(
+            update(productos_disponibilidad)
+            .where(productos_disponibilidad.c.producto_id == bindparam('doc_producto_id'))
+            .values(**{field: bindparam(f'doc_{field}', type_=productos_disponibilidad.c[field].type)
+                         for field in DOCUMENT_FIELDS},
+                    updated_at=func.current_timestamp()),
+            [{'doc_producto_id': producto_id, **{f'doc_{field}': value for field, value in document.items()}}
+             for producto_id, document in documents.items()]
+        )
+    announce_changes(conn, ids, new_ids)
+    return len(documents)
+
+
+def defer_refresh(session, ids):
+    # Anota los productos cuyo documento se recalcula después del commit de `session` (ver app.py)
+    session.info.setdefault('availability_deferred', set()).update(int(producto_id) for producto_id in ids)
+
+
+def refresh_sucursales(conn, sucursal_ids):
+    # Un cambio en la sucursal (p. ej. su nombre) afecta a todos los productos que tiene
+    ids = conn.execute(select(productos_sucursales.c.producto_id).distinct()
+                       .where(productos_sucursales.c.sucursal_id.in_(list(sucursal_ids)))).scalars().all()
+    return refresh_products(conn, ids)
+
+
+def load_documents(conn, ids):
+    # {producto_id: documento} del modelo de lectura; los ids sin documento no aparecen
+    if not ids:
+        return {}
+    rows = conn.execute(select(productos_disponibilidad.c.producto_id,
+                               *(productos_disponibilidad.c[field] for field in DOCUMENT_FIELDS))
+                        .where(productos_disponibilidad.c.producto_id.in_(list(ids))))
+    return {row.producto_id: {field: getattr(row, field) for field in DOCUMENT_FIELDS} for row in rows}
+
+
+def _product_id_batches(conn, batch_size):
+    last_id = 0
+    while True:
+        ids = conn.execute(select(productos.c.id).where(productos.c.id > last_id)
+                           .order_by(productos.c.id).limit(batch_size)).scalars().all()
+        if not ids:
+            return
+        yield ids
+        last_id = ids[-1]
+
+
+def rebuild_all(session, batch_size=500):
+    # Reconstrucción completa por lotes de productos (un commit por lote) y limpieza de huérfanos
+    total = 0
+    for ids in _product_id_batches(session, batch_size):
+        total += refresh_products(session, ids)
+        session.commit()
+    session.execute(delete(productos_disponibilidad).where(
+        productos_disponibilidad.c.producto_id.not_in(select(productos.c.id))))
+    session.commit()
+    return total
+
+
+def _same_document(stored, expected):
+    if stored is None:
+        return False
+    if stored['stock_total'] != expected['stock_total'] or stored['disponible_total'] != expected['disponible_total']:
+        return False
+    if (stored['precio_min'] is None) != (expected['precio_min'] is None):
+        return False
+    if stored['precio_min'] is not None and Decimal(stored['precio_min']) != expected['precio_min']:
+        return False
+    return stored['sucursales'] == expected['sucursales']
+
+
+def check_consistency(conn, batch_size=500):
+    # Compara el modelo de lectura con las tablas de origen. Devuelve
+    # {'checked': n, 'missing': [ids], 'stale': [ids], 'orphaned': [ids]}.
+    report = {'checked': 0, 'missing': [], 'stale': [], 'orphaned': []}
+    for ids in _product_id_batches(conn, batch_size):
+        expected = compute_documents(conn, ids)
+        stored = load_documents(conn, ids)
+        for producto_id in ids:
+            report['checked'] += 1
+            if producto_id not in stored:
+                report['missing'].append(producto_id)
+            elif not _same_document(stored[producto_id], expected[producto_id]):
+                report['stale'].append(producto_id)
+    report['orphaned'] = conn.execute(
+        select(productos_disponibilidad.c.producto_id)
+        .where(productos_disponibilidad.c.producto_id.not_in(select(productos.c.id)))
+        .order_by(productos_disponibilidad.c.producto_id)).scalars().all()
+    return report
+
+
+def documents_or_live(conn, ids):
+    # Para servir: documentos guardados y, si alguno falta (p. ej. antes del primer
+    # rebuild-availability), calculados al vuelo sin escribir.
+    documents = load_documents(conn, ids)
+    missing = [producto_id for producto_id in ids if producto_id not in documents]
+    if missing:
+        # Se repite en cada petición hasta reconstruir: se muestrea para no inundar el log
+        log.warning("%d producto(s) sin documento; se calculan al vuelo. Ejecute `flask rebuild-availability`.",
+                    len(missing), extra=log_config.sampled(0.1))
+        documents.update(compute_documents(conn, missing))
+    return documents
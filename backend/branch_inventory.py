@@ -0,0 +1,107 @@
+# Archivo: backend/branch_inventory.py
+# Inventario de una sucursal (GET /api/sucursales/<id>/inventario) con paginación por cursor
+# (keyset) sobre (columna de orden, producto_id). Cada orden tiene su índice compuesto que
+# empieza por sucursal_id (ver migrations/0008_indices_inventario.sql), de modo que una página
+# es un recorrido de rango sobre el índice y no un escaneo de productos_sucursales completo.
+# benchmarks/query_plans.py verifica con EXPLAIN que estas consultas usan esos índices.
+import base64
+import json
+from decimal import Decimal
+
+from sqlalchemy import select, tuple_
+
+from catalog_queries import held_quantity, productos, productos_sucursales
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+# ?sort= -> columna de productos_sucursales
+SORT_COLUMNS = {
+    'producto': productos_sucursales.c.producto_id,
+    'stock': productos_sucursales.c.stock,
+    'precio': productos_sucursales.c.precio,
+}
+
+
+def parse_params(args, low_stock_threshold):
+    # request.args -> parámetros de inventory_page_stmt; ValueError si no son válidos
+    sort = args.get('sort', 'producto')
+    if sort not in SORT_COLUMNS:
+        raise ValueError(f"sort debe ser uno de: {', '.join(SORT_COLUMNS)}")
+    order = args.get('order', 'asc')
+    if order not in ('asc', 'desc'):
+        raise ValueError("order debe ser 'asc' o 'desc'")
+    limit = int(args.get('limit', DEFAULT_LIMIT))
+    if limit <= 0:
+        raise ValueError("limit debe ser mayor que 0")
+    max_stock = args.get('max_stock')
+    max_stock = int(max_stock) if max_stock is not None else None
+    if args.get('bajo_stock', '').lower() in ('1', 'true', 'si', 'sí'):
+        max_stock = low_stock_threshold if max_stock is None else min(max_stock, low_stock_threshold)
+    cursor = args.get('cursor')
+    return {
+        'sort': sort,
+        'descending': order == 'desc',
+        'limit': min(limit, MAX_LIMIT),
+        'max_stock': max_stock,
+        'after': decode_cursor(cursor, sort) if cursor else None,
+    }
+
+
+# --- Cursor: (valor de la columna de orden, producto_id) del último elemento, opaco para el cliente ---
+def encode_cursor(sort, value, producto_id):
+    # El precio viaja como texto para no perder decimales
+    raw = json.dumps({'o': sort, 'v': str(value) if sort == 'precio' else value, 'id': producto_id},
+                     separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, sort):
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if data['o'] != sort:
+            raise ValueError("el cursor corresponde a otro orden")
+        value = Decimal(data['v']) if sort == 'precio' else int(data['v'])
+        return value, int(data['id'])
+    except (KeyError, TypeError, ArithmeticError, ValueError) as e:
+        raise ValueError(f"Cursor inválido: {e}")
+
+
+def inventory_page_stmt(sucursal_id, sort='producto', descending=False, limit=DEFAULT_LIMIT,
+                        max_stock=None, after=None):
+    # Pide limit + 1 filas para saber si existe una página siguiente
+    column = SORT_COLUMNS[sort]
+    keys = (column,) if sort == 'producto' else (column, productos_sucursales.c.producto_id)
+    stmt = (select(productos_sucursales.c.producto_id, productos.c.nombre, productos.c.marca,
+                   productos_sucursales.c.precio, productos_sucursales.c.stock,
+                   held_quantity().label('reservado'))
+            .join(productos, productos.c.id == productos_sucursales.c.producto_id)
+            .where(productos_sucursales.c.sucursal_id == sucursal_id))
+    if max_stock is not None:
+        stmt = stmt.where(productos_sucursales.c.stock <= max_stock)
+    if after is not None:
+        position = after[1:] if sort == 'producto' else after
+        current = tuple_(*keys) if len(keys) > 1 else keys[0]
+        bound = tuple_(*position) if len(keys) > 1 else position[0]
+        stmt = stmt.where(current < bound if descending else current > bound)
+    return stmt.order_by(*(key.desc() if descending else key.asc() for key in keys)).limit(limit + 1)
+
+
+def page_from_rows(rows, sort, limit):
+    # Devuelve (items, next_cursor)
+    rows = list(rows)
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        value = last.producto_id if sort == 'producto' else getattr(last, sort)
+        next_cursor = encode_cursor(sort, value, last.producto_id)
+    items = [{
+        'producto_id': row.producto_id,
+        'nombre': row.nombre,
+        'marca': row.marca,
+        'precio': float(row.precio),
+        'stock': row.stock,
+        'reservado': row.reservado,
+        'disponible': row.stock - row.reservado,
+    } for row in rows]
+    return items, next_cursor
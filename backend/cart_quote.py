@@ -0,0 +1,157 @@
+# Archivo: backend/cart_quote.py
+# Cotización de un carro en el servidor: precio unitario por sucursal, disponible y total,
+# resueltos con una sola consulta a productos_sucursales para todas las líneas.
+# La usan /api/cart/quote y la creación de la orden (/api/webpay/create), de modo que el
+# monto cobrado nunca sale de los precios que envía el navegador.
+import threading
+import time
+from decimal import Decimal
+
+from sqlalchemy import select, tuple_
+
+import inventory
+from catalog_queries import held_quantity, productos, productos_sucursales, sucursales
+
+MAX_CART_LINES = 200
+CURRENCY = 'CLP'
+
+
+def parse_cart_items(items):
+    # [{'product_id', 'sucursal_id', 'quantity'}] -> [(producto_id, sucursal_id, cantidad)]; ValueError si no es válido
+    if not isinstance(items, list) or not items:
+        raise ValueError("cart_items debe ser una lista no vacía.")
+    if len(items) > MAX_CART_LINES:
+        raise ValueError(f"El carro admite como máximo {MAX_CART_LINES} líneas.")
+    lines = []
+    for position, item in enumerate(items):
+        try:
+            producto_id = int(item['product_id'])
+            sucursal_id = int(item['sucursal_id'])
+            quantity = int(item['quantity'])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f"Línea {position}: se requieren product_id, sucursal_id y quantity enteros.")
+        if quantity <= 0:
+            raise ValueError(f"Línea {position}: la cantidad debe ser mayor que cero.")
+        lines.append((producto_id, sucursal_id, quantity))
+    return lines
+
+
+def branch_rows_stmt(keys):
+    return (select(productos_sucursales.c.producto_id, productos_sucursales.c.sucursal_id,
+                   productos_sucursales.c.precio, productos_sucursales.c.stock,
+                   held_quantity().label('reservado'),
+                   productos.c.nombre.label('producto_nombre'),
+                   sucursales.c.nombre.label('sucursal_nombre'))
+            .join(productos, productos.c.id == productos_sucursales.c.producto_id)
+            .join(sucursales, sucursales.c.id == productos_sucursales.c.sucursal_id)
+            .where(tuple_(productos_sucursales.c.producto_id, productos_sucursales.c.sucursal_id).in_(list(keys))))
+
+
+def _row_values(row):
+    return {
+        'precio': row.precio,
+        'disponible': row.stock - row.reservado,
+        'producto_nombre': row.producto_nombre,
+        'sucursal_nombre': row.sucursal_nombre,
+    }
+
+
+class BranchRowCache:
+    # Caché en memoria de precio/disponible por (producto, sucursal) con vencimiento corto.
+    # Solo para cotizar: la creación de la orden consulta siempre la base al reservar.
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._rows = {}
+
+    def get_many(self, keys):
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._rows.get(key)
+                if entry and entry[0] > now:
+                    found[key] = entry[1]
+        return found
+
+    def put_many(self, rows):
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            for key, values in rows.items():
+                self._rows[key] = (expires, values)
+
+    def clear(self):
+        with self._lock:
+            self._rows.clear()
+
+
+def load_branch_rows(session, keys, cache=None):
+    keys = set(keys)
+    rows = cache.get_many(keys) if cache else {}
+    pending = keys - set(rows)
+    if pending:
+        loaded = {(row.producto_id, row.sucursal_id): _row_values(row)
+                  for row in session.execute(branch_rows_stmt(sorted(pending)))}
+        if cache:
+            cache.put_many(loaded)
+        rows.update(loaded)
+    return rows
+
+
+def quote_cart(session, lines, cache=None):
+    # Devuelve las líneas en el orden recibido; el disponible se compara con la cantidad
+    # total pedida de cada (producto, sucursal), aunque venga repartida en varias líneas.
+    requested = inventory.aggregate_lines(lines)
+    rows = load_branch_rows(session, requested, cache)
+    quote_lines = []
+    total = Decimal('0')
+    for producto_id, sucursal_id, quantity in lines:
+        key = (producto_id, sucursal_id)
+        row = rows.get(key)
+        line = {'product_id': producto_id, 'sucursal_id': sucursal_id, 'quantity': quantity}
+        if row is None:
+            line.update(ok=False, error='Producto no disponible en esta sucursal.')
+            quote_lines.append(line)
+            continue
+        subtotal = row['precio'] * quantity
+        total += subtotal
+        line.update(
+            product_name=row['producto_nombre'],
+            sucursal_name=row['sucursal_nombre'],
+            unit_price=row['precio'],
+            subtotal=subtotal,
+            available=row['disponible'],
+            ok=row['disponible'] >= requested[key],
+        )
+        if not line['ok']:
+            line['error'] = 'Stock insuficiente.'
+        quote_lines.append(line)
+    return {
+        'lines': quote_lines,
+        'total': total,
+        'currency': CURRENCY,
+        'ok': all(line['ok'] for line in quote_lines),
+    }
+
+
+def quote_to_json(quote, converter=None):
+    # Decimal -> float para jsonify (mismo criterio que los to_dict de los modelos).
+    # Con converter (currency.Converter) agrega 'converted': los mismos montos en esa moneda,
+    # calculados desde los Decimal de la cotización y no desde los float ya redondeados.
+    lines = []
+    for line in quote['lines']:
+        line = dict(line)
+        for field in ('unit_price', 'subtotal'):
+            if field in line:
+                line[field] = float(line[field])
+        lines.append(line)
+    data = {**quote, 'lines': lines, 'total': float(quote['total'])}
+    if converter is not None:
+        data['converted'] = {
+            'currency': converter.code,
+            'rate': str(converter.rate),
+            'total': float(converter.convert(quote['total'])),
+            'lines': [{field: float(converter.convert(line[field])) for field in ('unit_price', 'subtotal') if field in line}
+                      for line in quote['lines']],
+        }
+    return data
@@ -0,0 +1,423 @@
+# Archivo: backend/catalog_import.py
+# Importación masiva de catálogos de proveedores (productos) y de stock por sucursal
+# (inventario) desde CSV o JSONL, en memoria constante: el archivo se lee como stream y se
+# procesa por lotes de `batch_size` filas, cada lote en su propia transacción.
+#
+#   productos:  nombre, marca, description, price           (clave: nombre, único en productos)
+#   inventario: producto_id | nombre, sucursal_id, precio, stock   (clave: producto, sucursal)
+#
+# En PostgreSQL cada lote se carga con COPY en una tabla temporal de staging y se fusiona
+# con UPDATE ... FROM / INSERT ... ON CONFLICT. En otros motores (SQLite en pruebas) se usa
+# el camino genérico: SELECT de las claves del lote y UPDATE/INSERT con executemany.
+# Las filas inválidas se rechazan con su número de línea sin detener la importación.
+import csv
+import io
+import json
+import time
+from decimal import Decimal, InvalidOperation
+
+from sqlalchemy import bindparam, insert, select, text, tuple_, update
+from sqlalchemy.exc import SQLAlchemyError
+
+import availability
+import log_config
+from catalog_queries import productos, productos_sucursales, sucursales
+
+log = log_config.get_logger('import')
+
+KINDS = ('productos', 'inventario')
+FORMATS = ('csv', 'jsonl')
+DEFAULT_BATCH_SIZE = 5000
+MAX_REPORTED_REJECTS = 1000 # el conteo de rechazos es completo; el detalle se recorta
+MAX_PRICE = Decimal('99999999.99') # Numeric(10, 2)
+CENTS = Decimal('0.01')
+
+
+# --- Lectura en stream ---
+def detect_format(content_type, filename=None):
+    # 'csv' | 'jsonl' según Content-Type o extensión; None si no se puede deducir
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    if content_type in ('text/csv', 'application/csv'):
+        return 'csv'
+    if content_type in ('application/x-ndjson', 'application/jsonl', 'application/x-jsonlines'):
+        return 'jsonl'
+    if filename:
+        extension = filename.rsplit('.', 1)[-1].lower()
+        if extension == 'csv':
+            return 'csv'
+        if extension in ('jsonl', 'ndjson'):
+            return 'jsonl'
+    return None
+
+
+def read_rows(stream, fmt):
+    # Genera (línea, dict | None, error | None) desde un stream binario o de texto
+    if not isinstance(stream, io.TextIOBase):
+        stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for raw in reader:
+            if None in raw:
+                yield reader.line_num, None, "La fila tiene más columnas que el encabezado."
+                continue
+            yield reader.line_num, raw, None
+        return
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            raw = json.loads(line)
+        except ValueError as e:
+            yield line_number, None, f"JSON inválido: {e}"
+            continue
+        if not isinstance(raw, dict):
+            yield line_number, None, "Cada línea debe ser un objeto JSON."
+            continue
+        yield line_number, raw, None
+
+
+# --- Validación ---
+def _text(raw, field, max_length, required=False):
+    value = raw.get(field)
+    value = str(value).strip() if value is not None else ''
+    if not value:
+        if required:
+            raise ValueError(f"{field} es obligatorio")
+        return None
+    if len(value) > max_length:
+        raise ValueError(f"{field} supera {max_length} caracteres")
+    return value
+
+
+def _price(raw, field):
+    try:
+        value = Decimal(str(raw.get(field)).strip()).quantize(CENTS)
+    except (InvalidOperation, ValueError):
+        raise ValueError(f"{field} debe ser un número")
+    if not value.is_finite() or value <= 0 or value > MAX_PRICE:
+        raise ValueError(f"{field} fuera de rango")
+    return value
+
+
+def _integer(raw, field, minimum=None):
+    value = raw.get(field)
+    try:
+        value = int(str(value).strip())
+    except (TypeError, ValueError):
+        raise ValueError(f"{field} debe ser un entero")
+    if minimum is not None and value < minimum:
+        raise ValueError(f"{field} debe ser mayor o igual a {minimum}")
+    return value
+
+
+def validate_producto(raw):
+    return {
+        'nombre': _text(raw, 'nombre', 100, required=True),
+        'marca': _text(raw, 'marca', 100),
+        'description': _text(raw, 'description', 10000),
+        'price': _price(raw, 'price'),
+    }
+
+
+def validate_inventario(raw):
+    producto_id = raw.get('producto_id')
+    row = {
+        'producto_id': _integer(raw, 'producto_id', 1) if producto_id not in (None, '') else None,
+        'nombre': None,
+        'sucursal_id': _integer(raw, 'sucursal_id', 1),
+        'precio': _price(raw, 'precio'),
+        'stock': _integer(raw, 'stock', 0),
+    }
+    if row['producto_id'] is None:
+        row['nombre'] = _text(raw, 'nombre', 100, required=True)
+    return row
+
+
+VALIDATORS = {'productos': validate_producto, 'inventario': validate_inventario}
+
+
+class ImportReport:
+    def __init__(self, kind, fmt):
+        self.kind = kind
+        self.format = fmt
+        self.processed = 0
+        self.inserted = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.duplicates = 0 # filas reemplazadas por otra posterior con la misma clave en el lote
+        self.rejected = 0
+        self.batches = 0
+        self.rejects = []
+        self.started = time.perf_counter()
+
+    def reject(self, line, message):
+        self.rejected += 1
+        if len(self.rejects) < MAX_REPORTED_REJECTS:
+            self.rejects.append({'line': line, 'message': message})
+
+    def to_dict(self):
+        return {
+            'kind': self.kind,
+            'format': self.format,
+            'processed': self.processed,
+            'inserted': self.inserted,
+            'updated': self.updated,
+            'unchanged': self.unchanged,
+            'duplicates': self.duplicates,
+            'rejected': self.rejected,
+            'batches': self.batches,
+            'seconds': round(time.perf_counter() - self.started, 3),
+            'rejects': self.rejects,
+            'rejects_truncated': self.rejected > len(self.rejects),
+        }
+
+
+def _batch_key(kind, row):
+    if kind == 'productos':
+        return row['nombre']
+    return (row['producto_id'], row['nombre'], row['sucursal_id'])
+
+
+def validated_batches(rows, kind, batch_size, report):
+    # Agrupa las filas válidas en lotes de [(línea, fila)]; dentro de un lote gana la última
+    # fila de cada clave (un ON CONFLICT no puede tocar la misma fila dos veces)
+    validate = VALIDATORS[kind]
+    batch = {}
+    for line, raw, error in rows:
+        report.processed += 1
+        if error is None:
+            try:
+                row = validate(raw)
+            except ValueError as e:
+                error = str(e)
+        if error is not None:
+            report.reject(line, error)
+            continue
+        key = _batch_key(kind, row)
+        if key in batch:
+            report.duplicates += 1
+        batch[key] = (line, row)
+        if len(batch) >= batch_size:
+            yield list(batch.values())
+            batch = {}
+    if batch:
+        yield list(batch.values())
+
+
+# --- Fusión genérica (cualquier motor) ---
+def _merge_productos_generic(session, batch, report):
+    names = [row['nombre'] for _, row in batch]
+    existing = {row.nombre: row for row in session.execute(
+        select(productos.c.id, productos.c.nombre, productos.c.marca, productos.c.description, productos.c.price)
+        .where(productos.c.nombre.in_(names)))}
+    changed, new = [], []
+    for _, row in batch:
+        current = existing.get(row['nombre'])
+        if current is None:
+            new.append(row)
+        elif (current.marca, current.description, Decimal(current.price)) != (row['marca'], row['description'], row['price']):
+            changed.append({'b_id': current.id, 'b_marca': row['marca'], 'b_description': row['description'], 'b_price': row['price']})
+    if changed:
+        session.execute(update(productos).where(productos.c.id == bindparam('b_id'))
+                        .values(marca=bindparam('b_marca'), description=bindparam('b_description'),
+                                price=bindparam('b_price')), changed)
+    inserted = []
+    if new:
+        inserted = session.execute(insert(productos).returning(productos.c.id, sort_by_parameter_order=True), new).scalars().all()
+    return inserted, [change['b_id'] for change in changed]
+
+
+def _resolve_inventario(session, batch, report):
+    # Traduce nombre -> producto_id y descarta las filas con producto o sucursal inexistentes
+    names = {row['nombre'] for _, row in batch if row['producto_id'] is None}
+    ids_by_name = {}
+    if names:
+        ids_by_name = {nombre: producto_id for producto_id, nombre in session.execute(
+            select(productos.c.id, productos.c.nombre).where(productos.c.nombre.in_(list(names))))}
+    product_ids = {row['producto_id'] for _, row in batch if row['producto_id'] is not None}
+    known_products = set(session.execute(select(productos.c.id).where(productos.c.id.in_(list(product_ids)))).scalars()) if product_ids else set()
+    branch_ids = {row['sucursal_id'] for _, row in batch}
+    known_branches = set(session.execute(select(sucursales.c.id).where(sucursales.c.id.in_(list(branch_ids)))).scalars())
+
+    resolved = {}
+    for line, row in batch:
+        producto_id = row['producto_id'] if row['producto_id'] is not None else ids_by_name.get(row['nombre'])
+        if producto_id is None or (row['producto_id'] is not None and producto_id not in known_products):
+            report.reject(line, f"Producto inexistente: {row['producto_id'] or row['nombre']}")
+            continue
+        if row['sucursal_id'] not in known_branches:
+            report.reject(line, f"Sucursal inexistente: {row['sucursal_id']}")
+            continue
+        key = (producto_id, row['sucursal_id'])
+        if key in resolved:
+            report.duplicates += 1
+        resolved[key] = {'producto_id': producto_id, 'sucursal_id': row['sucursal_id'],
+                         'precio': row['precio'], 'stock': row['stock']}
+    return [resolved[key] for key in sorted(resolved)] # orden fijo de bloqueo, como inventory.py
+
+
+def _merge_inventario_generic(session, batch, report):
+    rows = _resolve_inventario(session, batch, report)
+    if not rows:
+        return []
+    keys = [(row['producto_id'], row['sucursal_id']) for row in rows]
+    existing = {(row.producto_id, row.sucursal_id): row for row in session.execute(
+        select(productos_sucursales.c.id, productos_sucursales.c.producto_id, productos_sucursales.c.sucursal_id,
+               productos_sucursales.c.precio, productos_sucursales.c.stock)
+        .where(tuple_(productos_sucursales.c.producto_id, productos_sucursales.c.sucursal_id).in_(keys)))}
+    changed, new = [], []
+    for row in rows:
+        current = existing.get((row['producto_id'], row['sucursal_id']))
+        if current is None:
+            new.append(row)
+        elif (Decimal(current.precio), current.stock) != (row['precio'], row['stock']):
+            changed.append(row)
+            row['b_id'] = current.id
+    if changed:
+        session.execute(update(productos_sucursales).where(productos_sucursales.c.id == bindparam('b_id'))
+                        .values(precio=bindparam('b_precio'), stock=bindparam('b_stock')),
+                        [{'b_id': row['b_id'], 'b_precio': row['precio'], 'b_stock': row['stock']} for row in changed])
+    if new:
+        session.execute(insert(productos_sucursales), new)
+    report.inserted += len(new)
+    report.updated += len(changed)
+    report.unchanged += len(rows) - len(new) - len(changed)
+    return sorted({row['producto_id'] for row in new} | {row['producto_id'] for row in changed})
+
+
+# --- Fusión en PostgreSQL: COPY a staging + UPDATE/INSERT en bloque ---
+STAGING_PRODUCTOS = """
+    CREATE TEMP TABLE IF NOT EXISTS import_productos (
+        line INTEGER, nombre VARCHAR(100), marca VARCHAR(100), description TEXT, price NUMERIC(10, 2)
+    ) ON COMMIT DELETE ROWS
+"""
+STAGING_INVENTARIO = """
+    CREATE TEMP TABLE IF NOT EXISTS import_inventario (
+        line INTEGER, producto_id INTEGER, nombre VARCHAR(100), sucursal_id INTEGER,
+        precio NUMERIC(10, 2), stock INTEGER
+    ) ON COMMIT DELETE ROWS
+"""
+
+
+def _copy_rows(session, table, columns, rows):
+    # COPY ... FROM STDIN con el lote serializado como CSV (el lote ya está acotado en memoria)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(['' if value is None else value for value in row])
+    buffer.seek(0)
+    dbapi_connection = session.connection().connection.driver_connection
+    with dbapi_connection.cursor() as cursor:
+        cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+
+def _merge_productos_postgres(session, batch, report):
+    session.execute(text(STAGING_PRODUCTOS))
+    session.execute(text("TRUNCATE import_productos"))
+    _copy_rows(session, 'import_productos', ('line', 'nombre', 'marca', 'description', 'price'),
+               ((line, row['nombre'], row['marca'], row['description'], row['price']) for line, row in batch))
+    updated = session.execute(text("""
+        UPDATE productos p SET marca = s.marca, description = s.description, price = s.price
+        FROM import_productos s
+        WHERE p.nombre = s.nombre
+          AND (p.marca, p.description, p.price) IS DISTINCT FROM (s.marca, s.description, s.price)
+        RETURNING p.id
+    """)).scalars().all()
+    inserted = session.execute(text("""
+        INSERT INTO productos (nombre, marca, description, price)
+        SELECT s.nombre, s.marca, s.description, s.price FROM import_productos s
+        WHERE NOT EXISTS (SELECT 1 FROM productos p WHERE p.nombre = s.nombre)
+        ORDER BY s.line
+        ON CONFLICT (nombre) DO NOTHING
+        RETURNING id
+    """)).scalars().all()
+    return inserted, updated
+
+
+def _merge_inventario_postgres(session, batch, report):
+    session.execute(text(STAGING_INVENTARIO))
+    session.execute(text("TRUNCATE import_inventario"))
+    _copy_rows(session, 'import_inventario', ('line', 'producto_id', 'nombre', 'sucursal_id', 'precio', 'stock'),
+               ((line, row['producto_id'], row['nombre'], row['sucursal_id'], row['precio'], row['stock'])
+                for line, row in batch))
+    session.execute(text("""
+        UPDATE import_inventario s SET producto_id = p.id
+        FROM productos p
+        WHERE s.producto_id IS NULL AND p.nombre = s.nombre
+    """))
+    rejects = session.execute(text("""
+        DELETE FROM import_inventario s
+        WHERE s.producto_id IS NULL
+           OR NOT EXISTS (SELECT 1 FROM productos p WHERE p.id = s.producto_id)
+           OR NOT EXISTS (SELECT 1 FROM sucursales su WHERE su.id = s.sucursal_id)
+        RETURNING s.line, s.producto_id, s.nombre, s.sucursal_id,
+                  EXISTS (SELECT 1 FROM productos p WHERE p.id = s.producto_id) AS producto_ok
+    """)).all()
+    for reject in sorted(rejects):
+        if reject.producto_ok:
+            report.reject(reject.line, f"Sucursal inexistente: {reject.sucursal_id}")
+        else:
+            report.reject(reject.line, f"Producto inexistente: {reject.producto_id or reject.nombre}")
+    staged = session.execute(text("SELECT count(*), count(DISTINCT (producto_id, sucursal_id)) FROM import_inventario")).one()
+    report.duplicates += staged[0] - staged[1]
+    # DISTINCT ON conserva la última línea de cada clave; xmax = 0 distingue inserción de actualización
+    merged = session.execute(text("""
+        INSERT INTO productos_sucursales (producto_id, sucursal_id, precio, stock)
+        SELECT producto_id, sucursal_id, precio, stock FROM (
+            SELECT DISTINCT ON (producto_id, sucursal_id) producto_id, sucursal_id, precio, stock
+            FROM import_inventario ORDER BY producto_id, sucursal_id, line DESC
+        ) s
+        ORDER BY producto_id, sucursal_id
+        ON CONFLICT (producto_id, sucursal_id) DO UPDATE
+            SET precio = EXCLUDED.precio, stock = EXCLUDED.stock
+            WHERE (productos_sucursales.precio, productos_sucursales.stock)
+                  IS DISTINCT FROM (EXCLUDED.precio, EXCLUDED.stock)
+        RETURNING producto_id, (xmax = 0) AS inserted
+    """)).all()
+    inserted = sum(1 for row in merged if row.inserted)
+    report.inserted += inserted
+    report.updated += len(merged) - inserted
+    report.unchanged += staged[1] - len(merged)
+    return sorted({row.producto_id for row in merged})
+
+
+def merge_batch(session, kind, batch, report):
+    postgres = session.get_bind().dialect.name == 'postgresql'
+    if kind == 'productos':
+        merge = _merge_productos_postgres if postgres else _merge_productos_generic
+        inserted, updated = merge(session, batch, report)
+        report.inserted += len(inserted)
+        report.updated += len(updated)
+        report.unchanged += len(batch) - len(inserted) - len(updated)
+        # Los nuevos reciben su documento de disponibilidad; los modificados pueden cambiar
+        # qué búsquedas los encuentran (marca, descripción)
+        availability.refresh_products(session, inserted)
+        if updated:
+            availability.announce_changes(session, updated, updated)
+        return sorted(set(inserted) | set(updated))
+    merge = _merge_inventario_postgres if postgres else _merge_inventario_generic
+    changed = merge(session, batch, report)
+    availability.refresh_products(session, changed)
+    return changed
+
+
+def import_stream(session, stream, kind, fmt, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    # Importa el stream completo; un lote con error de base se revierte y sus filas se rechazan
+    if kind not in KINDS:
+        raise ValueError(f"Tipo de importación desconocido: {kind}")
+    if fmt not in FORMATS:
+        raise ValueError(f"Formato desconocido: {fmt}")
+    report = ImportReport(kind, fmt)
+    for batch in validated_batches(read_rows(stream, fmt), kind, batch_size, report):
+        try:
+            merge_batch(session, kind, batch, report)
+            session.commit()
+        except SQLAlchemyError as e:
+            session.rollback()
+            log.error("Lote %d de %s revertido: %s", report.batches + 1, kind, e)
+            for line, _ in batch:
+                report.reject(line, "Error de base de datos al importar el lote.")
+        report.batches += 1
+        if progress:
+            progress(report)
+    return report
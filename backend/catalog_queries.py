@@ -0,0 +1,258 @@
+# Archivo: backend/catalog_queries.py
+# Consultas de lectura del catálogo para los servidores gRPC (GetProducts, SearchProducts,
+# StreamCatalog). Usa tablas de SQLAlchemy Core, sin Flask, para que sirvan igual en
+# grpc_server.py (sesión de Flask-SQLAlchemy) y en grpc_aio_server.py (motor asíncrono).
+import calendar
+import os
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import (Column, DateTime, ForeignKey, Integer, LargeBinary, MetaData, Numeric,
+                        String, Table, Text, and_, bindparam, exists, func, or_, select)
+from sqlalchemy.dialects import postgresql, sqlite
+
+import image_store
+import product_pb2
+import search_index
+
+# --- Tablas (mismo esquema que los modelos de app.py / grpc_server.py) ---
+metadata = MetaData()
+
+imagenes = Table(
+    'imagenes', metadata,
+    Column('sha256', String(64), primary_key=True),
+    Column('mime_type', String(50), nullable=False),
+    Column('size', Integer, nullable=False),
+    Column('data', LargeBinary, nullable=False),
+    Column('created_at', DateTime, server_default=func.current_timestamp()),
+)
+
+sucursales = Table(
+    'sucursales', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('nombre', String(100), nullable=False),
+    Column('direccion', String(200), nullable=True),
+)
+
+productos = Table(
+    'productos', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('nombre', String(100), nullable=False, unique=True, index=True),
+    Column('marca', String(100), nullable=True),
+    Column('description', Text, nullable=True),
+    Column('price', Numeric(10, 2), nullable=False),
+    Column('imagen_base64', Text, nullable=True),
+    Column('imagen_hash', String(64), ForeignKey('imagenes.sha256'), nullable=True),
+    Column('updated_at', DateTime, server_default=func.current_timestamp(),
+           onupdate=func.current_timestamp(), index=True),
+)
+
+productos_sucursales = Table(
+    'productos_sucursales', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('producto_id', Integer, ForeignKey('productos.id'), nullable=False),
+    Column('sucursal_id', Integer, ForeignKey('sucursales.id'), nullable=False),
+    Column('precio', Numeric(10, 2), nullable=False),
+    Column('stock', Integer, nullable=False),
+    Column('updated_at', DateTime, server_default=func.current_timestamp(),
+           onupdate=func.current_timestamp(), index=True),
+)
+
+# Reservas de stock (ver inventory.py); la FK a ordenes la declara el modelo ReservaStock de app.py
+reservas_stock = Table(
+    'reservas_stock', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('orden_id', Integer, nullable=False),
+    Column('producto_id', Integer, nullable=False),
+    Column('sucursal_id', Integer, nullable=False),
+    Column('quantity', Integer, nullable=False),
+    Column('status', String(20), nullable=False),
+    Column('expires_at', DateTime, nullable=False),
+    Column('created_at', DateTime, server_default=func.current_timestamp()),
+)
+RESERVATION_ACTIVE = 'ACTIVE'
+
+MAX_BATCH_IDS = 1000
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 5000
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 200
+# StreamCatalog: la marca que se devuelve queda este margen antes del inicio del stream. updated_at
+# toma la hora de inicio de la transacción que escribe (current_timestamp), así que una escritura
+# que empezó antes del stream pero confirma después tiene una marca anterior a la del stream y no
+# la ve ni este stream ni el siguiente. Debe superar la transacción de escritura más larga
+# (importaciones por lotes); el costo es reenviar lo cambiado en ese margen.
+CATALOG_WATERMARK_MARGIN = timedelta(seconds=float(os.environ.get('CATALOG_WATERMARK_MARGIN', 300)))
+
+
+def utcnow():
+    # Los vencimientos de reservas se guardan en UTC sin zona; solo Python los escribe y compara
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def held_quantity(producto_id=productos_sucursales.c.producto_id, sucursal_id=productos_sucursales.c.sucursal_id):
+    # Unidades apartadas por reservas ACTIVE vigentes de una fila de productos_sucursales (subconsulta
+    # correlacionada; el disponible es stock - esto). Las vencidas dejan de contar aunque el barrido
+    # aún no las haya marcado; la hora se toma al ejecutar la sentencia.
+    return (select(func.coalesce(func.sum(reservas_stock.c.quantity), 0))
+            .where(reservas_stock.c.producto_id == producto_id,
+                   reservas_stock.c.sucursal_id == sucursal_id,
+                   reservas_stock.c.status == RESERVATION_ACTIVE,
+                   reservas_stock.c.expires_at > bindparam('reservas_ahora', callable_=utcnow, type_=DateTime, unique=True))
+            .scalar_subquery())
+
+
+# --- Marcas de tiempo: DateTime sin zona (hora de la base) <-> milisegundos ---
+def datetime_to_ms(value):
+    if value is None:
+        return 0
+    return calendar.timegm(value.timetuple()) * 1000 + value.microsecond // 1000
+
+
+def ms_to_datetime(ms):
+    return datetime.fromtimestamp(ms / 1000, timezone.utc).replace(tzinfo=None)
+
+
+# --- Sentencias ---
+PRODUCT_COLUMNS = (
+    productos.c.id, productos.c.nombre, productos.c.marca, productos.c.description,
+    productos.c.price, productos.c.imagen_hash, productos.c.updated_at,
+)
+BRANCH_COLUMNS = (
+    productos_sucursales.c.sucursal_id, sucursales.c.nombre.label('sucursal_nombre'),
+    productos_sucursales.c.precio, productos_sucursales.c.stock,
+)
+
+
+def _with_branches(product_ids):
+    # Productos (filtrados por la subconsulta/lista de ids) con sus sucursales, en un solo JOIN
+    joined = (productos
+              .outerjoin(productos_sucursales, productos_sucursales.c.producto_id == productos.c.id)
+              .outerjoin(sucursales, sucursales.c.id == productos_sucursales.c.sucursal_id))
+    return (select(*PRODUCT_COLUMNS, *BRANCH_COLUMNS)
+            .select_from(joined)
+            .where(productos.c.id.in_(product_ids))
+            .order_by(productos.c.id, productos_sucursales.c.sucursal_id))
+
+
+def products_by_ids_stmt(ids):
+    return _with_branches(list(ids))
+
+
+def changed_since_clause(since):
+    # Un producto cambió si cambió su fila o la de alguna de sus sucursales.
+    # Se usa >= : reenviar un producto es inocuo, perder un cambio del mismo instante no.
+    return or_(
+        productos.c.updated_at >= since,
+        exists().where(and_(productos_sucursales.c.producto_id == productos.c.id,
+                            productos_sucursales.c.updated_at >= since)),
+    )
+
+
+def catalog_page_stmt(after_id, page_size, since=None):
+    # IN (subconsulta con LIMIT) no está soportado en todos los motores: se envuelve como tabla derivada
+    page = select(productos.c.id).where(productos.c.id > after_id)
+    if since is not None:
+        page = page.where(changed_since_clause(since))
+    page = page.order_by(productos.c.id).limit(page_size).subquery()
+    return _with_branches(select(page.c.id))
+
+
+def insert_products_stmt(dialect_name):
+    # INSERT ... ON CONFLICT (nombre) DO NOTHING RETURNING nombre, id: los nombres que ya existen,
+    # aunque los haya insertado otra carga concurrente, se omiten sin error y no vuelven en RETURNING
+    dialect_insert = postgresql.insert if dialect_name == 'postgresql' else sqlite.insert
+    return (dialect_insert(productos)
+            .on_conflict_do_nothing(index_elements=[productos.c.nombre])
+            .returning(productos.c.nombre, productos.c.id))
+
+
+def insert_images_stmt(dialect_name):
+    # INSERT ... ON CONFLICT (sha256) DO NOTHING: el almacén es direccionado por contenido, así que
+    # si otra petición concurrente guardó los mismos bytes la fila existente ya es la correcta
+    dialect_insert = postgresql.insert if dialect_name == 'postgresql' else sqlite.insert
+    return dialect_insert(imagenes).on_conflict_do_nothing(index_elements=[imagenes.c.sha256])
+
+
+def like_search_stmt(query, limit, after=None):
+    # Búsqueda simple para motores sin índice de texto: nombre contiene la consulta literal
+    # (autoescape: %, _ y \ de la consulta no actúan como comodines), por id
+    stmt = select(productos.c.id).where(productos.c.nombre.icontains(query, autoescape=True))
+    if after is not None:
+        stmt = stmt.where(productos.c.id > after[1])
+    return stmt.order_by(productos.c.id).limit(limit)
+
+
+def search_statement(dialect_name, query, limit, after=None):
+    # Devuelve (sentencia, parámetros, con_score). En PostgreSQL usa el ranking indexado.
+    if dialect_name == 'postgresql':
+        return search_index.POSTGRES_SEARCH_SQL, search_index.postgres_search_params(query, limit, after), True
+    return like_search_stmt(query, limit, after), {}, False
+
+
+def ranked_from_rows(rows, scored):
+    if scored:
+        return [(row.score, row.id) for row in rows]
+    return [(0.0, row.id) for row in rows]
+
+
+def current_timestamp_stmt():
+    return select(func.current_timestamp())
+
+
+def watermark_ms(current_timestamp):
+    # since_ms para la próxima sincronización: hora de la base al empezar el stream menos el margen
+    return datetime_to_ms(current_timestamp - CATALOG_WATERMARK_MARGIN)
+
+
+# --- Conversión de filas a mensajes protobuf ---
+def rows_to_products(rows):
+    # Las filas vienen ordenadas por producto; se agrupan sus sucursales sin cargar nada más
+    products = []
+    current = None
+    for row in rows:
+        if current is None or current.id != row.id:
+            current = product_pb2.CatalogProduct(
+                id=row.id,
+                name=row.nombre,
+                brand=row.marca or "",
+                description=row.description or "",
+                price=float(row.price),
+                image_url=image_store.image_url(row.id, row.imagen_hash) or "",
+                updated_at_ms=datetime_to_ms(row.updated_at),
+            )
+            products.append(current)
+        if row.sucursal_id is not None:
+            current.branches.add(
+                sucursal_id=row.sucursal_id,
+                sucursal_name=row.sucursal_nombre or "",
+                price=float(row.precio),
+                stock=row.stock,
+            )
+    return products
+
+
+def order_products(ids, products):
+    # Respeta el orden pedido y separa los ids que no existen
+    by_id = {product.id: product for product in products}
+    return [by_id[i] for i in ids if i in by_id], [i for i in ids if i not in by_id]
+
+
+def page_ranked(ranked, limit):
+    # `ranked` trae limit + 1 elementos si hay página siguiente
+    next_cursor = ""
+    if len(ranked) > limit:
+        ranked = ranked[:limit]
+        next_cursor = search_index.encode_cursor(*ranked[-1])
+    return [doc_id for _, doc_id in ranked], next_cursor
+
+
+def clamp_search_limit(limit):
+    if limit <= 0:
+        return DEFAULT_SEARCH_LIMIT
+    return min(limit, MAX_SEARCH_LIMIT)
+
+
+def clamp_page_size(page_size):
+    if page_size <= 0:
+        return DEFAULT_PAGE_SIZE
+    return min(page_size, MAX_PAGE_SIZE)
@@ -0,0 +1,117 @@
+# Archivo: backend/currency.py
+# Conversión de precios CLP a otras monedas en el servidor (?currency= en los endpoints del catálogo).
+# Las tasas salen de la tabla conversion_rates completa que guarda rate_cache.RateCache (base CLP,
+# refrescada en segundo plano), así que convertir no llama al proveedor por cada petición.
+# Cada respuesta convertida informa la tabla usada: X-Currency-Rate-Date (cuándo se obtuvo) y
+# X-Currency-Rate-Age (su edad en segundos al responder).
+#
+# Todo se calcula con Decimal: precio (Numeric(10, 2)) x tasa, redondeado una sola vez a las
+# unidades menores de la moneda destino (ROUND_HALF_UP). Una respuesta se convierte en una sola
+# pasada: se juntan todos los precios, se convierte cada valor distinto una vez y se reescriben.
+import threading
+import time
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from email.utils import formatdate
+
+BASE_CURRENCY = 'CLP'
+# Decimales de las monedas que no usan 2 (ISO 4217)
+MINOR_UNITS = {
+    'BIF': 0, 'CLP': 0, 'DJF': 0, 'GNF': 0, 'ISK': 0, 'JPY': 0, 'KMF': 0, 'KRW': 0, 'PYG': 0,
+    'RWF': 0, 'UGX': 0, 'UYI': 0, 'VND': 0, 'VUV': 0, 'XAF': 0, 'XOF': 0, 'XPF': 0,
+    'BHD': 3, 'IQD': 3, 'JOD': 3, 'KWD': 3, 'LYD': 3, 'OMR': 3, 'TND': 3, 'CLF': 4, 'UYW': 4,
+}
+# Campos con precio en CLP en las respuestas del catálogo; las listas anidadas se recorren igual
+PRICE_FIELDS = ('price', 'precio', 'precio_min')
+NESTED_FIELDS = ('sucursales_info',)
+
+
+class Converter:
+    __slots__ = ('code', 'rate', 'quantum', 'fetched_at')
+
+    def __init__(self, code, rate, fetched_at=None):
+        self.code = code
+        self.rate = rate
+        self.quantum = Decimal(1).scaleb(-MINOR_UNITS.get(code, 2))
+        self.fetched_at = fetched_at
+
+    def convert(self, amount):
+        # Decimal o float de un to_dict (str() recupera los 2 decimales exactos de Numeric(10, 2))
+        if not isinstance(amount, Decimal):
+            amount = Decimal(str(amount))
+        return (amount * self.rate).quantize(self.quantum, rounding=ROUND_HALF_UP)
+
+
+_converters = {}
+_converters_lock = threading.Lock()
+
+
+def parse_currency(raw):
+    # ?currency= -> código ISO en mayúsculas, o None si se piden los precios en CLP
+    if not raw:
+        return None
+    code = raw.strip().upper()
+    if len(code) != 3 or not code.isalpha():
+        raise ValueError("currency debe ser un código ISO 4217 de tres letras (p. ej. USD)")
+    return None if code == BASE_CURRENCY else code
+
+
+def converter_for(entry, code):
+    # entry: valor de RateCache.get(); ValueError si la tabla no trae la moneda
+    key = (entry['fetched_at'], code)
+    with _converters_lock:
+        converter = _converters.get(key)
+    if converter is not None:
+        return converter
+    raw_rate = entry['conversion_rates'].get(code)
+    try:
+        rate = Decimal(str(raw_rate))
+    except InvalidOperation:
+        rate = None
+    if raw_rate is None or rate is None or not rate.is_finite() or rate <= 0:
+        raise ValueError(f"Moneda no disponible: {code}")
+    converter = Converter(code, rate, entry['fetched_at'])
+    with _converters_lock:
+        # Solo sirven las tasas de la tabla vigente: al cambiar fetched_at se descartan las anteriores
+        for old in [k for k in _converters if k[0] != key[0]]:
+            del _converters[old]
+        _converters[key] = converter
+    return converter
+
+
+def _price_slots(items):
+    # (dict, campo) de cada precio de la respuesta, incluidas las sucursales de cada producto
+    slots = []
+    for item in items:
+        for field in PRICE_FIELDS:
+            if item.get(field) is not None:
+                slots.append((item, field))
+        for nested in NESTED_FIELDS:
+            slots.extend(_price_slots(item.get(nested) or ()))
+    return slots
+
+
+def convert_prices(items, converter):
+    # Convierte en el lugar los precios de una lista de dicts ya serializados; devuelve la lista
+    if converter is None:
+        return items
+    slots = _price_slots(items)
+    converted = {value: float(converter.convert(value)) for value in {item[field] for item, field in slots}}
+    for item, field in slots:
+        item[field] = converted[item[field]]
+    return items
+
+
+def rate_age(converter):
+    # Segundos desde que se obtuvo del proveedor la tabla usada por `converter`
+    return max(0, int(time.time() - converter.fetched_at))
+
+
+def response_headers(converter):
+    # Cabeceras estables para una misma tabla (entran en el ETag de las búsquedas cacheadas);
+    # la edad, que cambia en cada petición, la agrega app.py con rate_age al responder
+    if converter is None:
+        return []
+    headers = [('X-Currency', converter.code)]
+    if converter.fetched_at is not None:
+        headers.append(('X-Currency-Rate-Date', formatdate(converter.fetched_at, usegmt=True)))
+    return headers
@@ -0,0 +1,152 @@
+# Archivo: backend/grpc_client.py
+# Pool de canales gRPC persistentes hacia ProductService, compartido por todo el proceso.
+# Los canales se crean de forma perezosa y se descartan tras un fork (gunicorn),
+# así cada worker abre sus propias conexiones HTTP/2 y las reutiliza entre requests.
+import itertools
+import json
+import os
+import threading
+import time
+import weakref
+
+import grpc
+import log_config
+import product_pb2_grpc
+
+log = log_config.get_logger('grpc_client')
+
+DEFAULT_TARGET = 'localhost:50051'
+
+# Reintentos ante UNAVAILABLE (p. ej. servidor reiniciándose) y espera a que el canal
+# esté listo en lugar de fallar de inmediato; el deadline de cada llamada pone el límite.
+DEFAULT_SERVICE_CONFIG = {
+    'methodConfig': [{
+        'name': [{'service': 'product.ProductService'}],
+        'waitForReady': True,
+        'retryPolicy': {
+            'maxAttempts': 4,
+            'initialBackoff': '0.1s',
+            'maxBackoff': '2s',
+            'backoffMultiplier': 2,
+            'retryableStatusCodes': ['UNAVAILABLE'],
+        },
+    }]
+}
+
+DEFAULT_OPTIONS = (
+    ('grpc.keepalive_time_ms', 30000),
+    ('grpc.keepalive_timeout_ms', 10000),
+    ('grpc.keepalive_permit_without_calls', 1),
+    ('grpc.http2.max_pings_without_data', 0),
+    ('grpc.initial_reconnect_backoff_ms', 200),
+    ('grpc.max_reconnect_backoff_ms', 5000),
+    ('grpc.enable_retries', 1),
+    ('grpc.max_send_message_length', 32 * 1024 * 1024),
+    ('grpc.max_receive_message_length', 32 * 1024 * 1024),
+)
+
+_pools = weakref.WeakSet()
+
+
+class _ManagedChannel:
+    def __init__(self, index, target, options):
+        self.index = index
+        self.channel = grpc.insecure_channel(target, options=options)
+        self.stub = product_pb2_grpc.ProductServiceStub(self.channel)
+        self.state = None
+        self.state_changes = 0
+        self.last_state_change = None
+        self.channel.subscribe(self._on_state_change, try_to_connect=True)
+
+    def _on_state_change(self, connectivity):
+        self.state = connectivity
+        self.state_changes += 1
+        self.last_state_change = time.time()
+
+    def close(self):
+        self.channel.unsubscribe(self._on_state_change)
+        self.channel.close()
+
+
+class ChannelPool:
+    def __init__(self, target=DEFAULT_TARGET, size=2, timeout=10.0, options=DEFAULT_OPTIONS, service_config=None):
+        self.target = target
+        self.size = max(1, size)
+        self.timeout = timeout
+        self.options = tuple(options) + (
+            ('grpc.service_config', json.dumps(service_config or DEFAULT_SERVICE_CONFIG)),
+        )
+        self._lock = threading.Lock()
+        self._channels = []
+        self._pid = os.getpid()
+        self._round_robin = itertools.count()
+        self.calls = 0
+        self.failures = {}
+        _pools.add(self)
+
+    def _reset_after_fork(self):
+        # Los canales heredados del proceso padre no se pueden usar ni cerrar en el hijo
+        self._lock = threading.Lock()
+        self._channels = []
+        self._pid = os.getpid()
+        self.calls = 0
+        self.failures = {}
+
+    def _get_channel(self):
+        if self._pid != os.getpid():
+            self._reset_after_fork()
+        if not self._channels:
+            with self._lock:
+                if not self._channels:
+                    self._channels = [_ManagedChannel(i, self.target, self.options) for i in range(self.size)]
+                    log.info("%d canal(es) abiertos hacia %s", self.size, self.target)
+        return self._channels[next(self._round_robin) % len(self._channels)]
+
+    def stub(self):
+        return self._get_channel().stub
+
+    def call(self, method_name, request, timeout=None, **kwargs):
+        # Llamada unaria o client-streaming con el deadline por defecto del pool
+        self.calls += 1
+        method = getattr(self.stub(), method_name)
+        try:
+            return method(request, timeout=timeout or self.timeout, **kwargs)
+        except grpc.RpcError as e:
+            code = e.code().name if callable(getattr(e, 'code', None)) else 'UNKNOWN'
+            self.failures[code] = self.failures.get(code, 0) + 1
+            raise
+
+    def stats(self):
+        if self._pid != os.getpid():
+            self._reset_after_fork()
+        return {
+            'target': self.target,
+            'pid': self._pid,
+            'size': self.size,
+            'calls': self.calls,
+            'failures': dict(self.failures),
+            'channels': [
+                {
+                    'index': ch.index,
+                    'state': ch.state.name if ch.state else 'IDLE',
+                    'state_changes': ch.state_changes,
+                    'last_state_change': ch.last_state_change,
+                }
+                for ch in self._channels
+            ],
+        }
+
+    def close(self):
+        with self._lock:
+            channels, self._channels = self._channels, []
+        for ch in channels:
+            ch.close()
+
+
+def _after_fork_in_child():
+    for pool in list(_pools):
+        pool._reset_after_fork()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
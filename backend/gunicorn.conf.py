@@ -0,0 +1,96 @@
+# Archivo: backend/gunicorn.conf.py
+# Configuración de gunicorn para la app Flask (ver wsgi.py):
+#   cd backend && gunicorn -c gunicorn.conf.py wsgi:app
+#
+# Worker: con gevent (si está instalado) cada conexión es un greenlet, así que miles de clientes
+# SSE inactivos (/events/low-stock) no ocupan miles de hilos; el límite por worker es
+# GUNICORN_WORKER_CONNECTIONS. Sin gevent se usa gthread y cada stream SSE ocupa uno de los
+# GUNICORN_THREADS hilos del worker. GUNICORN_WORKER_CLASS fuerza uno u otro.
+#
+# La app se carga en el maestro (preload_app) y los workers la heredan por fork. Con gevent el
+# parche de la biblioteca estándar tiene que aplicarse aquí, antes de importar la app, para que
+# los locks, colas y sockets que crea app.py al importarse ya sean cooperativos.
+#
+# Conexiones a PostgreSQL: DB_MAX_CONNECTIONS es el total para todos los workers del nodo; se
+# reparte en DB_POOL_SIZE + DB_MAX_OVERFLOW por worker salvo que se definan explícitamente.
+# Con gevent conviene instalar psycogreen: sin él cada consulta bloquea el worker completo.
+#
+# Métricas: modo multiproceso de prometheus_client (metrics.py). Con PROMETHEUS_MULTIPROC_DIR
+# (en el entorno antes de lanzar gunicorn: se lee al importar prometheus_client) cada worker escribe
+# sus valores en ese directorio y /metrics devuelve la suma de todos. Aquí el maestro lo vacía al
+# arrancar y, cuando un worker termina, descarta sus gauges (sus contadores siguen sumando). Sin esa
+# variable cada lectura de /metrics refleja solo al worker que la atendió. El directorio es de esta
+# instancia de gunicorn: los servidores gRPC no deben compartirlo.
+#
+# Lo que vive en memoria es de cada worker, no del nodo:
+#  - rate_cache: la tabla de tasas se comparte por archivo, pero cada worker guarda su copia y
+#    tiene su propio hilo de refresco (el flock hace que solo uno llame al proveedor);
+#  - search_cache: respuestas de búsqueda cacheadas; las invalidaciones llegan a los demás
+#    workers por LISTEN/NOTIFY (SEARCH_CACHE_RELAY=postgres); sin él cada worker se entera solo de lo suyo;
+#  - cart_quote.BranchRowCache (CART_QUOTE_CACHE_TTL): precio/disponible para cotizar, puede ir
+#    hasta su TTL detrás de otro worker;
+#  - el índice de búsqueda en memoria (sin PostgreSQL) y los resultados de pago ya resueltos.
+# Cuantos más workers, más misses en frío y más memoria para estas cachés.
+import glob
+import multiprocessing
+import os
+
+
+def _gevent_available():
+    try:
+        import gevent # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+bind = os.environ.get('GUNICORN_BIND', f"0.0.0.0:{os.environ.get('PORT', 8000)}")
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS') or ('gevent' if _gevent_available() else 'gthread')
+threads = int(os.environ.get('GUNICORN_THREADS', 32)) # solo gthread
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 5000)) # solo gevent
+preload_app = True
+# timeout es el latido del worker, no la duración de una petición: los streams SSE no lo agotan
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+# Reciclar workers corta los streams SSE abiertos (el navegador reconecta con Last-Event-ID)
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 0))
+accesslog = os.environ.get('GUNICORN_ACCESSLOG') # None: sin access log (las métricas ya miden cada ruta)
+
+if 'DB_MAX_CONNECTIONS' in os.environ:
+    per_worker = max(2, int(os.environ['DB_MAX_CONNECTIONS']) // workers)
+    os.environ.setdefault('DB_POOL_SIZE', str(max(1, per_worker // 2)))
+    os.environ.setdefault('DB_MAX_OVERFLOW', str(max(0, per_worker - int(os.environ['DB_POOL_SIZE']))))
+
+if worker_class == 'gevent':
+    from gevent import monkey
+    monkey.patch_all()
+    try:
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+    except ImportError:
+        pass
+    import grpc.experimental.gevent
+    grpc.experimental.gevent.init_gevent()
+
+
+def on_starting(server):
+    # Métricas de una ejecución anterior: sus pids ya no existen
+    directory = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        for path in glob.glob(os.path.join(directory, '*.db')):
+            os.remove(path)
+
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
+
+
+def post_fork(server, worker):
+    server.log.info("Worker %s listo (%s, pool de base %s+%s)", worker.pid, worker_class,
+                    os.environ.get('DB_POOL_SIZE', 5), os.environ.get('DB_MAX_OVERFLOW', 10))
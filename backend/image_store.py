@@ -0,0 +1,80 @@
+# Archivo: backend/image_store.py
+# Utilidades para el almacén de imágenes direccionado por contenido (tabla `imagenes`).
+# Las usan tanto app.py como grpc_server.py; no dependen de Flask ni de los modelos.
+import base64
+import binascii
+import hashlib
+import io
+
+try:
+    from PIL import Image
+except ImportError: # Pillow es opcional: sin él no se generan miniaturas
+    Image = None
+
+CHUNK_SIZE = 64 * 1024
+THUMBNAIL_MIN_SIZE = 16
+THUMBNAIL_MAX_SIZE = 1024
+
+# Firmas de los formatos que acepta el formulario de productos
+MAGIC_NUMBERS = (
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+)
+
+
+def decode_base64_image(value):
+    # Acepta tanto el Base64 "pelado" como una data URL ("data:image/png;base64,...")
+    if not value:
+        return None
+    if value.startswith('data:') and ',' in value:
+        value = value.split(',', 1)[1]
+    try:
+        return base64.b64decode(value, validate=True)
+    except (binascii.Error, ValueError) as e:
+        raise ValueError(f"Imagen Base64 inválida: {e}")
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def sniff_mime_type(data):
+    for magic, mime_type in MAGIC_NUMBERS:
+        if data.startswith(magic):
+            return mime_type
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    return 'application/octet-stream'
+
+
+def image_url(producto_id, sha256):
+    # La versión en la URL cambia con el contenido, así la URL se puede cachear como inmutable
+    if not sha256:
+        return None
+    return f"/api/productos/{producto_id}/imagen?v={sha256[:16]}"
+
+
+def thumbnails_supported():
+    return Image is not None
+
+
+def make_thumbnail(data, size):
+    # Devuelve (bytes, mime_type) de una miniatura que cabe en size x size, o None sin Pillow
+    if Image is None:
+        return None
+    with Image.open(io.BytesIO(data)) as img:
+        img.thumbnail((size, size))
+        output = io.BytesIO()
+        if img.mode in ('RGBA', 'LA', 'P'):
+            img.save(output, format='PNG', optimize=True)
+            return output.getvalue(), 'image/png'
+        img.convert('RGB').save(output, format='JPEG', quality=85, optimize=True)
+        return output.getvalue(), 'image/jpeg'
+
+
+def iter_chunks(data, chunk_size=CHUNK_SIZE):
+    view = memoryview(data)
+    for start in range(0, len(view), chunk_size):
+        yield bytes(view[start:start + chunk_size])
@@ -0,0 +1,294 @@
+# Archivo: backend/inventory.py
+# Operaciones de stock por lotes sobre productos_sucursales (SQLAlchemy Core).
+# Cada operación resuelve el carro completo en un número constante de consultas, sin importar
+# cuántas líneas tenga. Los descuentos de stock toman los bloqueos de fila en un orden fijo
+# (producto_id, sucursal_id) para que dos pagos con los mismos productos no se bloqueen
+# mutuamente (deadlock).
+#
+# Reservas: al crear la orden se apartan unidades insertando una fila ACTIVE por línea en
+# reservas_stock, con vencimiento. La fila de productos_sucursales no se toca ni se bloquea (las
+# ventas, importaciones y lecturas no esperan a los checkouts): el disponible es
+# stock - SUM(reservas ACTIVE vigentes) (catalog_queries.held_quantity) y cada reserva se inserta
+# solo si ese disponible alcanza. Para que esa condición sea exacta entre checkouts simultáneos del
+# mismo producto, en PostgreSQL se toma un advisory lock de transacción por fila de stock (en orden
+# fijo) justo antes del INSERT; se suelta con el commit que le sigue. Así gana el primero en
+# llegar hasta cubrir el stock y solo se rechazan las reservas que ya no caben: nunca se confirma
+# una reserva por encima del stock. Al pagar la reserva se convierte en descuento de stock; al
+# rechazar o vencer se libera (cambia de estado, sin tocar productos_sucursales).
+# Cada cambio anota los productos afectados para recalcular su documento de availability.py después
+# del commit (availability.defer_refresh): la transacción solo escribe productos_sucursales y reservas_stock.
+from datetime import timedelta
+
+from sqlalchemy import DateTime, case, func, insert, literal, select, tuple_, update
+
+import availability
+from catalog_queries import (RESERVATION_ACTIVE, held_quantity, productos, productos_sucursales,
+                             reservas_stock, sucursales, utcnow)
+
+RESERVATION_CONVERTED = 'CONVERTED'
+RESERVATION_RELEASED = 'RELEASED'
+RESERVATION_EXPIRED = 'EXPIRED'
+
+# Primer argumento de pg_advisory_xact_lock(int, int) para las reservas; el segundo es productos_sucursales.id
+RESERVATION_LOCK_CLASS = 4 # migrations/0004_reservas_stock.sql
+
+
+def aggregate_lines(lines):
+    # [(producto_id, sucursal_id, cantidad)] -> {(producto_id, sucursal_id): cantidad total}, ordenado
+    totals = {}
+    for producto_id, sucursal_id, quantity in lines:
+        key = (int(producto_id), int(sucursal_id))
+        totals[key] = totals.get(key, 0) + int(quantity)
+    return dict(sorted(totals.items()))
+
+
+def available_stock():
+    return productos_sucursales.c.stock - held_quantity()
+
+
+def rows_stmt(keys):
+    # Filas de stock del carro con lo reservado y los nombres para las alertas, en orden determinista
+    return (select(productos_sucursales.c.id, productos_sucursales.c.producto_id,
+                   productos_sucursales.c.sucursal_id, productos_sucursales.c.stock,
+                   held_quantity().label('reservado'),
+                   productos.c.nombre.label('producto_nombre'),
+                   sucursales.c.nombre.label('sucursal_nombre'))
+            .join(productos, productos.c.id == productos_sucursales.c.producto_id)
+            .join(sucursales, sucursales.c.id == productos_sucursales.c.sucursal_id)
+            .where(tuple_(productos_sucursales.c.producto_id, productos_sucursales.c.sucursal_id).in_(list(keys)))
+            .order_by(productos_sucursales.c.producto_id, productos_sucursales.c.sucursal_id))
+
+
+def lock_rows_stmt(keys):
+    # SELECT ... FOR UPDATE para descontar stock. `of=` limita el bloqueo a productos_sucursales
+    # (no bloquea el producto, la sucursal ni las reservas).
+    return rows_stmt(keys).with_for_update(of=productos_sucursales)
+
+
+def lock_rows(session, keys):
+    if not keys:
+        return {}
+    return {(row.producto_id, row.sucursal_id): row for row in session.execute(lock_rows_stmt(keys))}
+
+
+def current_rows(session, keys):
+    # Como lock_rows, sin bloquear: para reservar
+    if not keys:
+        return {}
+    return {(row.producto_id, row.sucursal_id): row for row in session.execute(rows_stmt(keys))}
+
+
+def check_available(requested, rows):
+    # Separa las líneas sin fila de stock y las que superan el disponible (stock - reservado)
+    missing, insufficient = [], []
+    for key, quantity in requested.items():
+        row = rows.get(key)
+        if row is None:
+            missing.append({'producto_id': key[0], 'sucursal_id': key[1], 'requested': quantity})
+        elif row.stock - row.reservado < quantity:
+            insufficient.append({'producto_id': key[0], 'sucursal_id': key[1],
+                                 'requested': quantity, 'available': row.stock - row.reservado})
+    return missing, insufficient
+
+
+def _take_stock(session, quantities, require_available=False):
+    # Un solo UPDATE que descuenta stock de varias filas: `quantities` es {productos_sucursales.id: cantidad}.
+    # Nunca deja stock negativo; require_available=True además exige que stock - reservado alcance.
+    # Las filas que no cumplen no se descuentan ni se devuelven.
+    quantity = case(quantities, value=productos_sucursales.c.id)
+    stmt = (update(productos_sucursales)
+            .where(productos_sucursales.c.id.in_(list(quantities)), productos_sucursales.c.stock >= quantity)
+            .values(stock=productos_sucursales.c.stock - quantity))
+    if require_available:
+        stmt = stmt.where(available_stock() >= quantity)
+    stmt = stmt.returning(productos_sucursales.c.id, productos_sucursales.c.producto_id,
+                          productos_sucursales.c.sucursal_id, productos_sucursales.c.stock)
+    rows = session.execute(stmt).all()
+    availability.defer_refresh(session, {row.producto_id for row in rows})
+    return rows
+
+
+def _updated_items(rows, locked, quantities):
+    items = []
+    for row in rows:
+        names = locked[(row.producto_id, row.sucursal_id)]
+        items.append({
+            'producto_id': row.producto_id,
+            'producto_nombre': names.producto_nombre,
+            'sucursal_id': row.sucursal_id,
+            'sucursal_nombre': names.sucursal_nombre,
+            'quantity': quantities[row.id],
+            'stock': row.stock,
+        })
+    return items
+
+
+def decrement_stock(session, lines, locked=None):
+    # Descuenta el stock disponible de un carro con un único UPDATE condicional.
+    # Devuelve {'updated': [...], 'insufficient': [...], 'missing': [...]}; las líneas sin stock
+    # suficiente no se descuentan (el resto sí), y se informan todas juntas al llamador.
+    requested = aggregate_lines(lines)
+    result = {'updated': [], 'insufficient': [], 'missing': []}
+    if not requested:
+        return result
+    if locked is None:
+        locked = lock_rows(session, requested)
+    result['missing'], result['insufficient'] = check_available(requested, locked)
+    rejected = {(item['producto_id'], item['sucursal_id']) for item in result['missing'] + result['insufficient']}
+    to_update = {locked[key].id: quantity for key, quantity in requested.items() if key not in rejected}
+    if not to_update:
+        return result
+
+    rows = _take_stock(session, to_update, require_available=True)
+    result['updated'] = _updated_items(rows, locked, to_update)
+    # Sin bloqueo de filas (SQLite) o con una reserva nueva entre medio: la condición del UPDATE lo detecta
+    returned = {row.id for row in rows}
+    for row_id, quantity in to_update.items():
+        if row_id not in returned:
+            row = next(r for r in locked.values() if r.id == row_id)
+            result['insufficient'].append({'producto_id': row.producto_id, 'sucursal_id': row.sucursal_id,
+                                           'requested': quantity, 'available': None})
+    result['updated'].sort(key=lambda item: (item['producto_id'], item['sucursal_id']))
+    return result
+
+
+def reservation_lock_stmt(row_ids):
+    # Un único SELECT con un advisory lock de transacción por fila de stock. Se evalúan de izquierda
+    # a derecha en orden de id: dos carros con filas en común no se bloquean mutuamente.
+    return select(*(func.pg_advisory_xact_lock(RESERVATION_LOCK_CLASS, row_id) for row_id in sorted(row_ids)))
+
+
+def lock_for_reservation(session, row_ids):
+    # Serializa las reservas de las mismas filas de stock hasta el commit (solo PostgreSQL; SQLite ya
+    # serializa las escrituras). No bloquea la fila de productos_sucursales.
+    if row_ids and session.get_bind().dialect.name == 'postgresql':
+        session.execute(reservation_lock_stmt(row_ids))
+
+
+def reserve_stock(session, orden_id, lines, ttl_seconds):
+    # Aparta todas las líneas de la orden o ninguna con un INSERT ... SELECT condicional en
+    # reservas_stock. Si 'ok' es False el llamador debe hacer rollback; si es True debe confirmar
+    # enseguida (el commit suelta los advisory locks de lock_for_reservation).
+    requested = aggregate_lines(lines)
+    expires_at = utcnow() + timedelta(seconds=ttl_seconds)
+    result = {'ok': False, 'expires_at': expires_at, 'insufficient': [], 'missing': []}
+    rows = current_rows(session, requested)
+    result['missing'], result['insufficient'] = check_available(requested, rows)
+    if result['missing'] or result['insufficient']:
+        return result
+
+    quantities = {rows[key].id: quantity for key, quantity in requested.items()}
+    # Con el lock tomado, el INSERT (nueva instantánea en READ COMMITTED) ve las reservas ya confirmadas
+    lock_for_reservation(session, quantities)
+    quantity = case(quantities, value=productos_sucursales.c.id)
+    inserted = session.execute(
+        insert(reservas_stock).from_select(
+            ['orden_id', 'producto_id', 'sucursal_id', 'quantity', 'status', 'expires_at'],
+            select(literal(orden_id), productos_sucursales.c.producto_id, productos_sucursales.c.sucursal_id,
+                   quantity, literal(RESERVATION_ACTIVE), literal(expires_at, DateTime))
+            .where(productos_sucursales.c.id.in_(list(quantities)), available_stock() >= quantity)
+            .order_by(productos_sucursales.c.id)
+        ).returning(reservas_stock.c.producto_id, reservas_stock.c.sucursal_id)
+    ).all()
+    if len(inserted) != len(quantities):
+        held = {(row.producto_id, row.sucursal_id) for row in inserted}
+        result['insufficient'] = [{'producto_id': key[0], 'sucursal_id': key[1], 'requested': quantity, 'available': None}
+                                  for key, quantity in requested.items() if key not in held]
+        return result
+
+    availability.defer_refresh(session, {key[0] for key in requested})
+    result['ok'] = True
+    return result
+
+
+def release_reservations(session, orden_ids, status=RESERVATION_RELEASED):
+    # Devuelve al disponible las unidades apartadas por las órdenes (rechazo, cancelación o vencimiento)
+    product_ids = session.execute(
+        update(reservas_stock)
+        .where(reservas_stock.c.orden_id.in_(list(orden_ids)), reservas_stock.c.status == RESERVATION_ACTIVE)
+        .values(status=status)
+        .returning(reservas_stock.c.producto_id)
+    ).scalars().all()
+    if product_ids:
+        availability.defer_refresh(session, set(product_ids))
+    return len(product_ids)
+
+
+def convert_reservations(session, orden_id, lines):
+    # Pago aprobado: las líneas con reserva vigente pasan de reservado a descontado (ya estaban
+    # garantizadas); las que no la tienen (venció antes del pago) se descuentan del disponible.
+    requested = aggregate_lines(lines)
+    now = utcnow()
+    holds = session.execute(
+        update(reservas_stock)
+        .where(reservas_stock.c.orden_id == orden_id, reservas_stock.c.status == RESERVATION_ACTIVE,
+               reservas_stock.c.expires_at > now)
+        .values(status=RESERVATION_CONVERTED)
+        .returning(reservas_stock.c.producto_id, reservas_stock.c.sucursal_id, reservas_stock.c.quantity)
+    ).all()
+    # Las vencidas que el barrido aún no marcó ya no contaban en el disponible
+    session.execute(update(reservas_stock)
+                    .where(reservas_stock.c.orden_id == orden_id, reservas_stock.c.status == RESERVATION_ACTIVE)
+                    .values(status=RESERVATION_EXPIRED))
+    held = aggregate_lines((hold.producto_id, hold.sucursal_id, hold.quantity) for hold in holds)
+    locked = lock_rows(session, set(requested) | set(held)) # un único bloqueo ordenado para ambos casos
+
+    result = {'updated': [], 'insufficient': [], 'missing': []}
+    quantities = {locked[key].id: quantity for key, quantity in held.items() if key in locked}
+    if quantities:
+        rows = _take_stock(session, quantities)
+        result['updated'] = _updated_items(rows, locked, quantities)
+        # El stock se editó por debajo de la reserva mientras estaba vigente: esa línea no se
+        # descuenta (no se deja stock negativo) y su reserva queda liberada, no convertida
+        returned = {row.id for row in rows}
+        failed = [key for key in held if key in locked and locked[key].id not in returned]
+        if failed:
+            session.execute(update(reservas_stock)
+                            .where(reservas_stock.c.orden_id == orden_id, reservas_stock.c.status == RESERVATION_CONVERTED,
+                                   tuple_(reservas_stock.c.producto_id, reservas_stock.c.sucursal_id).in_(failed))
+                            .values(status=RESERVATION_RELEASED))
+            availability.defer_refresh(session, {key[0] for key in failed})
+            result['insufficient'] = [{'producto_id': key[0], 'sucursal_id': key[1], 'requested': held[key],
+                                       'available': locked[key].stock} for key in failed]
+
+    remaining = [(key[0], key[1], quantity - held.get(key, 0))
+                 for key, quantity in requested.items() if quantity > held.get(key, 0)]
+    if remaining:
+        unheld = decrement_stock(session, remaining, locked=locked)
+        result['updated'].extend(unheld['updated'])
+        result['insufficient'].extend(unheld['insufficient'])
+        result['missing'] = unheld['missing']
+    result['updated'].sort(key=lambda item: (item['producto_id'], item['sucursal_id']))
+    return result
+
+
+def expire_reservations(session, now=None, limit=500):
+    # Marca EXPIRED hasta `limit` reservas vencidas; devuelve cuántas. Ya no contaban en el
+    # disponible: el barrido mantiene chico el índice de reservas activas y refresca los documentos.
+    # SKIP LOCKED: dos barridos simultáneos (p. ej. dos checkouts) no se esperan.
+    now = now or utcnow()
+    expired = (select(reservas_stock.c.id)
+               .where(reservas_stock.c.status == RESERVATION_ACTIVE, reservas_stock.c.expires_at < now)
+               .order_by(reservas_stock.c.id)
+               .limit(limit)
+               .with_for_update(skip_locked=True))
+    product_ids = session.execute(
+        update(reservas_stock)
+        .where(reservas_stock.c.id.in_(expired))
+        .values(status=RESERVATION_EXPIRED)
+        .returning(reservas_stock.c.producto_id)
+    ).scalars().all()
+    if product_ids:
+        availability.defer_refresh(session, set(product_ids))
+    return len(product_ids)
+
+
+def low_stock_alerts(updated, threshold):
+    # Alertas SSE a partir de las filas devueltas por decrement_stock / convert_reservations
+    return [{
+        'product_id': item['producto_id'],
+        'product_name': item['producto_nombre'],
+        'sucursal_id': item['sucursal_id'],
+        'sucursal_name': item['sucursal_nombre'],
+        'current_stock': item['stock'],
+    } for item in updated if item['stock'] <= threshold]
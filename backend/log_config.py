@@ -0,0 +1,266 @@
+# Archivo: backend/log_config.py
+# Logging estructurado y sin bloqueo para la app Flask y los servidores gRPC:
+#  - los hilos de las peticiones solo encolan el registro (QueueHandler); un hilo de fondo
+#    (QueueListener) lo formatea y lo escribe. Con la cola llena el registro se descarta y se
+#    cuenta, nunca se espera.
+#  - el mensaje se formatea en el hilo de fondo y solo si el nivel está activo: se usa
+#    log.debug("... %s", valor) y no f-strings, para no construir textos que nadie lee
+#  - cada registro lleva el request_id de la petición o RPC en curso (contextvar)
+#  - eventos de alto volumen se muestrean con extra=sampled(): solo pasa una fracción
+#  - salida JSON de una línea (LOG_FORMAT=json, por defecto) o texto legible (LOG_FORMAT=text)
+# Variables: LOG_LEVEL (INFO), LOG_FORMAT, LOG_QUEUE_SIZE (10000), LOG_SAMPLE_RATE (0.01).
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import uuid
+from logging.handlers import QueueHandler, QueueListener
+
+import grpc
+
+LOGGER_NAME = 'ferremas'
+REQUEST_ID_HEADER = 'X-Request-ID'
+REQUEST_ID_METADATA = 'x-request-id'
+MAX_REQUEST_ID_LENGTH = 128
+LOG_SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', 0.01))
+
+# Atributos estándar de LogRecord; el resto (extra=...) va al JSON como campos propios
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+
+_request_id = contextvars.ContextVar('ferremas_request_id', default=None)
+
+
+def get_logger(component):
+    return logging.getLogger(f'{LOGGER_NAME}.{component}')
+
+
+# --- Request id ---
+def new_request_id():
+    return uuid.uuid4().hex
+
+
+def bind_request_id(request_id=None):
+    # Usa el id recibido (cabecera o metadata) si es razonable; si no, genera uno
+    if not request_id or len(request_id) > MAX_REQUEST_ID_LENGTH or not request_id.isprintable():
+        request_id = new_request_id()
+    _request_id.set(request_id)
+    return request_id
+
+
+def clear_request_id():
+    _request_id.set(None)
+
+
+def current_request_id():
+    return _request_id.get()
+
+
+def sampled(rate=None):
+    # extra= para eventos de alto volumen: log.debug("...", extra=sampled())
+    return {'sample_rate': LOG_SAMPLE_RATE if rate is None else rate}
+
+
+# --- Formato ---
+class JsonFormatter(logging.Formatter):
+    def __init__(self, service):
+        super().__init__()
+        self.service = service
+
+    def format(self, record):
+        data = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f'.{int(record.msecs):03d}Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'service': self.service,
+            'msg': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and value is not None:
+                data[key] = value
+        if record.exc_info:
+            data['exc'] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self, service):
+        super().__init__('%(asctime)s %(levelname)s (%(name)s) [%(request_id)s] %(message)s')
+        self.service = service
+
+    def format(self, record):
+        if not hasattr(record, 'request_id'):
+            record.request_id = '-'
+        return super().format(record)
+
+
+# --- Cola ---
+class ContextQueueHandler(QueueHandler):
+    # Solo captura el contexto (request_id) en el hilo de la petición; no formatea el mensaje.
+    # La cola es del mismo proceso, así que el registro viaja tal cual al hilo de fondo.
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self.sampled_out = 0
+
+    def filter(self, record):
+        rate = getattr(record, 'sample_rate', None)
+        if rate is not None and rate < 1 and random.random() >= rate:
+            self.sampled_out += 1
+            return False
+        return super().filter(record)
+
+    def prepare(self, record):
+        if getattr(record, 'request_id', None) is None:
+            record.request_id = _request_id.get()
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_state_lock = threading.Lock()
+_state = {}
+
+
+def configure(service, level=None, fmt=None, stream=None):
+    # Idempotente: la primera llamada del proceso instala la cola y el hilo escritor
+    with _state_lock:
+        if _state:
+            return _state['handler']
+        level = (level or os.environ.get('LOG_LEVEL', 'INFO')).upper()
+        fmt = (fmt or os.environ.get('LOG_FORMAT', 'json')).lower()
+        output = logging.StreamHandler(stream or sys.stdout)
+        output.setFormatter(TextFormatter(service) if fmt == 'text' else JsonFormatter(service))
+        log_queue = queue.Queue(int(os.environ.get('LOG_QUEUE_SIZE', 10000)))
+        handler = ContextQueueHandler(log_queue)
+        listener = QueueListener(log_queue, output, respect_handler_level=True)
+        logger = logging.getLogger(LOGGER_NAME)
+        logger.setLevel(level)
+        logger.addHandler(handler)
+        logger.propagate = False
+        listener.start()
+        _state.update(handler=handler, listener=listener, output=output, queue=log_queue)
+        atexit.register(shutdown)
+        if hasattr(os, 'register_at_fork'):
+            # El hilo escritor no sobrevive al fork (gunicorn --preload): cada hijo inicia el suyo
+            os.register_at_fork(after_in_child=_restart_listener)
+        return handler
+
+
+def _restart_listener():
+    listener = _state.get('listener')
+    if listener is None:
+        return
+    listener._thread = None
+    listener.start()
+
+
+def shutdown():
+    # Vacía la cola antes de salir (atexit)
+    listener = _state.get('listener')
+    if listener is not None and listener._thread is not None:
+        listener.stop()
+
+
+def stats():
+    handler = _state.get('handler')
+    if handler is None:
+        return {'configured': False}
+    return {
+        'configured': True,
+        'queued': handler.queue.qsize(),
+        'dropped': handler.dropped,
+        'sampled_out': handler.sampled_out,
+    }
+
+
+# --- gRPC ---
+def _rpc_request_id(context):
+    for key, value in context.invocation_metadata() or ():
+        if key == REQUEST_ID_METADATA:
+            return value
+    return None
+
+
+class GrpcRequestIdInterceptor(grpc.ServerInterceptor):
+    # Toma x-request-id de la metadata (o genera uno) y lo devuelve en la metadata inicial
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        if handler is None:
+            return None
+
+        def bind(context):
+            request_id = bind_request_id(_rpc_request_id(context))
+            context.send_initial_metadata(((REQUEST_ID_METADATA, request_id),))
+
+        def unary(behavior):
+            def wrapper(request, context):
+                bind(context)
+                try:
+                    return behavior(request, context)
+                finally:
+                    clear_request_id()
+            return wrapper
+
+        def stream(behavior):
+            def wrapper(request, context):
+                bind(context)
+                try:
+                    yield from behavior(request, context)
+                finally:
+                    clear_request_id()
+            return wrapper
+
+        return wrap_rpc_handler(handler, unary, stream)
+
+
+class AsyncGrpcRequestIdInterceptor(grpc.aio.ServerInterceptor):
+    # Cada RPC de grpc.aio corre en su propia tarea: el contextvar no se mezcla entre RPC
+    async def intercept_service(self, continuation, handler_call_details):
+        handler = await continuation(handler_call_details)
+        if handler is None:
+            return None
+
+        async def bind(context):
+            request_id = bind_request_id(_rpc_request_id(context))
+            await context.send_initial_metadata(((REQUEST_ID_METADATA, request_id),))
+
+        def unary(behavior):
+            async def wrapper(request, context):
+                await bind(context)
+                return await behavior(request, context)
+            return wrapper
+
+        def stream(behavior):
+            async def wrapper(request, context):
+                await bind(context)
+                async for response in behavior(request, context):
+                    yield response
+            return wrapper
+
+        return wrap_rpc_handler(handler, unary, stream)
+
+
+def wrap_rpc_handler(handler, unary, stream):
+    # Rehace un RpcMethodHandler envolviendo su comportamiento: unary(fn) para las RPC que
+    # devuelven un mensaje, stream(fn) para las que devuelven un stream
+    if handler.unary_unary:
+        return grpc.unary_unary_rpc_method_handler(
+            unary(handler.unary_unary), handler.request_deserializer, handler.response_serializer)
+    if handler.unary_stream:
+        return grpc.unary_stream_rpc_method_handler(
+            stream(handler.unary_stream), handler.request_deserializer, handler.response_serializer)
+    if handler.stream_unary:
+        return grpc.stream_unary_rpc_method_handler(
+            unary(handler.stream_unary), handler.request_deserializer, handler.response_serializer)
+    return grpc.stream_stream_rpc_method_handler(
+        stream(handler.stream_stream), handler.request_deserializer, handler.response_serializer)
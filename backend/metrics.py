@@ -0,0 +1,418 @@
+# Archivo: backend/metrics.py
+# Métricas de Prometheus con prometheus_client:
+#  - latencia por ruta de Flask y por método gRPC (histogramas)
+#  - sentencias SQL y tiempo de base de datos por petición, con los eventos del engine
+#  - espera al pedir una conexión al pool (TimedQueuePool)
+#  - latencia de los servicios externos (Transbank, tipo de cambio)
+#  - valores que se leen del proceso al momento (suscriptores SSE, estado del pool, ...): ver
+#    register_collector
+# Varios workers de gunicorn: con PROMETHEUS_MULTIPROC_DIR (definida antes de arrancar, ver
+# gunicorn.conf.py) cada proceso escribe sus valores en ese directorio y render() devuelve la
+# suma de todos con multiprocess.MultiProcessCollector. Los servidores gRPC exponen los suyos con
+# start_http_server en METRICS_PORT.
+import contextvars
+import os
+import threading
+import time
+import weakref
+
+import grpc
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram,
+                               generate_latest, multiprocess)
+from prometheus_client import start_http_server as _start_http_server
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+import log_config
+
+log = log_config.get_logger('metrics')
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 250)
+# Cada cuánto copia cada worker sus valores de register_collector al directorio compartido
+SAMPLE_INTERVAL = float(os.environ.get('METRICS_SAMPLE_INTERVAL', 5))
+
+
+def multiprocess_dir():
+    return os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+
+
+# --- Valores calculados al leer (register_collector) ---
+# fn() -> [(nombre, 'gauge' | 'counter', ayuda, [(etiquetas dict, valor)])]. En un solo proceso se
+# evalúan en cada lectura. Con PROMETHEUS_MULTIPROC_DIR los demás workers no pueden evaluarlos, así
+# que cada worker los copia cada SAMPLE_INTERVAL segundos (y al atender /metrics) a métricas de
+# prometheus_client: los gauges con la etiqueta pid (se borran al morir el worker) y los contadores
+# sumando lo que avanzaron (se conservan al morir).
+_collectors = []
+
+
+def _collect_callbacks():
+    families = []
+    for collect in list(_collectors):
+        try:
+            families.extend(collect())
+        except Exception as e: # un valor calculado que falla no debe tumbar /metrics
+            log.warning("Falló un colector de métricas: %s", e)
+    return families
+
+
+class _CallbackCollector:
+    def collect(self):
+        for name, kind, documentation, samples in _collect_callbacks():
+            labelnames = list(samples[0][0]) if samples else []
+            family_class = CounterMetricFamily if kind == 'counter' else GaugeMetricFamily
+            family = family_class(name, documentation, labels=labelnames)
+            for labels, value in samples:
+                family.add_metric([str(labels[label]) for label in labelnames], value)
+            yield family
+
+
+class _CallbackSampler:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+        self._last = {} # (nombre, etiquetas) -> último valor de un contador, para sumar la diferencia
+        self._pid = None
+
+    def ensure_started(self):
+        # Arranque perezoso por proceso (los hilos no sobreviven al fork de gunicorn)
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._last = {}
+        threading.Thread(target=self._run, name='metrics-sampler', daemon=True).start()
+
+    def _run(self):
+        pid = os.getpid()
+        while self._pid == pid:
+            self.sample()
+            time.sleep(SAMPLE_INTERVAL)
+
+    def _metric(self, name, kind, documentation, labelnames):
+        metric = self._metrics.get(name)
+        if metric is None:
+            if kind == 'counter':
+                metric = Counter(name, documentation, labelnames, registry=None)
+            else:
+                metric = Gauge(name, documentation, labelnames, registry=None, multiprocess_mode='liveall')
+            self._metrics[name] = metric
+        return metric
+
+    def sample(self):
+        with self._lock:
+            for name, kind, documentation, samples in _collect_callbacks():
+                for labels, value in samples:
+                    metric = self._metric(name, kind, documentation, list(labels))
+                    child = metric.labels(**labels) if labels else metric
+                    if kind == 'counter':
+                        key = (name, tuple(sorted(labels.items())))
+                        delta = value - self._last.get(key, 0)
+                        self._last[key] = value
+                        if delta > 0:
+                            child.inc(delta)
+                    else:
+                        child.set(value)
+
+
+_sampler = _CallbackSampler()
+if multiprocess_dir() is None:
+    REGISTRY.register(_CallbackCollector())
+
+
+def register_collector(fn):
+    # Se puede usar como decorador
+    _collectors.append(fn)
+    return fn
+
+
+def ensure_started():
+    # Llamar en cada petición/RPC: con PROMETHEUS_MULTIPROC_DIR arranca el muestreo en este worker
+    if multiprocess_dir() is not None:
+        _sampler.ensure_started()
+
+
+def exposition_registry():
+    if multiprocess_dir() is None:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def render():
+    # Texto para /metrics: este proceso, o la suma de todos los del directorio compartido
+    if multiprocess_dir() is not None:
+        ensure_started()
+        _sampler.sample()
+    return generate_latest(exposition_registry())
+
+
+HTTP_REQUEST_DURATION = Histogram(
+    'ferremas_http_request_duration_seconds', 'Latencia de las peticiones HTTP por ruta de Flask.',
+    ('route', 'method', 'status'), buckets=DEFAULT_BUCKETS)
+GRPC_HANDLING_DURATION = Histogram(
+    'ferremas_grpc_server_handling_seconds', 'Latencia de las RPC por método y código de estado.',
+    ('method', 'code'), buckets=DEFAULT_BUCKETS)
+REQUEST_DB_QUERIES = Histogram(
+    'ferremas_request_db_queries', 'Sentencias SQL ejecutadas por petición HTTP o RPC.',
+    ('handler',), buckets=QUERY_COUNT_BUCKETS)
+REQUEST_DB_DURATION = Histogram(
+    'ferremas_request_db_seconds', 'Tiempo total en la base de datos por petición HTTP o RPC.', ('handler',),
+    buckets=DEFAULT_BUCKETS)
+QUERY_BUDGET_EXCEEDED = Counter(
+    'ferremas_query_budget_exceeded', 'Peticiones que superaron el presupuesto de sentencias SQL.',
+    ('handler',))
+SQL_DURATION = Histogram(
+    'ferremas_db_statement_seconds', 'Duración de cada sentencia SQL.', ('operation',), buckets=DEFAULT_BUCKETS)
+POOL_CHECKOUT_WAIT = Histogram(
+    'ferremas_db_pool_checkout_wait_seconds', 'Espera para obtener una conexión del pool (incluye abrir una nueva).',
+    buckets=DEFAULT_BUCKETS)
+UPSTREAM_DURATION = Histogram(
+    'ferremas_upstream_request_duration_seconds', 'Latencia de las llamadas a servicios externos.',
+    ('service', 'operation', 'outcome'), buckets=DEFAULT_BUCKETS)
+
+
+def observe_upstream(service, operation, seconds, outcome):
+    # outcome: código HTTP de la respuesta, o 'error' si no hubo respuesta
+    UPSTREAM_DURATION.labels(service=service, operation=operation, outcome=outcome).observe(seconds)
+
+
+# --- Sentencias SQL por petición ---
+# Cada petición (o RPC) abre un RequestStats en su contexto; los eventos del engine suman en él.
+class RequestStats:
+    __slots__ = ('queries', 'db_seconds', 'started')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.started = time.perf_counter()
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+_current_request = contextvars.ContextVar('ferremas_request_stats', default=None)
+
+
+def current_request():
+    return _current_request.get()
+
+
+def begin_request():
+    stats = RequestStats()
+    _current_request.set(stats)
+    return stats
+
+
+def finish_request(handler, query_budget=None):
+    # Registra las sentencias y el tiempo de base de datos de la petición en curso.
+    # Devuelve su RequestStats (None si no se abrió) y si superó el presupuesto.
+    stats = _current_request.get()
+    _current_request.set(None)
+    if stats is None:
+        return None, False
+    REQUEST_DB_QUERIES.labels(handler=handler).observe(stats.queries)
+    REQUEST_DB_DURATION.labels(handler=handler).observe(stats.db_seconds)
+    exceeded = bool(query_budget) and stats.queries > query_budget
+    if exceeded:
+        QUERY_BUDGET_EXCEEDED.labels(handler=handler).inc()
+        log.warning("%s ejecutó %d sentencias SQL (presupuesto %d, %.1f ms en la base)",
+                    handler, stats.queries, query_budget, stats.db_seconds * 1000,
+                    extra={'handler': handler, 'queries': stats.queries, 'db_ms': round(stats.db_seconds * 1000, 1)})
+    return stats, exceeded
+
+
+def _statement_operation(statement):
+    keyword = statement.lstrip()[:8].split(None, 1)
+    keyword = keyword[0].upper() if keyword else ''
+    return keyword if keyword in ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH', 'COPY') else 'OTHER'
+
+
+_instrumented_engines = weakref.WeakSet()
+
+
+def instrument_engine(engine):
+    # engine: Engine síncrono (para AsyncEngine, su .sync_engine). Idempotente.
+    if engine in _instrumented_engines:
+        return engine
+    _instrumented_engines.add(engine)
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _start_statement(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('metrics_statement_start', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _end_statement(conn, cursor, statement, parameters, context, executemany):
+        _record_statement(conn, statement)
+
+    @event.listens_for(engine, 'handle_error')
+    def _failed_statement(exception_context):
+        if exception_context.connection is not None and exception_context.statement:
+            _record_statement(exception_context.connection, exception_context.statement)
+
+    return engine
+
+
+def _record_statement(conn, statement):
+    starts = conn.info.get('metrics_statement_start')
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    SQL_DURATION.labels(operation=_statement_operation(statement)).observe(elapsed)
+    stats = _current_request.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+
+
+class _TimedCheckout:
+    # Mide cuánto espera cada checkout (con el pool agotado, hasta pool_timeout)
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            POOL_CHECKOUT_WAIT.observe(time.perf_counter() - started)
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+
+def pool_collector(engine, name='default'):
+    # Estado del pool del engine en cada lectura (solo QueuePool informa tamaño y desborde)
+    def collect():
+        pool = engine.pool
+        if not isinstance(pool, QueuePool):
+            return []
+        labels = {'pool': name}
+        return [
+            ('ferremas_db_pool_checked_out', 'gauge', 'Conexiones en uso.', [(labels, pool.checkedout())]),
+            ('ferremas_db_pool_size', 'gauge', 'Tamaño configurado del pool.', [(labels, pool.size())]),
+            ('ferremas_db_pool_overflow', 'gauge', 'Conexiones por sobre pool_size (negativo: aún no abiertas).',
+             [(labels, pool.overflow())]),
+        ]
+    return collect
+
+
+# --- gRPC ---
+def _rpc_code(context, default='OK'):
+    code = context.code() if hasattr(context, 'code') else None
+    if code is None:
+        return default
+    return code.name if isinstance(code, grpc.StatusCode) else str(code)
+
+
+class _RpcObservation:
+    # Mide una RPC: latencia por método/código y las sentencias SQL que ejecutó
+    def __init__(self, method, query_budget):
+        self.method = method
+        self.query_budget = query_budget
+        self.code = None
+        ensure_started()
+        begin_request()
+        self.started = time.perf_counter()
+
+    def failed(self, context, error):
+        self.code = _rpc_code(context, default='UNKNOWN')
+        if self.code == 'OK': # excepción sin context.abort: gRPC responde UNKNOWN
+            self.code = 'UNKNOWN'
+
+    def finish(self, context):
+        code = self.code or _rpc_code(context)
+        GRPC_HANDLING_DURATION.labels(method=self.method, code=code).observe(time.perf_counter() - self.started)
+        finish_request(self.method, self.query_budget)
+
+
+class GrpcMetricsInterceptor(grpc.ServerInterceptor):
+    # Interceptor para grpc.server (pool de hilos)
+    def __init__(self, query_budget=None):
+        self.query_budget = query_budget
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        if handler is None:
+            return None
+        method = handler_call_details.method
+
+        def unary(behavior):
+            def wrapper(request, context):
+                observation = _RpcObservation(method, self.query_budget)
+                try:
+                    return behavior(request, context)
+                except BaseException as e:
+                    observation.failed(context, e)
+                    raise
+                finally:
+                    observation.finish(context)
+            return wrapper
+
+        def stream(behavior):
+            def wrapper(request, context):
+                # La RPC termina cuando se consume (o se abandona) el último mensaje
+                observation = _RpcObservation(method, self.query_budget)
+                try:
+                    yield from behavior(request, context)
+                except BaseException as e:
+                    observation.failed(context, e)
+                    raise
+                finally:
+                    observation.finish(context)
+            return wrapper
+
+        return log_config.wrap_rpc_handler(handler, unary, stream)
+
+
+class AsyncGrpcMetricsInterceptor(grpc.aio.ServerInterceptor):
+    # Interceptor para grpc.aio.server; cada RPC corre en su propia tarea (contexto propio)
+    def __init__(self, query_budget=None):
+        self.query_budget = query_budget
+
+    async def intercept_service(self, continuation, handler_call_details):
+        handler = await continuation(handler_call_details)
+        if handler is None:
+            return None
+        method = handler_call_details.method
+
+        def unary(behavior):
+            async def wrapper(request, context):
+                observation = _RpcObservation(method, self.query_budget)
+                try:
+                    return await behavior(request, context)
+                except BaseException as e:
+                    observation.failed(context, e)
+                    raise
+                finally:
+                    observation.finish(context)
+            return wrapper
+
+        def stream(behavior):
+            async def wrapper(request, context):
+                observation = _RpcObservation(method, self.query_budget)
+                try:
+                    async for response in behavior(request, context):
+                        yield response
+                except BaseException as e:
+                    observation.failed(context, e)
+                    raise
+                finally:
+                    observation.finish(context)
+            return wrapper
+
+        return log_config.wrap_rpc_handler(handler, unary, stream)
+
+
+# --- Exposición para procesos sin Flask (servidores gRPC) ---
+def start_http_server(port, host='0.0.0.0'):
+    server, _ = _start_http_server(port, addr=host, registry=exposition_registry())
+    log.info("/metrics disponible en el puerto %d", server.server_address[1])
+    return server
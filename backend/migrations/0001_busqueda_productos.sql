@@ -0,0 +1,20 @@
+-- Búsqueda de productos indexada (PostgreSQL).
+-- Texto completo sobre nombre, marca y descripción + trigramas sobre el nombre,
+-- ambos sin tildes ("martillo" encuentra "Martíllo").
+CREATE EXTENSION IF NOT EXISTS unaccent;
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- unaccent() es STABLE; se envuelve en una función IMMUTABLE para poder indexarla.
+CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text AS
+$func$ SELECT public.unaccent('public.unaccent', $1) $func$
+LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT;
+
+ALTER TABLE productos ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple'::regconfig, f_unaccent(lower(coalesce(nombre, '')))), 'A') ||
+        setweight(to_tsvector('simple'::regconfig, f_unaccent(lower(coalesce(marca, '')))), 'B') ||
+        setweight(to_tsvector('simple'::regconfig, f_unaccent(lower(coalesce(description, '')))), 'C')
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS ix_productos_search_vector ON productos USING gin (search_vector);
+CREATE INDEX IF NOT EXISTS ix_productos_nombre_trgm ON productos USING gin (f_unaccent(lower(nombre)) gin_trgm_ops);
@@ -0,0 +1,21 @@
+-- Almacén de imágenes direccionado por contenido.
+-- Tras aplicarla, ejecutar `flask --app app migrate-images` para mover los datos
+-- de productos.imagen_base64 a la tabla imagenes.
+CREATE TABLE IF NOT EXISTS imagenes (
+    sha256 VARCHAR(64) PRIMARY KEY,
+    mime_type VARCHAR(50) NOT NULL,
+    size INTEGER NOT NULL,
+    data BYTEA NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS imagenes_miniaturas (
+    original_sha256 VARCHAR(64) NOT NULL REFERENCES imagenes (sha256),
+    size INTEGER NOT NULL,
+    miniatura_sha256 VARCHAR(64) NOT NULL REFERENCES imagenes (sha256),
+    PRIMARY KEY (original_sha256, size)
+);
+
+ALTER TABLE productos ADD COLUMN IF NOT EXISTS imagen_hash VARCHAR(64) REFERENCES imagenes (sha256);
+-- PNG/JPEG ya vienen comprimidos: se guardan fuera de línea (TOAST) sin intentar recomprimirlos
+ALTER TABLE imagenes ALTER COLUMN data SET STORAGE EXTERNAL;
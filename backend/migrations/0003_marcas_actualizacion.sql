@@ -0,0 +1,24 @@
+-- Marca de última modificación en productos y productos_sucursales, usada por
+-- StreamCatalog (since_ms) para la sincronización incremental del catálogo.
+ALTER TABLE productos ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP;
+ALTER TABLE productos_sucursales ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP;
+
+CREATE INDEX IF NOT EXISTS ix_productos_updated_at ON productos (updated_at);
+CREATE INDEX IF NOT EXISTS ix_productos_sucursales_updated_at ON productos_sucursales (updated_at);
+
+-- La ORM ya actualiza la columna (onupdate); el trigger cubre los UPDATE hechos por fuera de ella.
+CREATE OR REPLACE FUNCTION set_updated_at() RETURNS trigger AS
+$func$
+BEGIN
+    NEW.updated_at := CURRENT_TIMESTAMP;
+    RETURN NEW;
+END
+$func$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_productos_updated_at ON productos;
+CREATE TRIGGER trg_productos_updated_at BEFORE UPDATE ON productos
+    FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+
+DROP TRIGGER IF EXISTS trg_productos_sucursales_updated_at ON productos_sucursales;
+CREATE TRIGGER trg_productos_sucursales_updated_at BEFORE UPDATE ON productos_sucursales
+    FOR EACH ROW EXECUTE FUNCTION set_updated_at();
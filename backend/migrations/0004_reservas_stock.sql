@@ -0,0 +1,20 @@
+-- Reservas de stock tomadas al crear la orden (ver backend/inventory.py).
+-- El disponible es stock - SUM(reservas ACTIVE vigentes); la fila de productos_sucursales no cambia.
+
+CREATE TABLE IF NOT EXISTS reservas_stock (
+    id SERIAL PRIMARY KEY,
+    orden_id INTEGER NOT NULL REFERENCES ordenes (id),
+    producto_id INTEGER NOT NULL,
+    sucursal_id INTEGER NOT NULL,
+    quantity INTEGER NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'ACTIVE',
+    expires_at TIMESTAMP NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS ix_reservas_stock_orden_id ON reservas_stock (orden_id);
+-- Barrido de reservas vencidas: status = 'ACTIVE' AND expires_at < now
+CREATE INDEX IF NOT EXISTS ix_reservas_stock_status_expires_at ON reservas_stock (status, expires_at);
+-- Suma de las reservas activas por fila de stock (catalog_queries.held_quantity), solo con el índice
+CREATE INDEX IF NOT EXISTS ix_reservas_stock_activas ON reservas_stock (producto_id, sucursal_id)
+    INCLUDE (quantity, expires_at) WHERE status = 'ACTIVE';
@@ -0,0 +1,23 @@
+-- Outbox de pagos: llamadas a Transbank pendientes, procesadas fuera de la petición HTTP
+-- (ver backend/payments.py). La orden guarda el token de Webpay para ubicarla al volver del pago.
+ALTER TABLE ordenes ADD COLUMN IF NOT EXISTS token_ws VARCHAR(100);
+CREATE INDEX IF NOT EXISTS ix_ordenes_token_ws ON ordenes (token_ws);
+
+CREATE TABLE IF NOT EXISTS pagos_outbox (
+    id SERIAL PRIMARY KEY,
+    orden_id INTEGER NOT NULL REFERENCES ordenes (id),
+    kind VARCHAR(10) NOT NULL,
+    token VARCHAR(100),
+    status VARCHAR(20) NOT NULL DEFAULT 'PENDING',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMP NOT NULL,
+    locked_until TIMESTAMP,
+    last_error TEXT,
+    result TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS ix_pagos_outbox_orden_id ON pagos_outbox (orden_id);
+-- Los workers buscan: status = 'PENDING' AND next_attempt_at <= now, por orden de next_attempt_at
+CREATE INDEX IF NOT EXISTS ix_pagos_outbox_status_next_attempt_at ON pagos_outbox (status, next_attempt_at);
@@ -0,0 +1,7 @@
+-- Confirmación idempotente por token_ws (ver /api/webpay/commit en app.py):
+-- un token identifica una sola orden y genera un solo trabajo de confirmación.
+DROP INDEX IF EXISTS ix_ordenes_token_ws;
+CREATE UNIQUE INDEX IF NOT EXISTS ix_ordenes_token_ws ON ordenes (token_ws);
+
+ALTER TABLE pagos_outbox DROP CONSTRAINT IF EXISTS uq_pagos_outbox_kind_token;
+ALTER TABLE pagos_outbox ADD CONSTRAINT uq_pagos_outbox_kind_token UNIQUE (kind, token);
@@ -0,0 +1,12 @@
+-- Modelo de lectura de disponibilidad por producto (ver backend/availability.py).
+-- Cada fila guarda el sucursales_info listo para servir y los totales; lo mantienen al día
+-- inventory.py, los hooks de sesión de app.py y los servidores gRPC.
+-- Después de aplicar esta migración: `flask rebuild-availability`.
+CREATE TABLE IF NOT EXISTS productos_disponibilidad (
+    producto_id INTEGER PRIMARY KEY REFERENCES productos (id) ON DELETE CASCADE,
+    sucursales JSON NOT NULL,
+    stock_total INTEGER NOT NULL,
+    disponible_total INTEGER NOT NULL,
+    precio_min NUMERIC(10, 2),
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
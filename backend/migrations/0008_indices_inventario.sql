@@ -0,0 +1,14 @@
+-- Índices para el inventario por sucursal (backend/branch_inventory.py) y las claves foráneas
+-- que no tenían índice. El único índice previo de productos_sucursales era la restricción
+-- única (producto_id, sucursal_id), que no sirve para filtrar por sucursal.
+-- Cada índice de inventario cubre la página completa (INCLUDE) para permitir Index Only Scan.
+CREATE INDEX IF NOT EXISTS ix_productos_sucursales_sucursal_producto
+    ON productos_sucursales (sucursal_id, producto_id) INCLUDE (precio, stock);
+CREATE INDEX IF NOT EXISTS ix_productos_sucursales_sucursal_stock
+    ON productos_sucursales (sucursal_id, stock, producto_id) INCLUDE (precio);
+CREATE INDEX IF NOT EXISTS ix_productos_sucursales_sucursal_precio
+    ON productos_sucursales (sucursal_id, precio, producto_id) INCLUDE (stock);
+
+-- Ítems de una orden (pago, conversión de reservas) y ventas por producto
+CREATE INDEX IF NOT EXISTS ix_orden_items_orden_id ON orden_items (orden_id);
+CREATE INDEX IF NOT EXISTS ix_orden_items_producto_id ON orden_items (producto_id);
@@ -0,0 +1,7 @@
+-- El nombre identifica al producto: clave de la importación de catálogos (backend/catalog_import.py)
+-- y de la detección de duplicados en el alta por gRPC. Índice único para que ambos inserten con
+-- ON CONFLICT (nombre) DO NOTHING en lugar de consultar antes de insertar, que dejaba pasar
+-- duplicados entre cargas concurrentes. El índice de trigramas de 0001 no sirve para la igualdad.
+-- Si ya hay nombres repetidos la migración falla; se listan con:
+--   SELECT nombre, array_agg(id ORDER BY id) FROM productos GROUP BY nombre HAVING count(*) > 1;
+CREATE UNIQUE INDEX IF NOT EXISTS ix_productos_nombre ON productos (nombre);
@@ -0,0 +1,3 @@
+-- Búsqueda por prefijo del nombre para consultas cortas (backend/search_index.py): con menos
+-- de 3 caracteres los trigramas no sirven y "?q=a" se resuelve con LIKE 'a%', que usa este índice.
+CREATE INDEX IF NOT EXISTS ix_productos_nombre_prefijo ON productos (f_unaccent(lower(nombre)) text_pattern_ops);
@@ -0,0 +1,370 @@
+# Archivo: backend/payments.py
+# Pagos con Transbank fuera del hilo de la petición (outbox transaccional):
+#  - la petición guarda la orden y un trabajo en pagos_outbox en la misma transacción
+#  - un pool acotado de hilos toma los trabajos (FOR UPDATE SKIP LOCKED en PostgreSQL),
+#    habla con Webpay Plus (REST) con conexiones reutilizadas, timeouts, reintentos con
+#    backoff y un circuit breaker, y aplica el resultado a la orden
+#  - la llamada a Transbank ocurre sin transacción abierta: el trabajo se toma con un plazo
+#    (lease) y se confirma, y el resultado se guarda después en otra transacción corta solo si
+#    el plazo sigue siendo de este worker
+#  - la petición espera el resultado un tiempo acotado, sin retener conexión de base de datos,
+#    y si no llega responde "pendiente" para que el cliente consulte después
+# TRANSBANK_HOST permite apuntar a un Transbank falso (benchmarks/fake_transbank.py).
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+import requests
+from requests.adapters import HTTPAdapter
+from sqlalchemy import (Column, DateTime, Integer, MetaData, String, Table, Text, UniqueConstraint, and_, func,
+                        insert, or_, select, update)
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+
+import log_config
+import metrics
+from inventory import utcnow
+
+log = log_config.get_logger('payments')
+
+JOB_CREATE = 'CREATE'
+JOB_COMMIT = 'COMMIT'
+
+JOB_PENDING = 'PENDING'
+JOB_PROCESSING = 'PROCESSING'
+JOB_DONE = 'DONE'
+JOB_FAILED = 'FAILED'
+FINISHED_STATUSES = (JOB_DONE, JOB_FAILED)
+
+WEBPAY_TRANSACTIONS_PATH = '/rswebpaytransaction/api/webpay/v1.2/transactions'
+
+# Mismo esquema que el modelo PagoOutbox de app.py (la FK a ordenes la declara el modelo)
+pagos_outbox = Table(
+    'pagos_outbox', MetaData(),
+    Column('id', Integer, primary_key=True),
+    Column('orden_id', Integer, nullable=False),
+    Column('kind', String(10), nullable=False),
+    Column('token', String(100), nullable=True),
+    Column('status', String(20), nullable=False),
+    Column('attempts', Integer, nullable=False),
+    Column('next_attempt_at', DateTime, nullable=False),
+    Column('locked_until', DateTime, nullable=True),
+    Column('last_error', Text, nullable=True),
+    Column('result', Text, nullable=True),
+    Column('created_at', DateTime, server_default=func.current_timestamp()),
+    Column('updated_at', DateTime, server_default=func.current_timestamp(), onupdate=func.current_timestamp()),
+    # Un solo trabajo de confirmación por token: los retornos repetidos de Webpay no duplican el cobro
+    UniqueConstraint('kind', 'token', name='uq_pagos_outbox_kind_token'),
+)
+
+
+class TransbankError(Exception):
+    def __init__(self, message, status_code=None, retryable=False):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retryable = retryable
+
+
+class CircuitOpenError(TransbankError):
+    def __init__(self, retry_in):
+        super().__init__(f"Circuito abierto: Transbank no responde, reintento en {retry_in:.0f}s", retryable=True)
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    # Tras `failure_threshold` fallos seguidos deja de llamar durante `reset_timeout` segundos;
+    # luego deja pasar una llamada de prueba (semiabierto) y se cierra si tiene éxito.
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return 'half-open'
+            return 'open'
+
+    def before_call(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            elapsed = time.monotonic() - self._opened_at
+            if elapsed < self.reset_timeout or self._probing:
+                raise CircuitOpenError(max(self.reset_timeout - elapsed, 1.0))
+            self._probing = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+
+class WebpayClient:
+    # Cliente mínimo del API REST de Webpay Plus (el mismo que usa transbank-sdk), con una
+    # sesión HTTP compartida para reutilizar conexiones entre los hilos del pool.
+    def __init__(self, commerce_code, api_key, host, timeout=(3.05, 30), pool_size=4, breaker=None, session=None):
+        self.commerce_code = commerce_code
+        self.api_key = api_key
+        self.host = host.rstrip('/')
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker()
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+        self.session = session
+
+    def _request(self, operation, method, path, payload=None):
+        self.breaker.before_call()
+        headers = {
+            'Content-Type': 'application/json',
+            'Tbk-Api-Key-Id': self.commerce_code,
+            'Tbk-Api-Key-Secret': self.api_key,
+        }
+        started = time.perf_counter()
+        try:
+            response = self.session.request(method, f'{self.host}{WEBPAY_TRANSACTIONS_PATH}{path}',
+                                            json=payload, headers=headers, timeout=self.timeout)
+        except requests.RequestException as e:
+            metrics.observe_upstream('transbank', operation, time.perf_counter() - started, 'error')
+            self.breaker.record_failure()
+            raise TransbankError(f"Error de conexión con Transbank: {e}", retryable=True)
+        metrics.observe_upstream('transbank', operation, time.perf_counter() - started, str(response.status_code))
+        if response.status_code >= 500 or response.status_code == 429:
+            self.breaker.record_failure()
+            raise TransbankError(f"Transbank respondió {response.status_code}", response.status_code, retryable=True)
+        # Un 4xx es una respuesta válida del servicio: no cuenta como fallo para el circuito
+        self.breaker.record_success()
+        try:
+            data = response.json() if response.content else {}
+        except ValueError:
+            raise TransbankError(f"Respuesta no JSON de Transbank ({response.status_code})", response.status_code)
+        if response.status_code >= 400:
+            message = data.get('error_message') or data.get('description') or response.text
+            raise TransbankError(message, response.status_code)
+        return data
+
+    def create(self, buy_order, session_id, amount, return_url):
+        return self._request('create', 'POST', '/', {
+            'buy_order': buy_order,
+            'session_id': session_id,
+            'amount': amount,
+            'return_url': return_url,
+        })
+
+    def commit(self, token):
+        return self._request('commit', 'PUT', f'/{token}')
+
+    def status(self, token):
+        return self._request('status', 'GET', f'/{token}')
+
+
+def retry_delay(attempts, base=2.0, maximum=300.0):
+    # Backoff exponencial: base, 2*base, 4*base, ... hasta `maximum` segundos
+    return min(base * (2 ** max(attempts - 1, 0)), maximum)
+
+
+# --- Cola (pagos_outbox) ---
+def new_job_values(orden_id, kind, token=None):
+    return {
+        'orden_id': orden_id,
+        'kind': kind,
+        'token': token,
+        'status': JOB_PENDING,
+        'attempts': 0,
+        'next_attempt_at': utcnow(),
+    }
+
+
+def enqueue_once(session, values):
+    # INSERT idempotente por (kind, token): entre peticiones concurrentes solo una crea el trabajo
+    # y todas obtienen el mismo id. En PostgreSQL la segunda espera a que la primera confirme.
+    dialect = session.get_bind().dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        dialect_insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        session.execute(dialect_insert(pagos_outbox).values(**values)
+                        .on_conflict_do_nothing(index_elements=['kind', 'token']))
+    else:
+        try:
+            with session.begin_nested():
+                session.execute(insert(pagos_outbox).values(**values))
+        except IntegrityError:
+            pass
+    return find_job(session, values['kind'], values['token']).id
+
+
+def find_job(session, kind, token):
+    return session.execute(
+        select(pagos_outbox).where(pagos_outbox.c.kind == kind, pagos_outbox.c.token == token)
+    ).first()
+
+
+def claim_next_job(session, lease_seconds):
+    # Toma el siguiente trabajo vencido (o uno abandonado por un worker caído) y lo marca como
+    # PROCESSING con un plazo; SKIP LOCKED evita que dos workers esperen por la misma fila.
+    now = utcnow()
+    candidate = session.execute(
+        select(pagos_outbox.c.id)
+        .where(or_(
+            and_(pagos_outbox.c.status == JOB_PENDING, pagos_outbox.c.next_attempt_at <= now),
+            and_(pagos_outbox.c.status == JOB_PROCESSING, pagos_outbox.c.locked_until < now),
+        ))
+        .order_by(pagos_outbox.c.next_attempt_at, pagos_outbox.c.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    ).scalar()
+    if candidate is None:
+        session.rollback()
+        return None
+    # La condición repetida protege a SQLite (sin FOR UPDATE): solo un worker gana la fila
+    claimed = session.execute(
+        update(pagos_outbox)
+        .where(pagos_outbox.c.id == candidate)
+        .where(or_(pagos_outbox.c.status == JOB_PENDING,
+                   and_(pagos_outbox.c.status == JOB_PROCESSING, pagos_outbox.c.locked_until < now)))
+        .values(status=JOB_PROCESSING, attempts=pagos_outbox.c.attempts + 1,
+                locked_until=now + timedelta(seconds=lease_seconds))
+        .returning(*pagos_outbox.c)
+    ).first()
+    session.commit()
+    return claimed
+
+
+def hold_lease(session, job):
+    # Relee el trabajo bloqueando su fila: True si sigue PROCESSING con el plazo que tomó este
+    # worker. Si venció y otro worker lo retomó, este no debe aplicar su resultado.
+    current = session.execute(
+        select(pagos_outbox.c.status, pagos_outbox.c.locked_until)
+        .where(pagos_outbox.c.id == job.id)
+        .with_for_update()
+    ).first()
+    return current is not None and current.status == JOB_PROCESSING and current.locked_until == job.locked_until
+
+
+def finish_job(session, job_id, status, result=None, error=None):
+    session.execute(update(pagos_outbox).where(pagos_outbox.c.id == job_id).values(
+        status=status, locked_until=None, last_error=error,
+        result=json.dumps(result) if result is not None else None,
+    ))
+
+
+def reschedule_job(session, job_id, error, delay):
+    session.execute(update(pagos_outbox).where(pagos_outbox.c.id == job_id).values(
+        status=JOB_PENDING, locked_until=None, last_error=error,
+        next_attempt_at=utcnow() + timedelta(seconds=delay),
+    ))
+
+
+def job_result(job):
+    return json.loads(job.result) if job.result else None
+
+
+def queue_stats(session):
+    rows = session.execute(select(pagos_outbox.c.status, func.count()).group_by(pagos_outbox.c.status)).all()
+    return {status: count for status, count in rows}
+
+
+class JobNotifier:
+    # Avisa a las peticiones que esperan un trabajo procesado en este mismo proceso.
+    # Los procesados por otro proceso se detectan consultando la base (ver wait en app.py).
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._events = {}
+
+    def event_for(self, job_id):
+        with self._lock:
+            return self._events.setdefault(job_id, threading.Event())
+
+    def notify(self, job_id):
+        with self._lock:
+            event = self._events.pop(job_id, None)
+        if event is not None:
+            event.set()
+
+    def discard(self, job_id):
+        with self._lock:
+            self._events.pop(job_id, None)
+
+
+class OutcomeCache:
+    # Resultados finales por token (LRU acotado): un retorno repetido se responde sin ir a la base
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._items = OrderedDict()
+        self.hits = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+
+class WorkerPool:
+    # `process_one()` procesa un trabajo y devuelve True, o False si no había nada que hacer.
+    # Los hilos duermen hasta `poll_interval` segundos o hasta que wake() avisa de trabajo nuevo.
+    def __init__(self, process_one, size=4, poll_interval=1.0, name='payment-worker'):
+        self.process_one = process_one
+        self.size = size
+        self.poll_interval = poll_interval
+        self.name = name
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            self._threads = [t for t in self._threads if t.is_alive()]
+            for i in range(len(self._threads), self.size):
+                thread = threading.Thread(target=self._run, name=f'{self.name}-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def wake(self):
+        self._wakeup.set()
+
+    def stop(self, timeout=10.0):
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                worked = self.process_one()
+            except Exception as e:
+                log.exception("Fallo inesperado en el worker de pagos: %s", e)
+                worked = False
+            if not worked:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
@@ -0,0 +1,95 @@
+# Archivo: backend/product_ingest.py
+# Lógica de alta de productos compartida por los servidores gRPC (hilos y asyncio).
+# No depende de Flask ni de la sesión de base de datos: cada servidor ejecuta las consultas.
+import image_store
+import product_pb2
+
+DEFAULT_BRAND = "Generica"
+
+
+def request_image_bytes(request):
+    if request.image:
+        return request.image
+    return image_store.decode_base64_image(request.image_base64)
+
+
+def product_values(request, image_sha256):
+    return {
+        'nombre': request.name,
+        'marca': DEFAULT_BRAND,
+        'description': request.description or None,
+        'price': request.price,
+        'imagen_hash': image_sha256,
+    }
+
+
+def image_values(sha256, data):
+    return {'sha256': sha256, 'mime_type': image_store.sniff_mime_type(data), 'size': len(data), 'data': data}
+
+
+def new_summary():
+    return {'received': 0, 'created': 0, 'duplicates': 0, 'failed': 0}
+
+
+def _failed(results, summary, index, name, message, duplicate=False):
+    results.append(product_pb2.BulkAddItemResult(index=index, name=name, success=False, duplicate=duplicate, message=message))
+    summary['duplicates' if duplicate else 'failed'] += 1
+
+
+def validate_batch(batch, seen_names, summary, results):
+    # Primer paso de un lote: descarta inválidos y repetidos dentro del stream.
+    # Devuelve [(index, request, image_bytes)] pendientes de contrastar con la base.
+    valid = []
+    for index, req in batch:
+        if not req.name:
+            _failed(results, summary, index, req.name, "El nombre es obligatorio.")
+            continue
+        if req.name in seen_names:
+            _failed(results, summary, index, req.name, f"El producto '{req.name}' está repetido en la carga.", duplicate=True)
+            continue
+        try:
+            image_bytes = request_image_bytes(req)
+        except ValueError as e:
+            _failed(results, summary, index, req.name, str(e))
+            continue
+        seen_names.add(req.name)
+        valid.append((index, req, image_bytes))
+    return valid
+
+
+def build_rows(valid):
+    # Segundo paso: valores a insertar. Los nombres que ya existen en la base los descarta el
+    # INSERT ... ON CONFLICT (catalog_queries.insert_products_stmt), no una consulta previa.
+    # Devuelve ([(index, valores de producto)], {sha256: bytes de imagen}).
+    rows = []
+    images = {}
+    for index, req, image_bytes in valid:
+        sha256 = None
+        if image_bytes:
+            sha256 = image_store.content_hash(image_bytes)
+            images[sha256] = image_bytes
+        rows.append((index, product_values(req, sha256)))
+    return rows, images
+
+
+def record_inserted(rows, inserted, summary, results):
+    # inserted: {nombre: id} de las filas que devolvió RETURNING; las demás chocaron con un nombre existente
+    for index, values in rows:
+        product_id = inserted.get(values['nombre'])
+        if product_id is None:
+            _failed(results, summary, index, values['nombre'], f"El producto '{values['nombre']}' ya existe.", duplicate=True)
+            continue
+        results.append(product_pb2.BulkAddItemResult(index=index, name=values['nombre'], success=True, product_id=product_id, message="Añadido."))
+        summary['created'] += 1
+
+
+def record_batch_error(rows, seen_names, summary, results):
+    # El lote se revirtió completo: sus nombres vuelven a estar disponibles
+    for index, values in rows:
+        seen_names.discard(values['nombre'])
+        _failed(results, summary, index, values['nombre'], "Error de base de datos al añadir el lote.")
+
+
+def bulk_response(summary, results):
+    results.sort(key=lambda result: result.index)
+    return product_pb2.BulkAddProductsResponse(results=results, **summary)
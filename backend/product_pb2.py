@@ -24,7 +24,7 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\rproduct.proto\x12\x07product\"[\n\x11\x41\x64\x64ProductRequest\x12\x0c\n\x04name\x18\x01 \x01(\t\x12\x13\n\x0b\x64\x65scription\x18\x02 \x01(\t\x12\r\n\x05price\x18\x03 \x01(\x01\x12\x14\n\x0cimage_base64\x18\x04 \x01(\t\"J\n\x12\x41\x64\x64ProductResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\x12\x12\n\nproduct_id\x18\x03 \x01(\x05\x32W\n\x0eProductService\x12\x45\n\nAddProduct\x12\x1a.product.AddProductRequest\x1a\x1b.product.AddProductResponseb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\rproduct.proto\x12\x07product\"j\n\x11\x41\x64\x64ProductRequest\x12\x0c\n\x04name\x18\x01 \x01(\t\x12\x13\n\x0b\x64\x65scription\x18\x02 \x01(\t\x12\r\n\x05price\x18\x03 \x01(\x01\x12\x14\n\x0cimage_base64\x18\x04 \x01(\t\x12\r\n\x05image\x18\x05 \x01(\x0c\"J\n\x12\x41\x64\x64ProductResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\x12\x12\n\nproduct_id\x18\x03 \x01(\x05\"y\n\x11\x42ulkAddItemResult\x12\r\n\x05index\x18\x01 \x01(\x05\x12\x0c\n\x04name\x18\x02 \x01(\t\x12\x0f\n\x07success\x18\x03 \x01(\x08\x12\x0f\n\x07message\x18\x04 \x01(\t\x12\x12\n\nproduct_id\x18\x05 \x01(\x05\x12\x11\n\tduplicate\x18\x06 \x01(\x08\"\x8d\x01\n\x17\x42ulkAddProductsResponse\x12\x10\n\x08received\x18\x01 \x01(\x05\x12\x0f\n\x07\x63reated\x18\x02 \x01(\x05\x12\x12\n\nduplicates\x18\x03 \x01(\x05\x12\x0e\n\x06\x66\x61iled\x18\x04 \x01(\x05\x12+\n\x07results\x18\x05 \x03(\x0b\x32\x1a.product.BulkAddItemResult\"W\n\x0b\x42ranchStock\x12\x13\n\x0bsucursal_id\x18\x01 \x01(\x05\x12\x15\n\rsucursal_name\x18\x02 \x01(\t\x12\r\n\x05price\x18\x03 \x01(\x01\x12\r\n\x05stock\x18\x04 \x01(\x05\"\xaf\x01\n\x0e\x43\x61talogProduct\x12\n\n\x02id\x18\x01 \x01(\x05\x12\x0c\n\x04name\x18\x02 \x01(\t\x12\r\n\x05\x62rand\x18\x03 \x01(\t\x12\x13\n\x0b\x64\x65scription\x18\x04 \x01(\t\x12\r\n\x05price\x18\x05 \x01(\x01\x12\x11\n\timage_url\x18\x06 \x01(\t\x12&\n\x08\x62ranches\x18\x07 \x03(\x0b\x32\x14.product.BranchStock\x12\x15\n\rupdated_at_ms\x18\x08 \x01(\x03\"!\n\x12GetProductsRequest\x12\x0b\n\x03ids\x18\x01 \x03(\x05\"U\n\x13GetProductsResponse\x12)\n\x08products\x18\x01 \x03(\x0b\x32\x17.product.CatalogProduct\x12\x13\n\x0bmissing_ids\x18\x02 \x03(\x05\"E\n\x15SearchProductsRequest\x12\r\n\x05query\x18\x01 \x01(\t\x12\r\n\x05limit\x18\x02 \x01(\x05\x12\x0e\n\x06\x63ursor\x18\x03 \x01(\t\"X\n\x16SearchProductsResponse\x12)\n\x08products\x18\x01 \x03(\x0b\x32\x17.product.CatalogProduct\x12\x13\n\x0bnext_cursor\x18\x02 \x01(\t\";\n\x14StreamCatalogRequest\x12\x10\n\x08since_ms\x18\x01 \x01(\x03\x12\x11\n\tpage_size\x18\x02 \x01(\x05\"N\n\x0b\x43\x61talogPage\x12)\n\x08products\x18\x01 \x03(\x0b\x32\x17.product.CatalogProduct\x12\x14\n\x0cwatermark_ms\x18\x02 \x01(\x03\x32\x8f\x03\n\x0eProductService\x12\x45\n\nAddProduct\x12\x1a.product.AddProductRequest\x1a\x1b.product.AddProductResponse\x12Q\n\x0f\x42ulkAddProducts\x12\x1a.product.AddProductRequest\x1a .product.BulkAddProductsResponse(\x01\x12H\n\x0bGetProducts\x12\x1b.product.GetProductsRequest\x1a\x1c.product.GetProductsResponse\x12Q\n\x0eSearchProducts\x12\x1e.product.SearchProductsRequest\x1a\x1f.product.SearchProductsResponse\x12\x46\n\rStreamCatalog\x12\x1d.product.StreamCatalogRequest\x1a\x14.product.CatalogPage0\x01\x62\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -32,9 +32,29 @@ _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'product_pb2', _globals)
 if not _descriptor._USE_C_DESCRIPTORS:
   DESCRIPTOR._loaded_options = None
   _globals['_ADDPRODUCTREQUEST']._serialized_start=26
-  _globals['_ADDPRODUCTREQUEST']._serialized_end=117
-  _globals['_ADDPRODUCTRESPONSE']._serialized_start=119
-  _globals['_ADDPRODUCTRESPONSE']._serialized_end=193
-  _globals['_PRODUCTSERVICE']._serialized_start=195
-  _globals['_PRODUCTSERVICE']._serialized_end=282
+  _globals['_ADDPRODUCTREQUEST']._serialized_end=132
+  _globals['_ADDPRODUCTRESPONSE']._serialized_start=134
+  _globals['_ADDPRODUCTRESPONSE']._serialized_end=208
+  _globals['_BULKADDITEMRESULT']._serialized_start=210
+  _globals['_BULKADDITEMRESULT']._serialized_end=331
+  _globals['_BULKADDPRODUCTSRESPONSE']._serialized_start=334
+  _globals['_BULKADDPRODUCTSRESPONSE']._serialized_end=475
+  _globals['_BRANCHSTOCK']._serialized_start=477
+  _globals['_BRANCHSTOCK']._serialized_end=564
+  _globals['_CATALOGPRODUCT']._serialized_start=567
+  _globals['_CATALOGPRODUCT']._serialized_end=742
+  _globals['_GETPRODUCTSREQUEST']._serialized_start=744
+  _globals['_GETPRODUCTSREQUEST']._serialized_end=777
+  _globals['_GETPRODUCTSRESPONSE']._serialized_start=779
+  _globals['_GETPRODUCTSRESPONSE']._serialized_end=864
+  _globals['_SEARCHPRODUCTSREQUEST']._serialized_start=866
+  _globals['_SEARCHPRODUCTSREQUEST']._serialized_end=935
+  _globals['_SEARCHPRODUCTSRESPONSE']._serialized_start=937
+  _globals['_SEARCHPRODUCTSRESPONSE']._serialized_end=1025
+  _globals['_STREAMCATALOGREQUEST']._serialized_start=1027
+  _globals['_STREAMCATALOGREQUEST']._serialized_end=1086
+  _globals['_CATALOGPAGE']._serialized_start=1088
+  _globals['_CATALOGPAGE']._serialized_end=1166
+  _globals['_PRODUCTSERVICE']._serialized_start=1169
+  _globals['_PRODUCTSERVICE']._serialized_end=1568
 # @@protoc_insertion_point(module_scope)
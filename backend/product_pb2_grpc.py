@@ -40,6 +40,26 @@ class ProductServiceStub(object):
                 request_serializer=product__pb2.AddProductRequest.SerializeToString,
                 response_deserializer=product__pb2.AddProductResponse.FromString,
                 _registered_method=True)
+        self.BulkAddProducts = channel.stream_unary(
+                '/product.ProductService/BulkAddProducts',
+                request_serializer=product__pb2.AddProductRequest.SerializeToString,
+                response_deserializer=product__pb2.BulkAddProductsResponse.FromString,
+                _registered_method=True)
+        self.GetProducts = channel.unary_unary(
+                '/product.ProductService/GetProducts',
+                request_serializer=product__pb2.GetProductsRequest.SerializeToString,
+                response_deserializer=product__pb2.GetProductsResponse.FromString,
+                _registered_method=True)
+        self.SearchProducts = channel.unary_unary(
+                '/product.ProductService/SearchProducts',
+                request_serializer=product__pb2.SearchProductsRequest.SerializeToString,
+                response_deserializer=product__pb2.SearchProductsResponse.FromString,
+                _registered_method=True)
+        self.StreamCatalog = channel.unary_stream(
+                '/product.ProductService/StreamCatalog',
+                request_serializer=product__pb2.StreamCatalogRequest.SerializeToString,
+                response_deserializer=product__pb2.CatalogPage.FromString,
+                _registered_method=True)
 
 
 class ProductServiceServicer(object):
@@ -53,6 +73,34 @@ class ProductServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def BulkAddProducts(self, request_iterator, context):
+        """Añade productos en lote a partir de un stream (p. ej. el catálogo de un proveedor).
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def GetProducts(self, request, context):
+        """Devuelve varios productos (con precio y stock por sucursal) por sus ids.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def SearchProducts(self, request, context):
+        """Busca productos por texto, con paginación por cursor.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def StreamCatalog(self, request, context):
+        """Exporta el catálogo completo (o lo cambiado desde `since_ms`) en páginas.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_ProductServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -61,6 +109,26 @@ def add_ProductServiceServicer_to_server(servicer, server):
                     request_deserializer=product__pb2.AddProductRequest.FromString,
                     response_serializer=product__pb2.AddProductResponse.SerializeToString,
             ),
+            'BulkAddProducts': grpc.stream_unary_rpc_method_handler(
+                    servicer.BulkAddProducts,
+                    request_deserializer=product__pb2.AddProductRequest.FromString,
+                    response_serializer=product__pb2.BulkAddProductsResponse.SerializeToString,
+            ),
+            'GetProducts': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetProducts,
+                    request_deserializer=product__pb2.GetProductsRequest.FromString,
+                    response_serializer=product__pb2.GetProductsResponse.SerializeToString,
+            ),
+            'SearchProducts': grpc.unary_unary_rpc_method_handler(
+                    servicer.SearchProducts,
+                    request_deserializer=product__pb2.SearchProductsRequest.FromString,
+                    response_serializer=product__pb2.SearchProductsResponse.SerializeToString,
+            ),
+            'StreamCatalog': grpc.unary_stream_rpc_method_handler(
+                    servicer.StreamCatalog,
+                    request_deserializer=product__pb2.StreamCatalogRequest.FromString,
+                    response_serializer=product__pb2.CatalogPage.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'product.ProductService', rpc_method_handlers)
@@ -99,3 +167,111 @@ class ProductService(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def BulkAddProducts(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_unary(
+            request_iterator,
+            target,
+            '/product.ProductService/BulkAddProducts',
+            product__pb2.AddProductRequest.SerializeToString,
+            product__pb2.BulkAddProductsResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def GetProducts(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/product.ProductService/GetProducts',
+            product__pb2.GetProductsRequest.SerializeToString,
+            product__pb2.GetProductsResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def SearchProducts(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/product.ProductService/SearchProducts',
+            product__pb2.SearchProductsRequest.SerializeToString,
+            product__pb2.SearchProductsResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def StreamCatalog(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/product.ProductService/StreamCatalog',
+            product__pb2.StreamCatalogRequest.SerializeToString,
+            product__pb2.CatalogPage.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
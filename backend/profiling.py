@@ -0,0 +1,251 @@
+# Archivo: backend/profiling.py
+# Perfilado a pedido de peticiones Flask y RPC gRPC, pensado para producción:
+#  - desactivado (PROFILE_SAMPLE_RATE=0 y sin PROFILE_SECRET) no se instala ningún hook
+#  - se activa para una fracción de las peticiones (PROFILE_SAMPLE_RATE) o con un token
+#    firmado en la cabecera X-Profile, en ?_profile= o en la metadata gRPC x-profile
+#  - un hilo muestrea la pila del hilo que atiende la petición cada PROFILE_INTERVAL segundos
+#    (tiempo de pared: también muestra las esperas de red y de base de datos)
+#  - el resultado se guarda en formato "collapsed stacks" (una pila por línea y su cantidad de
+#    muestras), que leen flamegraph.pl, speedscope y similares
+#  - los archivos van a un anillo en disco de PROFILE_MAX_FILES; el más antiguo se borra
+# Token: "<unix_ts>.<hmac_sha256(PROFILE_SECRET, unix_ts)>", válido PROFILE_TOKEN_TTL segundos
+# (se genera con `flask profile-token`). El mismo token da acceso a /admin/profiles.
+import hashlib
+import hmac
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+import grpc
+
+import log_config
+
+log = log_config.get_logger('profiling')
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_QUERY_ARG = '_profile'
+PROFILE_METADATA = 'x-profile'
+FILE_SUFFIX = '.collapsed'
+_FILE_NAME = re.compile(r'^[A-Za-z0-9_.-]+\.collapsed$')
+
+
+# --- Token firmado ---
+def sign_token(secret, timestamp=None):
+    timestamp = str(int(timestamp if timestamp is not None else time.time()))
+    digest = hmac.new(secret.encode('utf-8'), timestamp.encode('ascii'), hashlib.sha256).hexdigest()
+    return f'{timestamp}.{digest}'
+
+
+def verify_token(secret, token, ttl, now=None):
+    if not secret or not token or '.' not in token:
+        return False
+    timestamp, _, digest = token.partition('.')
+    if not timestamp.isdigit():
+        return False
+    age = (now if now is not None else time.time()) - int(timestamp)
+    if age > ttl or age < -60: # 60 s de tolerancia para relojes adelantados
+        return False
+    expected = hmac.new(secret.encode('utf-8'), timestamp.encode('ascii'), hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, digest)
+
+
+# --- Muestreo de pilas ---
+def _frame_label(frame):
+    code = frame.f_code
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+
+class StackSampler:
+    # Muestrea la pila de otro hilo; stop() devuelve las pilas acumuladas
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self.started = None
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                break
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(labels))] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self.started
+        return self.stacks
+
+    def collapsed(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+# --- Anillo de archivos en disco ---
+class ProfileStore:
+    def __init__(self, directory, max_files):
+        self.directory = directory
+        self.max_files = max_files
+        self._lock = threading.Lock()
+
+    def save(self, name, content):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, name)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.profile-')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._prune()
+        return path
+
+    def _prune(self):
+        with self._lock:
+            entries = self.list()
+            for entry in entries[self.max_files:]:
+                try:
+                    os.remove(os.path.join(self.directory, entry['name']))
+                except FileNotFoundError:
+                    pass # otro worker ya lo borró
+
+    def list(self):
+        # Del más reciente al más antiguo
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and _FILE_NAME.match(entry.name):
+                stat = entry.stat()
+                entries.append({'name': entry.name, 'bytes': stat.st_size, 'modified': stat.st_mtime})
+        entries.sort(key=lambda item: (item['modified'], item['name']), reverse=True)
+        return entries
+
+    def path_for(self, name):
+        # None si el nombre no es de un perfil (evita salir del directorio)
+        if not _FILE_NAME.match(name):
+            return None
+        path = os.path.join(self.directory, name)
+        return path if os.path.isfile(path) else None
+
+
+class Profiler:
+    def __init__(self, sample_rate=0.0, secret=None, directory=None, max_files=50, interval=0.005, token_ttl=300):
+        self.sample_rate = sample_rate
+        self.secret = secret
+        self.interval = interval
+        self.token_ttl = token_ttl
+        self.store = ProfileStore(directory or os.path.join(tempfile.gettempdir(), 'ferremas_profiles'), max_files)
+        self.captured = 0
+
+    @property
+    def enabled(self):
+        return self.sample_rate > 0 or bool(self.secret)
+
+    def should_profile(self, token=None):
+        if token and verify_token(self.secret, token, self.token_ttl):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def authorized(self, token):
+        return verify_token(self.secret, token, self.token_ttl)
+
+    def start(self, kind, name):
+        # Muestrea el hilo actual; devuelve (id del perfil, sampler)
+        safe_name = re.sub(r'[^A-Za-z0-9]+', '_', name).strip('_')[:60] or 'root'
+        profile_id = f'{time.strftime("%Y%m%dT%H%M%S", time.gmtime())}-{kind}-{safe_name}-{os.getpid()}-{random.getrandbits(24):06x}'
+        return profile_id, StackSampler(threading.get_ident(), self.interval).start()
+
+    def finish(self, profile_id, sampler):
+        sampler.stop()
+        header = (f'# {profile_id}: {sampler.samples} muestras cada {self.interval * 1000:g} ms, '
+                  f'{sampler.duration * 1000:.1f} ms de pared\n')
+        try:
+            self.store.save(profile_id + FILE_SUFFIX, header + sampler.collapsed())
+        except OSError as e:
+            log.error("No se pudo guardar el perfil %s: %s", profile_id, e)
+            return None
+        self.captured += 1
+        log.info("Perfil %s guardado (%d muestras, %.1f ms)", profile_id, sampler.samples, sampler.duration * 1000)
+        return profile_id
+
+
+def from_env():
+    # Profiler configurado con PROFILE_*; ver cabecera del módulo
+    return Profiler(
+        sample_rate=float(os.environ.get('PROFILE_SAMPLE_RATE', 0)),
+        secret=os.environ.get('PROFILE_SECRET') or None,
+        directory=os.environ.get('PROFILE_DIR') or None,
+        max_files=int(os.environ.get('PROFILE_MAX_FILES', 50)),
+        interval=float(os.environ.get('PROFILE_INTERVAL', 0.005)),
+        token_ttl=int(os.environ.get('PROFILE_TOKEN_TTL', 300)),
+    )
+
+
+# --- gRPC ---
+def _metadata_token(context):
+    for key, value in context.invocation_metadata() or ():
+        if key == PROFILE_METADATA:
+            return value
+    return None
+
+
+class GrpcProfilingInterceptor(grpc.ServerInterceptor):
+    # Solo para grpc.server (pool de hilos): cada RPC corre en su propio hilo. En grpc.aio todas
+    # las RPC comparten el hilo del event loop y el muestreo mezclaría pilas de otras RPC.
+    def __init__(self, profiler):
+        self.profiler = profiler
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        if handler is None:
+            return None
+        method = handler_call_details.method
+        profiler = self.profiler
+
+        def unary(behavior):
+            def wrapper(request, context):
+                if not profiler.should_profile(_metadata_token(context)):
+                    return behavior(request, context)
+                profile_id, sampler = profiler.start('grpc', method)
+                try:
+                    return behavior(request, context)
+                finally:
+                    profiler.finish(profile_id, sampler)
+            return wrapper
+
+        def stream(behavior):
+            def wrapper(request, context):
+                if not profiler.should_profile(_metadata_token(context)):
+                    yield from behavior(request, context)
+                    return
+                profile_id, sampler = profiler.start('grpc', method)
+                try:
+                    yield from behavior(request, context)
+                finally:
+                    profiler.finish(profile_id, sampler)
+            return wrapper
+
+        return log_config.wrap_rpc_handler(handler, unary, stream)
+
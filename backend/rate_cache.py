@@ -0,0 +1,209 @@
+# Archivo: backend/rate_cache.py
+# Caché de tipos de cambio compartida entre procesos (archivo JSON) con:
+#  - TTL y refresco en segundo plano, sirviendo el valor vencido mientras se revalida
+#  - con refresh_interval > 0, un hilo por proceso que renueva la tabla un intervalo antes de
+#    que venza, para que las peticiones no dependan de encontrarla vencida
+#  - una sola llamada al proveedor ante misses concurrentes (hilos y procesos)
+#  - sesión HTTP reutilizada, con timeouts y reintentos
+#  - el último valor bueno se sigue sirviendo si el proveedor está caído
+import json
+import os
+import tempfile
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import log_config
+import metrics
+
+try:
+    import fcntl
+except ImportError: # Windows: solo hay coordinación dentro del proceso
+    fcntl = None
+
+log = log_config.get_logger('rate_cache')
+
+
+class RateUnavailable(Exception):
+    pass
+
+
+def build_session(pool_size=4, retries=2):
+    session = requests.Session()
+    retry = Retry(total=retries, backoff_factor=0.3, status_forcelist=(502, 503, 504), allowed_methods=('GET',))
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+class RateCache:
+    def __init__(self, url, store_path=None, ttl=3600, timeout=(3.05, 5), error_backoff=30, session=None,
+                 refresh_interval=0):
+        self.url = url
+        self.store_path = store_path or os.path.join(tempfile.gettempdir(), 'ferremas_exchange_rate.json')
+        self.ttl = ttl
+        self.timeout = timeout
+        self.error_backoff = error_backoff
+        self.refresh_interval = refresh_interval
+        self.session = session or build_session()
+        self._lock = threading.Lock()          # protege _entry/_entry_mtime/_refreshing
+        self._refresh_lock = threading.Lock()  # single-flight dentro del proceso
+        self._entry = None
+        self._entry_mtime = None
+        self._refreshing = False
+        self._last_failure = 0.0
+        self._scheduler_pid = None
+        self._scheduler_stop = threading.Event()
+        self.upstream_calls = 0
+
+    # --- Lectura/escritura del almacén compartido ---
+    def _load(self):
+        try:
+            mtime = os.stat(self.store_path).st_mtime_ns
+        except FileNotFoundError:
+            return self._entry
+        with self._lock:
+            if mtime == self._entry_mtime:
+                return self._entry
+        try:
+            with open(self.store_path, encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError) as e:
+            log.warning("No se pudo leer %s: %s", self.store_path, e)
+            return self._entry
+        with self._lock:
+            self._entry, self._entry_mtime = entry, mtime
+        return entry
+
+    def _save(self, entry):
+        # Escritura atómica: los lectores ven el archivo anterior o el nuevo, nunca uno a medias
+        directory = os.path.dirname(self.store_path) or '.'
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.rates-')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, self.store_path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        with self._lock:
+            self._entry = entry
+            self._entry_mtime = os.stat(self.store_path).st_mtime_ns
+
+    def is_fresh(self, entry, max_age=None):
+        return entry is not None and time.time() - entry['fetched_at'] < (self.ttl if max_age is None else max_age)
+
+    # --- Proveedor ---
+    def _fetch(self):
+        self.upstream_calls += 1
+        started = time.perf_counter()
+        try:
+            response = self.session.get(self.url, timeout=self.timeout)
+        except requests.exceptions.RequestException:
+            metrics.observe_upstream('exchange_rate', 'latest', time.perf_counter() - started, 'error')
+            raise
+        metrics.observe_upstream('exchange_rate', 'latest', time.perf_counter() - started, str(response.status_code))
+        response.raise_for_status()
+        data = response.json()
+        if data.get('result') == 'error':
+            raise RateUnavailable(f"El proveedor devolvió un error: {data.get('error-type', 'unknown_error')}")
+        if 'conversion_rates' not in data:
+            raise RateUnavailable("Respuesta del proveedor sin 'conversion_rates'")
+        return {
+            'base_code': data.get('base_code'),
+            'conversion_rates': data['conversion_rates'],
+            'fetched_at': time.time(),
+        }
+
+    def refresh(self, max_age=None):
+        # Solo un hilo por proceso, y solo un proceso a la vez (flock), llama al proveedor.
+        # Quien espera el lock vuelve a mirar el almacén: si otro ya refrescó, no llama de nuevo.
+        # max_age (por defecto el TTL) es la edad a partir de la cual se vuelve a pedir la tabla.
+        with self._refresh_lock:
+            entry = self._load()
+            if self.is_fresh(entry, max_age):
+                return entry
+            lock_file = open(self.store_path + '.lock', 'a') if fcntl else None
+            try:
+                if lock_file:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                    entry = self._load()
+                    if self.is_fresh(entry, max_age):
+                        return entry
+                if time.time() - self._last_failure < self.error_backoff:
+                    raise RateUnavailable("Proveedor de tipo de cambio no disponible (reintento en espera)")
+                try:
+                    entry = self._fetch()
+                except (requests.exceptions.RequestException, ValueError, RateUnavailable) as e:
+                    self._last_failure = time.time()
+                    log.error("Fallo al refrescar el tipo de cambio: %s", e)
+                    raise RateUnavailable(str(e)) from e
+                self._save(entry)
+                log.info("Tipo de cambio actualizado desde el proveedor (%d monedas)", len(entry['conversion_rates']))
+                return entry
+            finally:
+                if lock_file:
+                    lock_file.close()
+
+    def _background_refresh(self):
+        try:
+            self.refresh()
+        except RateUnavailable:
+            pass # Se sigue sirviendo el último valor bueno
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def ensure_scheduler(self):
+        # Arranque perezoso por proceso: el hilo no sobrevive al fork de gunicorn
+        if self.refresh_interval <= 0 or self._scheduler_pid == os.getpid():
+            return
+        with self._lock:
+            if self._scheduler_pid == os.getpid():
+                return
+            self._scheduler_pid = os.getpid()
+            self._scheduler_stop.clear()
+        threading.Thread(target=self._run_scheduler, name='rate-cache-scheduler', daemon=True).start()
+
+    def stop_scheduler(self):
+        with self._lock:
+            self._scheduler_pid = None
+            self._scheduler_stop.set()
+
+    def _run_scheduler(self):
+        # Los hilos de todos los procesos despiertan, pero el flock y la relectura del almacén
+        # hacen que solo uno llame al proveedor por vencimiento
+        pid = os.getpid()
+        max_age = max(self.ttl - self.refresh_interval, 0)
+        while self._scheduler_pid == pid:
+            try:
+                self.refresh(max_age)
+            except RateUnavailable:
+                pass # Se reintenta en el próximo intervalo (respetando error_backoff)
+            except Exception as e:
+                log.exception("Fallo inesperado en el refresco programado del tipo de cambio: %s", e)
+            if self._scheduler_stop.wait(self.refresh_interval):
+                return
+
+    def get(self):
+        # Devuelve (entry, stale). Solo bloquea si no hay ningún valor guardado.
+        self.ensure_scheduler()
+        entry = self._load()
+        if self.is_fresh(entry):
+            return entry, False
+        if entry is not None:
+            with self._lock:
+                start = not self._refreshing
+                self._refreshing = True
+            if start:
+                threading.Thread(target=self._background_refresh, name='rate-cache-refresh', daemon=True).start()
+            return entry, True
+        return self.refresh(), False
+
+    def seconds_until_stale(self, entry):
+        return max(0, int(self.ttl - (time.time() - entry['fetched_at'])))
@@ -0,0 +1,199 @@
+# Archivo: backend/search_cache.py
+# Caché de respuestas de /api/productos/buscar con invalidación por producto.
+# Cada entrada guarda el cuerpo ya serializado, su ETag fuerte y los productos de los que
+# depende (los de la página); un cambio de stock o precio borra solo las entradas que los
+# contienen. Un producto nuevo o renombrado borra las entradas cuya consulta lo encontraría.
+#
+# Los cambios llegan por dos caminos: los commits del propio proceso (hooks de sesión de
+# app.py) y, en PostgreSQL, el canal LISTEN/NOTIFY `ferremas_catalog` que availability.py
+# notifica dentro de la transacción (cambios de otros workers y de los servidores gRPC).
+# El TTL acota lo que pudiera perderse sin ese canal (p. ej. gRPC + SQLite en desarrollo).
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import search_index
+
+
+def normalize_query(query):
+    # Misma forma para "Martillo ", "martíllo" y "MARTILLO": minúsculas, sin tildes, espacios simples
+    return ' '.join(search_index.fold_text(query).split())
+
+
+def cache_key(query, limit, cursor, fields, currency=None):
+    # currency: (código, fetched_at de la tabla de tasas) si los precios van convertidos
+    return (normalize_query(query), limit, cursor or '', tuple(sorted(fields)), currency)
+
+
+def strong_etag(body, headers=()):
+    # Depende del cuerpo y de las cabeceras que cambian la página (cursor siguiente)
+    digest = hashlib.sha256(body)
+    for name, value in headers:
+        digest.update(f'\n{name}: {value}'.encode('utf-8'))
+    return digest.hexdigest()[:32]
+
+
+class CachedResponse:
+    __slots__ = ('status', 'body', 'headers', 'etag', 'product_ids', 'terms', 'id_match', 'expires_at', 'size')
+
+    def __init__(self, status, body, headers, product_ids, query, ttl):
+        self.status = status
+        self.body = body
+        self.headers = list(headers)
+        self.etag = strong_etag(body, self.headers)
+        self.product_ids = frozenset(product_ids)
+        self.terms = search_index.tokenize(query)
+        self.id_match = search_index.query_id_match(query)
+        self.expires_at = time.monotonic() + ttl
+        self.size = len(body) + sum(len(name) + len(value) for name, value in self.headers)
+
+    def could_match(self, product_id, tokens):
+        # Semántica del índice en memoria: todos los términos, cada uno por prefijo, o el id exacto
+        if self.id_match == product_id:
+            return True
+        return bool(self.terms) and all(any(token.startswith(term) for token in tokens) for term in self.terms)
+
+
+class SearchCache:
+    def __init__(self, max_entries=2000, max_bytes=32 * 1024 * 1024, ttl=60):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # En PostgreSQL la búsqueda también usa similitud de trigramas sobre el nombre, que no se
+        # puede reproducir aquí: un producto nuevo o renombrado vacía la caché completa.
+        self.fuzzy = False
+        self.relay = None
+        self._lock = threading.Lock()
+        self._entries = OrderedDict() # clave -> CachedResponse, del menos al más reciente
+        self._by_product = {}         # producto_id -> {claves}
+        self._bytes = 0
+        self.generation = 0           # cambia con cada invalidación (ver put)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def entry(self, status, body, headers, product_ids, query):
+        return CachedResponse(status, body, headers, product_ids, query, self.ttl)
+
+    def get(self, key):
+        if self.max_entries <= 0:
+            return None
+        if self.relay:
+            self.relay.ensure_started()
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None and cached.expires_at <= time.monotonic():
+                self._remove_locked(key)
+                self.expirations += 1
+                cached = None
+            if cached is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return cached
+
+    def put(self, key, cached, generation):
+        # `generation` se lee antes de consultar la base: si hubo una invalidación mientras se
+        # calculaba la respuesta, esta puede estar desactualizada y no se guarda.
+        if self.max_entries <= 0 or cached.size > self.max_bytes:
+            return False
+        with self._lock:
+            if generation != self.generation:
+                return False
+            self._remove_locked(key)
+            self._entries[key] = cached
+            self._bytes += cached.size
+            for product_id in cached.product_ids:
+                self._by_product.setdefault(product_id, set()).add(key)
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                oldest = next(iter(self._entries))
+                self._remove_locked(oldest)
+                self.evictions += 1
+            return True
+
+    def _remove_locked(self, key):
+        cached = self._entries.pop(key, None)
+        if cached is None:
+            return
+        self._bytes -= cached.size
+        for product_id in cached.product_ids:
+            keys = self._by_product.get(product_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_product[product_id]
+
+    def invalidate_products(self, product_ids):
+        # Stock, precio o datos de productos que ya aparecen en resultados guardados
+        with self._lock:
+            self.generation += 1
+            keys = set()
+            for product_id in product_ids:
+                keys.update(self._by_product.get(product_id, ()))
+            for key in keys:
+                self._remove_locked(key)
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def invalidate_matching(self, products):
+        # Productos nuevos o renombrados: {producto_id: texto (nombre, marca, descripción)}
+        if not products:
+            return 0
+        if self.fuzzy:
+            return self.clear()
+        tokens_by_id = {product_id: set(search_index.tokenize(text)) for product_id, text in products.items()}
+        with self._lock:
+            self.generation += 1
+            keys = [key for key, cached in self._entries.items()
+                    if any(cached.could_match(product_id, tokens) for product_id, tokens in tokens_by_id.items())]
+            for key in keys:
+                self._remove_locked(key)
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            removed = len(self._entries)
+            self._entries.clear()
+            self._by_product.clear()
+            self._bytes = 0
+            self.invalidations += removed
+            return removed
+
+    def apply_changes(self, changes):
+        # {'ids': [...], 'new': {producto_id: texto}} o {'all': True}; ver availability.announce_changes
+        if changes.get('all'):
+            return self.clear()
+        removed = self.invalidate_products(int(product_id) for product_id in changes.get('ids', ()))
+        new = {int(product_id): text for product_id, text in (changes.get('new') or {}).items()}
+        return removed + self.invalidate_matching(new)
+
+    def deliver(self, payload):
+        # Punto de entrada de sse_broadcaster.PostgresRelay (notificaciones de otros procesos)
+        self.apply_changes(payload)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+                'relay': self.relay.name if self.relay else None,
+            }
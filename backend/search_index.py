@@ -0,0 +1,236 @@
+# Archivo: backend/search_index.py
+# Búsqueda de productos. En PostgreSQL usa los índices tsvector/pg_trgm creados por
+# migrations/0001_busqueda_productos.sql (POSTGRES_SEARCH_SQL); con otros motores
+# (SQLite en pruebas/desarrollo) usa el índice invertido en memoria de este módulo.
+#
+# Qué encuentra una consulta (igual en ambos motores):
+#  - palabras completas de nombre, marca y descripción; los términos de MIN_PREFIX_LENGTH
+#    caracteres o más también como prefijo ("mart" -> "martillo"); los más cortos solo exactos
+#  - el nombre que contiene la consulta completa, como el antiguo ilike '%q%', si la consulta
+#    tiene MIN_SUBSTRING_LENGTH caracteres o más (índice de trigramas). Con menos, solo los
+#    nombres que empiezan por ella: "?q=a" ya no trae todo producto con una "a" en el nombre.
+#  - nombres parecidos (similitud de trigramas, solo PostgreSQL) y el producto cuyo id es la consulta
+# Se paginan como mucho las SEARCH_MAX_CANDIDATES mejores coincidencias por (score desc, id): una
+# consulta muy amplia ordena solo ese tope (top-N, no la tabla entera) y sus páginas más allá
+# quedan vacías. El tope es siempre el mismo conjunto, así que el cursor no salta ni repite filas.
+import base64
+import bisect
+import heapq
+import json
+import re
+import threading
+import unicodedata
+
+from sqlalchemy import text as sql_text
+
+TOKEN_RE = re.compile(r'\w+')
+
+# Peso de cada campo en el ranking: el nombre manda sobre la marca y la descripción
+FIELD_WEIGHTS = {'nombre': 3.0, 'marca': 2.0, 'description': 1.0}
+# Una coincidencia por prefijo ("mart" -> "martillo") vale menos que la palabra completa
+PREFIX_FACTOR = 0.5
+# Puntaje que se da a un producto cuyo id coincide exactamente con la consulta
+ID_MATCH_SCORE = 100.0
+# Solo el nombre contiene la consulta (sin palabra ni prefijo que coincida)
+SUBSTRING_SCORE = 0.25
+# Términos más cortos no se expanden como prefijo ("a:*" recorrería casi todo el índice)
+MIN_PREFIX_LENGTH = 3
+# Largo desde el que el índice de trigramas sirve para buscar subcadenas ('%q%')
+MIN_SUBSTRING_LENGTH = 3
+# Coincidencias que se paginan como máximo (las de mayor score)
+SEARCH_MAX_CANDIDATES = 2000
+
+
+def fold_text(text):
+    # Minúsculas y sin tildes: "Martíllo" -> "martillo", "Ñandú" -> "nandu"
+    if not text:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(fold_text(text))
+
+
+def build_tsquery(query):
+    # Consulta para to_tsquery('simple', ...): todos los términos; los largos también como prefijo.
+    # Los tokens solo contienen caracteres \w, así que no hay operadores que escapar.
+    return ' & '.join(f'{token}:*' if len(token) >= MIN_PREFIX_LENGTH else token for token in tokenize(query))
+
+
+def name_like_pattern(query):
+    # Patrón LIKE sobre el nombre normalizado: subcadena si la consulta es larga, prefijo si no
+    folded = fold_text(query).strip()
+    if not folded:
+        return None
+    escaped = folded.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%' if len(folded) >= MIN_SUBSTRING_LENGTH else f'{escaped}%'
+
+
+def query_id_match(query):
+    # Una consulta numérica también busca el producto con ese id
+    return int(query) if query.strip().isdigit() else None
+
+
+# --- Cursor de paginación: (score, id) del último resultado, opaco para el cliente ---
+def encode_cursor(score, doc_id):
+    raw = json.dumps({'s': score, 'id': doc_id}, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    padding = '=' * (-len(cursor) % 4)
+    data = json.loads(base64.urlsafe_b64decode(cursor + padding))
+    if not isinstance(data, dict):
+        raise ValueError("Cursor inválido")
+    return float(data['s']), int(data['id'])
+
+
+# --- Búsqueda en PostgreSQL (índices de migrations/0001_busqueda_productos.sql) ---
+POSTGRES_SEARCH_SQL = sql_text("""
+    WITH candidates AS (
+        SELECT p.id,
+               (CASE WHEN p.id = :id_match THEN :id_match_score ELSE 0 END
+                + ts_rank(p.search_vector, to_tsquery('simple', :tsquery))
+                + similarity(f_unaccent(lower(p.nombre)), :folded))::float8 AS score
+        FROM productos p
+        WHERE p.id = :id_match
+           OR p.search_vector @@ to_tsquery('simple', :tsquery)
+           OR f_unaccent(lower(p.nombre)) % :folded
+           OR f_unaccent(lower(p.nombre)) LIKE :name_pattern
+        ORDER BY score DESC, p.id
+        LIMIT :max_candidates
+    )
+    SELECT id, score FROM candidates
+    WHERE CAST(:after_score AS float8) IS NULL
+       OR score < :after_score
+       OR (score = :after_score AND id > :after_id)
+    ORDER BY score DESC, id
+    LIMIT :limit
+""")
+
+
+def postgres_search_params(query, limit, after=None, max_candidates=SEARCH_MAX_CANDIDATES):
+    return {
+        'id_match': query_id_match(query),
+        'id_match_score': ID_MATCH_SCORE,
+        'tsquery': build_tsquery(query),
+        'folded': fold_text(query),
+        'name_pattern': name_like_pattern(query),
+        'max_candidates': max(max_candidates, limit), # la exportación NDJSON pide más que el tope
+        'after_score': after[0] if after else None,
+        'after_id': after[1] if after else None,
+        'limit': limit,
+    }
+
+
+class InvertedIndex:
+    def __init__(self, field_weights=None):
+        self.field_weights = field_weights or FIELD_WEIGHTS
+        self._lock = threading.RLock()
+        self._postings = {}   # token -> {doc_id: peso}
+        self._doc_tokens = {}  # doc_id -> set(tokens), para poder quitar/reindexar
+        self._tokens = []     # tokens ordenados, para expandir prefijos con bisect
+        self._names = {}      # doc_id -> nombre normalizado, para la búsqueda por subcadena
+
+    def __len__(self):
+        return len(self._doc_tokens)
+
+    def __contains__(self, doc_id):
+        return doc_id in self._doc_tokens
+
+    def clear(self):
+        with self._lock:
+            self._postings.clear()
+            self._doc_tokens.clear()
+            self._tokens = []
+            self._names.clear()
+
+    def add(self, doc_id, fields):
+        weights = {}
+        for field, text in fields.items():
+            weight = self.field_weights.get(field, 1.0)
+            for token in tokenize(text):
+                if weight > weights.get(token, 0.0):
+                    weights[token] = weight
+        with self._lock:
+            self._remove_locked(doc_id)
+            for token, weight in weights.items():
+                postings = self._postings.get(token)
+                if postings is None:
+                    postings = self._postings[token] = {}
+                    bisect.insort(self._tokens, token)
+                postings[doc_id] = weight
+            self._doc_tokens[doc_id] = set(weights)
+            self._names[doc_id] = fold_text(fields.get('nombre'))
+
+    def remove(self, doc_id):
+        with self._lock:
+            self._remove_locked(doc_id)
+
+    def _remove_locked(self, doc_id):
+        self._names.pop(doc_id, None)
+        for token in self._doc_tokens.pop(doc_id, ()):
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            postings.pop(doc_id, None)
+            if not postings:
+                del self._postings[token]
+                position = bisect.bisect_left(self._tokens, token)
+                if position < len(self._tokens) and self._tokens[position] == token:
+                    del self._tokens[position]
+
+    def _term_scores(self, term):
+        # Puntaje por documento para un término: coincidencia exacta o por prefijo
+        if len(term) < MIN_PREFIX_LENGTH:
+            return dict(self._postings.get(term, {}))
+        scores = {}
+        start = bisect.bisect_left(self._tokens, term)
+        for position in range(start, len(self._tokens)):
+            token = self._tokens[position]
+            if not token.startswith(term):
+                break
+            factor = 1.0 if token == term else PREFIX_FACTOR
+            for doc_id, weight in self._postings[token].items():
+                score = weight * factor
+                if score > scores.get(doc_id, 0.0):
+                    scores[doc_id] = score
+        return scores
+
+    def search(self, query, limit, after=None, id_match=None, max_candidates=None):
+        # Devuelve [(score, doc_id)] ordenado por score desc e id asc.
+        # `after` es la clave (score, doc_id) del último resultado de la página anterior;
+        # con max_candidates solo se paginan las mejores, como en POSTGRES_SEARCH_SQL.
+        terms = tokenize(query)
+        with self._lock:
+            totals = None
+            for term in terms:
+                scores = self._term_scores(term)
+                if totals is None:
+                    totals = scores
+                else:
+                    # Todos los términos deben aparecer (semántica AND)
+                    totals = {doc_id: totals[doc_id] + score
+                              for doc_id, score in scores.items() if doc_id in totals}
+                if not totals:
+                    break
+            totals = totals or {}
+            folded = fold_text(query).strip()
+            if folded:
+                # Como el LIKE de POSTGRES_SEARCH_SQL: subcadena del nombre, o prefijo si es corta
+                long_query = len(folded) >= MIN_SUBSTRING_LENGTH
+                for doc_id, name in self._names.items():
+                    if doc_id not in totals and (folded in name if long_query else name.startswith(folded)):
+                        totals[doc_id] = SUBSTRING_SCORE
+            if id_match is not None and id_match in self._doc_tokens:
+                totals[id_match] = totals.get(id_match, 0.0) + ID_MATCH_SCORE
+
+        candidates = ((-score, doc_id) for doc_id, score in totals.items())
+        if max_candidates is not None and len(totals) > max(max_candidates, limit):
+            candidates = iter(heapq.nsmallest(max(max_candidates, limit), candidates))
+        if after is not None:
+            after_key = (-after[0], after[1])
+            candidates = (key for key in candidates if key > after_key)
+        return [(-neg_score, doc_id) for neg_score, doc_id in heapq.nsmallest(limit, candidates)]
@@ -0,0 +1,288 @@
+# Archivo: backend/sse_broadcaster.py
+# Difusión de eventos Server-Sent Events (alertas de stock bajo) a muchos clientes:
+#  - buffer acotado por cliente; el cliente lento que lo llena se desconecta
+#  - alertas coalescidas por clave (producto/sucursal): solo se envía la más reciente
+#  - keepalive solo tras un intervalo sin eventos (no cada segundo)
+#  - anillo de eventos recientes para reenviar desde Last-Event-ID al reconectar; si lo perdido
+#    no cabe (más de max_pending o ya fuera del anillo) se envía un evento `reset` para que el
+#    cliente vuelva a pedir el estado completo
+#  - PostgresRelay: reparte los eventos entre procesos/workers con LISTEN/NOTIFY
+import json
+import os
+import select
+import threading
+import time
+from collections import OrderedDict, deque
+
+import log_config
+
+try:
+    import psycopg2
+except ImportError: # Sin psycopg2 no hay relay entre procesos
+    psycopg2 = None
+
+log = log_config.get_logger('sse')
+
+
+def format_sse(data: str, event=None, event_id=None) -> str:
+    msg = f'data: {data}\n\n'
+    if event is not None:
+        msg = f'event: {event}\n{msg}'
+    if event_id is not None:
+        msg = f'id: {event_id}\n{msg}'
+    return msg
+
+
+RESET_EVENT = 'reset'
+
+
+def coalescing_key(event):
+    return event['key'] if event['key'] is not None else ('id', event['id'])
+
+
+class Subscriber:
+    def __init__(self, max_pending):
+        self.max_pending = max_pending
+        self.pending = OrderedDict() # clave de coalescencia -> evento
+        self.condition = threading.Condition()
+        self.closed = False
+        self.evicted = False
+
+    def offer(self, event):
+        # Devuelve False si el cliente quedó desconectado por no consumir a tiempo
+        with self.condition:
+            if self.closed:
+                return False
+            key = coalescing_key(event)
+            coalesced = key in self.pending
+            if coalesced:
+                del self.pending[key] # se reemplaza y pasa al final de la cola
+            elif len(self.pending) >= self.max_pending:
+                self.closed = self.evicted = True
+                self.pending.clear()
+                self.condition.notify()
+                return False
+            self.pending[key] = event
+            self.condition.notify()
+            return True
+
+    def replay(self, events):
+        # Carga el reenvío al suscribirse sin desconectar: el Broadcaster ya lo recortó a max_pending
+        with self.condition:
+            for event in events:
+                key = coalescing_key(event)
+                self.pending.pop(key, None)
+                self.pending[key] = event
+            self.condition.notify()
+
+    def take(self, timeout):
+        # Espera hasta `timeout` segundos y devuelve los eventos pendientes (o [] si no hubo)
+        with self.condition:
+            if not self.pending and not self.closed:
+                self.condition.wait(timeout)
+            events = list(self.pending.values())
+            self.pending.clear()
+            return events
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+
+
+class Broadcaster:
+    def __init__(self, max_pending=100, replay_size=1000, keepalive_interval=15.0, retry_ms=3000):
+        self.max_pending = max_pending
+        self.keepalive_interval = keepalive_interval
+        self.retry_ms = retry_ms
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._ring = deque(maxlen=replay_size)
+        self._last_id = 0
+        self._dropped_id = 0 # id del último evento que salió del anillo
+        self.relay = None
+        self.published = 0
+        self.evicted = 0
+        self.resets = 0
+
+    def next_event_id(self):
+        # Ids crecientes basados en el reloj (µs), comparables entre procesos del mismo nodo
+        with self._lock:
+            self._last_id = max(self._last_id + 1, time.time_ns() // 1000)
+            return self._last_id
+
+    def subscribe(self, last_event_id=None):
+        subscriber = Subscriber(self.max_pending)
+        with self._lock:
+            if last_event_id is not None:
+                subscriber.replay(self._replay_since(last_event_id))
+            self._subscribers.add(subscriber)
+        if self.relay is not None:
+            self.relay.ensure_started()
+        return subscriber
+
+    def _replay_since(self, last_event_id):
+        # Eventos posteriores a last_event_id, coalescidos como en la cola del cliente. Si no caben en
+        # max_pending, o el anillo ya descartó alguno, se reenvían solo los más recientes precedidos de
+        # un `reset` con el id del último omitido (así un nuevo corte no vuelve a pedir lo mismo).
+        missed = OrderedDict()
+        for event in self._ring:
+            if event['id'] > last_event_id:
+                key = coalescing_key(event)
+                missed.pop(key, None)
+                missed[key] = event
+        events = list(missed.values())
+        lost = self._dropped_id > last_event_id
+        if not lost and len(events) <= self.max_pending:
+            return events
+        keep = events[max(len(events) - (self.max_pending - 1), 0):] if self.max_pending > 1 else []
+        skipped = [event['id'] for event in events[:len(events) - len(keep)]]
+        reset_id = max(skipped + [self._dropped_id])
+        self.resets += 1
+        reset = {
+            'id': reset_id,
+            'key': (RESET_EVENT,),
+            'message': format_sse(json.dumps({'reason': 'replay_truncated', 'last_event_id': last_event_id}),
+                                  RESET_EVENT, reset_id),
+        }
+        return [reset] + keep
+
+    def unsubscribe(self, subscriber):
+        subscriber.close()
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def publish(self, data, event=None, key=None):
+        # Punto de entrada de la aplicación: pasa por el relay si lo hay, para llegar a todos los workers
+        payload = {'id': self.next_event_id(), 'event': event, 'key': key, 'data': data}
+        if self.relay is not None and self.relay.publish(payload):
+            return payload
+        self.deliver(payload)
+        return payload
+
+    def deliver(self, payload):
+        # Entrega local (este proceso). `key` llega como lista desde JSON; se normaliza a tupla.
+        key = payload.get('key')
+        event = {
+            'id': payload['id'],
+            'key': tuple(key) if isinstance(key, list) else key,
+            'message': format_sse(json.dumps(payload['data']), payload.get('event'), payload['id']),
+        }
+        with self._lock:
+            self._last_id = max(self._last_id, event['id'])
+            if self._ring.maxlen and len(self._ring) == self._ring.maxlen:
+                self._dropped_id = max(self._dropped_id, self._ring[0]['id'])
+            self._ring.append(event)
+            subscribers = list(self._subscribers)
+            self.published += 1
+        for subscriber in subscribers:
+            if not subscriber.offer(event):
+                with self._lock:
+                    if subscriber in self._subscribers:
+                        self._subscribers.discard(subscriber)
+                        self.evicted += 1
+
+    def stream(self, subscriber):
+        # Generador para Response(mimetype='text/event-stream')
+        try:
+            yield f'retry: {self.retry_ms}\n\n'
+            while True:
+                events = subscriber.take(self.keepalive_interval)
+                if subscriber.closed:
+                    break
+                if not events:
+                    yield ': keepalive\n\n'
+                    continue
+                yield ''.join(event['message'] for event in events)
+        finally:
+            self.unsubscribe(subscriber)
+
+    def stats(self):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        return {
+            'subscribers': len(subscribers),
+            'queued_events': sum(len(s.pending) for s in subscribers),
+            'max_queue_depth': max((len(s.pending) for s in subscribers), default=0),
+            'published': self.published,
+            'evicted': self.evicted,
+            'replay_resets': self.resets,
+            'replay_buffer': len(self._ring),
+            'relay': self.relay.name if self.relay else None,
+        }
+
+
+class PostgresRelay:
+    # Reparte los eventos entre procesos con LISTEN/NOTIFY: el proceso que publica hace NOTIFY
+    # y cada proceso (incluido él mismo) entrega localmente lo que recibe por LISTEN.
+    name = 'postgres'
+
+    def __init__(self, broadcaster, dsn, channel='ferremas_low_stock'):
+        self.broadcaster = broadcaster
+        self.dsn = dsn
+        self.channel = channel
+        self._lock = threading.Lock()
+        self._pid = None
+        self._listening = threading.Event()
+        self._notify_conn = None
+        broadcaster.relay = self
+
+    def ensure_started(self):
+        # El hilo se arranca de forma perezosa en cada proceso (no sobrevive a un fork)
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._listening.clear()
+            self._notify_conn = None
+            threading.Thread(target=self._listen_forever, name='sse-pg-relay', daemon=True).start()
+
+    def publish(self, payload):
+        self.ensure_started()
+        if not self._listening.wait(timeout=1.0):
+            return False # sin listener activo se entrega solo localmente
+        try:
+            with self._lock:
+                if self._notify_conn is None or self._notify_conn.closed:
+                    self._notify_conn = psycopg2.connect(self.dsn)
+                    self._notify_conn.autocommit = True
+                with self._notify_conn.cursor() as cursor:
+                    cursor.execute("SELECT pg_notify(%s, %s)", (self.channel, json.dumps(payload)))
+            return True
+        except psycopg2.Error as e:
+            log.error("Fallo en NOTIFY, se entrega solo localmente: %s", e)
+            self._notify_conn = None
+            return False
+
+    def _listen_forever(self):
+        backoff = 1.0
+        while True:
+            try:
+                conn = psycopg2.connect(self.dsn)
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute(f'LISTEN "{self.channel}"')
+                self._listening.set()
+                backoff = 1.0
+                log.info("Escuchando canal %s (pid %d)", self.channel, os.getpid())
+                while True:
+                    if select.select([conn], [], [], 30) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notification = conn.notifies.pop(0)
+                        try:
+                            self.broadcaster.deliver(json.loads(notification.payload))
+                        except (ValueError, KeyError) as e:
+                            log.warning("Notificación inválida descartada en %s: %s", self.channel, e)
+            except Exception as e:
+                self._listening.clear()
+                log.error("Conexión LISTEN perdida en %s, reintento en %.0fs: %s", self.channel, backoff, e)
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+
+
+def postgres_relay_available(database_url):
+    return psycopg2 is not None and database_url.startswith(('postgresql', 'postgres:'))
@@ -0,0 +1,16 @@
+# Archivo: backend/wsgi.py
+# Punto de entrada de producción:
+#   cd backend && gunicorn -c gunicorn.conf.py wsgi:app
+# No es una fábrica de apps: app.py arma una única app al importarse (rutas, modelos, caches,
+# broadcaster SSE, configuración leída del entorno) y este módulo solo la expone. Con preload_app
+# eso ocurre una sola vez en el proceso maestro y los workers la heredan por fork; lo que no
+# sobrevive al fork se rehace en cada worker:
+#  - conexiones del engine: app.dispose_engine_after_fork (os.register_at_fork)
+#  - canales gRPC, hilos de pagos y relay LISTEN/NOTIFY: se recrean de forma perezosa por pid
+#  - hilo del logging por cola: log_config._restart_listener
+#  - hilos de refresco de tasas y de muestreo de métricas: se arrancan de forma perezosa por pid
+# Las cachés en memoria (tasas, búsquedas, cotización) son de cada worker y las métricas se suman
+# entre workers con PROMETHEUS_MULTIPROC_DIR; ver gunicorn.conf.py.
+# La base no se toca al arrancar: el esquema se prepara con `flask --app app init-db`.
+
+from app import app # noqa: F401
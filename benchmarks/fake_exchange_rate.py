@@ -0,0 +1,106 @@
+# Archivo: benchmarks/fake_exchange_rate.py
+# Proveedor de tipo de cambio falso (formato de v6.exchangerate-api.com /latest/CLP) para
+# desarrollo y benchmarks: responde siempre la misma tabla de tasas, con latencia y errores
+# configurables para ejercitar el refresco en segundo plano de backend/rate_cache.py.
+#
+# Uso (desde la raíz del repo):
+#   python benchmarks/fake_exchange_rate.py --port 8090 --latency-ms 300
+#   EXCHANGE_RATE_API_URL=http://127.0.0.1:8090/latest/CLP python backend/app.py
+# Desde Python: server, url = serve_in_thread(latency_ms=50)
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LATEST_PATH = '/latest/CLP'
+# Unidades de cada moneda por 1 CLP (la API se consulta con base CLP)
+DEFAULT_RATES = {
+    'CLP': 1, 'USD': 0.001063, 'EUR': 0.000981, 'ARS': 0.9512, 'BRL': 0.005834,
+    'PEN': 0.003962, 'MXN': 0.01952, 'JPY': 0.1598, 'GBP': 0.000838, 'CLF': 0.0000268,
+}
+
+
+class FakeExchangeRate:
+    def __init__(self, rates=None, latency_ms=0, error_rate=0.0, seed=None):
+        self.rates = dict(rates or DEFAULT_RATES)
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate # fracción de respuestas 503
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = {'latest': 0, 'errors': 0}
+
+    def count(self, kind):
+        with self.lock:
+            self.calls[kind] += 1
+
+    def should_fail(self):
+        with self.lock:
+            return self.random.random() < self.error_rate
+
+    def latest(self):
+        return {
+            'result': 'success',
+            'base_code': 'CLP',
+            'time_last_update_unix': int(time.time()),
+            'conversion_rates': self.rates,
+        }
+
+
+def make_handler(fake):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status, body):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if fake.latency_ms:
+                time.sleep(fake.latency_ms / 1000)
+            if not self.path.endswith(LATEST_PATH):
+                return self._send(404, {'result': 'error', 'error-type': 'unsupported-code'})
+            if fake.should_fail():
+                fake.count('errors')
+                return self._send(503, {'result': 'error', 'error-type': 'service-unavailable'})
+            fake.count('latest')
+            return self._send(200, fake.latest())
+
+    return Handler
+
+
+def serve_in_thread(port=0, **options):
+    # Devuelve (servidor, URL para EXCHANGE_RATE_API_URL); `server.fake` expone los contadores
+    fake = FakeExchangeRate(**options)
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(fake))
+    server.daemon_threads = True
+    server.fake = fake
+    threading.Thread(target=server.serve_forever, name='fake-exchange-rate', daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}{LATEST_PATH}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Proveedor de tipo de cambio falso (exchangerate-api v6)')
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--latency-ms', type=int, default=0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    args = parser.parse_args()
+    server, url = serve_in_thread(args.port, latency_ms=args.latency_ms, error_rate=args.error_rate)
+    print(f"Tipo de cambio falso escuchando en {url} (EXCHANGE_RATE_API_URL={url})")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
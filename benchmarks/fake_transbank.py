@@ -0,0 +1,176 @@
+# Archivo: benchmarks/fake_transbank.py
+# Transbank falso (API REST de Webpay Plus v1.2) para desarrollo, pruebas manuales y benchmarks.
+# Implementa crear (POST), confirmar (PUT) y estado (GET) de transacciones, con latencia y
+# errores configurables para ejercitar los reintentos y el circuit breaker de backend/payments.py.
+#
+# Uso (desde la raíz del repo):
+#   python benchmarks/fake_transbank.py --port 8089 --latency-ms 200 --error-rate 0.1
+#   TRANSBANK_HOST=http://127.0.0.1:8089 python backend/app.py
+# Desde Python: server, base_url = serve_in_thread(latency_ms=50)
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TRANSACTIONS_PATH = '/rswebpaytransaction/api/webpay/v1.2/transactions'
+TOKEN_PATH_RE = re.compile(re.escape(TRANSACTIONS_PATH) + r'/([^/]+)$')
+
+
+class FakeTransbank:
+    def __init__(self, latency_ms=0, error_rate=0.0, reject_rate=0.0, seed=None):
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate   # fracción de respuestas 503
+        self.reject_rate = reject_rate # fracción de pagos rechazados (response_code -1)
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.transactions = {}
+        self.calls = {'create': 0, 'commit': 0, 'status': 0, 'errors': 0}
+
+    def count(self, kind):
+        with self.lock:
+            self.calls[kind] += 1
+
+    def should_fail(self):
+        with self.lock:
+            return self.random.random() < self.error_rate
+
+    def create(self, payload, base_url):
+        token = uuid.uuid4().hex + uuid.uuid4().hex[:14]
+        with self.lock:
+            self.transactions[token] = {
+                'buy_order': payload['buy_order'],
+                'session_id': payload['session_id'],
+                'amount': payload['amount'],
+                'status': 'INITIALIZED',
+                'response_code': None,
+            }
+        return 200, {'token': token, 'url': f'{base_url}/webpayserver/initTransaction'}
+
+    def commit(self, token):
+        with self.lock:
+            tx = self.transactions.get(token)
+            if tx is None:
+                return 422, {'error_message': 'Invalid value for parameter: token'}
+            if tx['status'] != 'INITIALIZED':
+                return 422, {'error_message': f"Invalid status '{tx['status']}' for transaction while authorizing"}
+            rejected = self.random.random() < self.reject_rate
+            tx.update(
+                status='FAILED' if rejected else 'AUTHORIZED',
+                response_code=-1 if rejected else 0,
+                authorization_code=None if rejected else f'{self.random.randint(0, 999999):06d}',
+                transaction_date=datetime.now(timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z'),
+            )
+            return 200, self._details(tx)
+
+    def status(self, token):
+        with self.lock:
+            tx = self.transactions.get(token)
+            if tx is None:
+                return 422, {'error_message': 'Invalid value for parameter: token'}
+            return 200, self._details(tx)
+
+    @staticmethod
+    def _details(tx):
+        return {
+            'vci': 'TSY',
+            'amount': tx['amount'],
+            'status': tx['status'],
+            'buy_order': tx['buy_order'],
+            'session_id': tx['session_id'],
+            'card_detail': {'card_number': '6623'},
+            'accounting_date': datetime.now(timezone.utc).strftime('%m%d'),
+            'transaction_date': tx.get('transaction_date'),
+            'authorization_code': tx.get('authorization_code'),
+            'payment_type_code': 'VN',
+            'response_code': tx['response_code'],
+            'installments_number': 0,
+        }
+
+
+def make_handler(fake):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1' # keep-alive, para medir la reutilización de conexiones
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status, body):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _read_json(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            return json.loads(self.rfile.read(length) or b'{}')
+
+        def _handle(self, method):
+            payload = self._read_json() if method in ('POST', 'PUT') else None
+            if not self.headers.get('Tbk-Api-Key-Id') or not self.headers.get('Tbk-Api-Key-Secret'):
+                return self._send(401, {'error_message': 'Not Authorized'})
+            if fake.latency_ms:
+                time.sleep(fake.latency_ms / 1000)
+            if fake.should_fail():
+                fake.count('errors')
+                return self._send(503, {'error_message': 'Service Unavailable'})
+            if method == 'POST' and self.path.rstrip('/') == TRANSACTIONS_PATH:
+                fake.count('create')
+                host = self.headers.get('Host', f'127.0.0.1:{self.server.server_port}')
+                return self._send(*fake.create(payload, f'http://{host}'))
+            match = TOKEN_PATH_RE.match(self.path)
+            if match and method == 'PUT':
+                fake.count('commit')
+                return self._send(*fake.commit(match.group(1)))
+            if match and method == 'GET':
+                fake.count('status')
+                return self._send(*fake.status(match.group(1)))
+            return self._send(404, {'error_message': 'Not Found'})
+
+        def do_POST(self):
+            self._handle('POST')
+
+        def do_PUT(self):
+            self._handle('PUT')
+
+        def do_GET(self):
+            self._handle('GET')
+
+    return Handler
+
+
+def serve_in_thread(port=0, **options):
+    # Devuelve (servidor, url base); el servidor expone `server.fake` para consultar contadores
+    fake = FakeTransbank(**options)
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(fake))
+    server.daemon_threads = True
+    server.fake = fake
+    threading.Thread(target=server.serve_forever, name='fake-transbank', daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Transbank falso (Webpay Plus REST v1.2)')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency-ms', type=int, default=0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--reject-rate', type=float, default=0.0)
+    args = parser.parse_args()
+    server, base_url = serve_in_thread(args.port, latency_ms=args.latency_ms,
+                                       error_rate=args.error_rate, reject_rate=args.reject_rate)
+    print(f"Transbank falso escuchando en {base_url} (TRANSBANK_HOST={base_url})")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
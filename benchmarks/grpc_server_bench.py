@@ -0,0 +1,114 @@
+# Archivo: benchmarks/grpc_server_bench.py
+# Compara el servidor gRPC con pool de hilos (grpc_server.py) contra el de asyncio
+# (grpc_aio_server.py) lanzando AddProduct concurrentes contra cada uno.
+#
+# Uso (desde la raíz del repo):
+#   python benchmarks/grpc_server_bench.py --requests 2000 --concurrency 64
+#   python benchmarks/grpc_server_bench.py --database-url postgresql://... --modes aio
+# Sin --database-url cada modo usa una base SQLite temporal nueva.
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+sys.path.insert(0, BACKEND_DIR)
+
+import grpc
+from sqlalchemy import create_engine
+
+import catalog_queries
+import product_pb2
+import product_pb2_grpc
+
+SERVER_SCRIPTS = {'threaded': 'grpc_server.py', 'aio': 'grpc_aio_server.py'}
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def start_server(mode, database_url, port):
+    env = dict(os.environ, DATABASE_URL=database_url, GRPC_PORT=str(port))
+    log = open(os.path.join(tempfile.gettempdir(), f'grpc_bench_{mode}.log'), 'w')
+    process = subprocess.Popen([sys.executable, SERVER_SCRIPTS[mode]], cwd=BACKEND_DIR, env=env,
+                               stdout=log, stderr=subprocess.STDOUT)
+    with grpc.insecure_channel(f'localhost:{port}') as channel:
+        grpc.channel_ready_future(channel).result(timeout=30)
+    return process
+
+
+async def run_load(port, total, concurrency, run_id):
+    latencies = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+    async with grpc.aio.insecure_channel(f'localhost:{port}') as channel:
+        stub = product_pb2_grpc.ProductServiceStub(channel)
+
+        async def one(i):
+            nonlocal errors
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    await stub.AddProduct(product_pb2.AddProductRequest(
+                        name=f'bench-{run_id}-{i}', description='benchmark', price=1000 + i), timeout=30)
+                except grpc.aio.AioRpcError:
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.perf_counter() - started
+    return elapsed, sorted(latencies), errors
+
+
+def bench_mode(mode, args, port):
+    if args.database_url:
+        database_url = args.database_url
+    else:
+        database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='grpc-bench-'), 'bench.db')}"
+    catalog_queries.metadata.create_all(create_engine(database_url))
+    process = start_server(mode, database_url, port)
+    try:
+        asyncio.run(run_load(port, min(50, args.requests), args.concurrency, f'{mode}-warmup-{time.time_ns()}'))
+        elapsed, latencies, errors = asyncio.run(run_load(port, args.requests, args.concurrency, f'{mode}-{time.time_ns()}'))
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+    return {
+        'mode': mode,
+        'rps': args.requests / elapsed,
+        'p50': percentile(latencies, 50) * 1000,
+        'p95': percentile(latencies, 95) * 1000,
+        'p99': percentile(latencies, 99) * 1000,
+        'mean': statistics.mean(latencies) * 1000,
+        'errors': errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--modes', nargs='+', choices=sorted(SERVER_SCRIPTS), default=['threaded', 'aio'])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--database-url', help='Base de datos a usar (por defecto, SQLite temporal por modo)')
+    parser.add_argument('--port', type=int, default=50551)
+    args = parser.parse_args()
+
+    rows = [bench_mode(mode, args, args.port + i) for i, mode in enumerate(args.modes)]
+    print(f"\nAddProduct x{args.requests}, concurrencia {args.concurrency}")
+    print(f"{'modo':<10}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'media ms':>10}{'errores':>9}")
+    for row in rows:
+        print(f"{row['mode']:<10}{row['rps']:>10.1f}{row['p50']:>10.2f}{row['p95']:>10.2f}"
+              f"{row['p99']:>10.2f}{row['mean']:>10.2f}{row['errors']:>9}")
+
+
+if __name__ == '__main__':
+    main()
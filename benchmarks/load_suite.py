@@ -0,0 +1,538 @@
+# Archivo: benchmarks/load_suite.py
+# Suite de carga reproducible: siembra un catálogo sintético (N productos x M sucursales, con
+# imágenes), levanta el servidor gRPC (grpc_server.py) y la app Flask como procesos aparte, con
+# Transbank y el proveedor de tipo de cambio falsos, y mide:
+#   search  mezcla de búsquedas (caché caliente y fría, ?fields=, ?currency=) y detalle de producto
+#   cart    cotización, creación y confirmación del pago (outbox + Transbank falso)
+#   ingest  AddProduct concurrentes (con imagen) y BulkAddProducts contra ProductService
+#   sse     K oyentes de /events/low-stock; latencia desde la confirmación del pago hasta la alerta
+# Informa req/s y p50/p95/p99 por operación y compara contra una línea base guardada: termina con
+# código 1 si alguna operación empeora más que --tolerance (p95, req/s o errores).
+#
+# Uso (desde la raíz del repo):
+#   python benchmarks/load_suite.py --save-baseline                     # guarda benchmarks/baseline.json
+#   python benchmarks/load_suite.py                                     # compara contra esa línea base
+#   python benchmarks/load_suite.py --database-url postgresql://... --server gunicorn --workers 4
+# --server gunicorn usa backend/gunicorn.conf.py (gevent si está instalado; GUNICORN_WORKER_CLASS lo cambia).
+#   python benchmarks/load_suite.py --scenarios search sse --sse-listeners 200
+# Sin --database-url se usa una base SQLite temporal nueva: sirve para comparar cambios en la misma
+# máquina, pero con escrituras concurrentes (cart, ingest) SQLite serializa y mide sobre todo sus
+# bloqueos. Con --database-url la base debe estar vacía o ya sembrada por este script.
+# La línea base depende de la máquina: compare corridas en el mismo equipo y con suficientes
+# operaciones (--requests); con pocas, el p95 varía más que la tolerancia entre corridas iguales.
+# Con --server gunicorn y varios workers, las alertas SSE llegan a los oyentes de otros workers solo
+# si hay relay entre procesos (SSE_RELAY=postgres); con SQLite use --workers 1.
+import argparse
+import json
+import os
+import platform
+import random
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(BENCH_DIR, '..', 'backend')
+sys.path.insert(0, BACKEND_DIR)
+
+import grpc
+import requests
+
+import fake_exchange_rate
+import fake_transbank
+import product_pb2
+import product_pb2_grpc
+from grpc_server_bench import percentile
+from query_plans import load_app
+
+SCENARIOS = ('search', 'cart', 'ingest', 'sse')
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, 'baseline.json')
+WORDS = ('Martillo', 'Destornillador', 'Sierra', 'Taladro', 'Llave', 'Alicate', 'Tornillo', 'Clavo',
+         'Pintura', 'Brocha', 'Cinta', 'Nivel', 'Lija', 'Tuerca', 'Perno', 'Manguera')
+BRANDS = ('ToolCo', 'FixIt', 'CutMaster', 'Bauker', 'Stanley', 'Makita', 'Truper', 'Bosch')
+# Parámetros que cambian los números: si difieren de la línea base se avisa antes de comparar
+COMPARABLE_PARAMS = ('products', 'branches', 'images', 'requests', 'concurrency', 'sse_listeners',
+                     'sse_events', 'bulk_size', 'payment_workers', 'server', 'workers', 'threads', 'dialect')
+
+
+# --- Datos sintéticos ---
+def png_bytes(index, size=16):
+    # PNG válido de un color (sin Pillow): cada índice da una imagen distinta
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+    color = bytes(((index * 47) % 256, (index * 89) % 256, (index * 131) % 256))
+    rows = b''.join(b'\x00' + color * size for _ in range(size))
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', struct.pack('>IIBBBBB', size, size, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(rows))
+            + chunk(b'IEND', b''))
+
+
+def seed(app_module, args, batch_size=5000):
+    # Productos 1..N con stock de sobra en todas las sucursales; los de la alerta SSE (N+1..N+E) solo
+    # en la sucursal 1, con stock = umbral + 1: una compra de 1 unidad genera exactamente una alerta
+    import availability
+    from sqlalchemy import insert
+    db = app_module.db
+    if db.session.query(app_module.Producto.id).first() is not None:
+        print("Base ya sembrada: se usan los datos existentes.")
+        return
+    rng = random.Random(42)
+    started = time.perf_counter()
+    hashes = [app_module.store_image(png_bytes(i)) for i in range(args.images)]
+    db.session.execute(insert(app_module.Sucursal),
+                       [{'nombre': f'Sucursal {i}', 'direccion': f'Calle {i}'} for i in range(1, args.branches + 1)])
+    db.session.commit()
+    for first in range(1, args.products + 1, batch_size):
+        ids = range(first, min(first + batch_size, args.products + 1))
+        db.session.execute(insert(app_module.Producto), [
+            {'id': i, 'nombre': f'{WORDS[i % len(WORDS)]} {BRANDS[i % len(BRANDS)]} {i}', 'marca': BRANDS[i % len(BRANDS)],
+             'description': f'{WORDS[(i * 7) % len(WORDS)]} para uso profesional, modelo {i}',
+             'price': rng.randint(500, 90000), 'imagen_hash': hashes[i % len(hashes)] if hashes else None}
+            for i in ids
+        ])
+        db.session.execute(insert(app_module.ProductoSucursal), [
+            {'producto_id': i, 'sucursal_id': s, 'precio': rng.randint(500, 90000), 'stock': 1_000_000}
+            for i in ids for s in range(1, args.branches + 1)
+        ])
+        db.session.commit()
+    sse_ids = range(args.products + 1, args.products + args.sse_events + 1)
+    if sse_ids:
+        db.session.execute(insert(app_module.Producto), [
+            {'id': i, 'nombre': f'Alerta SSE {i}', 'marca': 'Bench', 'price': 1000} for i in sse_ids])
+        db.session.execute(insert(app_module.ProductoSucursal), [
+            {'producto_id': i, 'sucursal_id': 1, 'precio': 1000, 'stock': app_module.low_stock_threshold + 1}
+            for i in sse_ids])
+        db.session.commit()
+    availability.rebuild_all(db.session, batch_size=1000)
+    print(f"Sembrados {args.products} productos x {args.branches} sucursales ({args.images} imágenes) "
+          f"y {args.sse_events} productos de alerta en {time.perf_counter() - started:.1f}s.")
+
+
+def prepare_database(args):
+    # Se siembra en este proceso y se cierra la conexión antes de levantar los servidores
+    app_module = load_app(args.database_url)
+    with app_module.app.app_context():
+        db = app_module.db
+        db.create_all()
+        app_module.apply_migrations()
+        seed(app_module, args)
+        dialect = db.engine.dialect.name
+        db.session.remove()
+        db.engine.dispose()
+    return dialect
+
+
+# --- Servidores ---
+def wait_until(check, timeout, what):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if check():
+                return
+        except (requests.RequestException, grpc.RpcError, grpc.FutureTimeoutError):
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{what} no respondió en {timeout}s")
+
+
+class Servers:
+    # Transbank y tipo de cambio falsos en hilos; gRPC y Flask como subprocesos (logs en log_dir)
+    def __init__(self, args):
+        self.args = args
+        self.processes = []
+        self.log_dir = tempfile.mkdtemp(prefix='ferremas_load_')
+
+    def __enter__(self):
+        args = self.args
+        self.transbank, transbank_url = fake_transbank.serve_in_thread(latency_ms=args.upstream_latency_ms, seed=42)
+        self.rates, rates_url = fake_exchange_rate.serve_in_thread(latency_ms=args.upstream_latency_ms, seed=42)
+        self.http_url = f'http://127.0.0.1:{args.http_port}'
+        self.grpc_target = f'127.0.0.1:{args.grpc_port}'
+        env = dict(os.environ,
+                   DATABASE_URL=args.database_url,
+                   GRPC_PORT=str(args.grpc_port),
+                   GRPC_METRICS_PORT='0',
+                   PRODUCT_SERVICE_TARGET=self.grpc_target,
+                   TRANSBANK_HOST=transbank_url,
+                   EXCHANGE_RATE_API_URL=rates_url,
+                   EXCHANGE_RATE_CACHE_FILE=os.path.join(self.log_dir, 'rates.json'),
+                   PUBLIC_BASE_URL=self.http_url,
+                   PAYMENT_WORKERS=str(args.payment_workers),
+                   LOG_LEVEL=os.environ['LOG_LEVEL'])
+        try:
+            self._spawn('grpc', [sys.executable, 'grpc_server.py'], env)
+            with grpc.insecure_channel(self.grpc_target) as channel:
+                grpc.channel_ready_future(channel).result(timeout=60)
+            if args.server == 'gunicorn':
+                command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{args.http_port}',
+                           '--workers', str(args.workers), '--threads', str(args.threads), 'wsgi:app']
+            else:
+                command = [sys.executable, '-m', 'flask', '--app', 'app', 'run', '--port', str(args.http_port),
+                           '--with-threads', '--no-reload', '--no-debugger']
+            self._spawn('flask', command, env)
+            wait_until(lambda: requests.get(f'{self.http_url}/api/grpc/status', timeout=2).ok, 60, 'La app Flask')
+        except BaseException:
+            self.__exit__(None, None, None)
+            raise
+        return self
+
+    def _spawn(self, name, command, env):
+        log = open(os.path.join(self.log_dir, f'{name}.log'), 'w')
+        self.processes.append(subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT))
+
+    def __exit__(self, *exc):
+        for process in reversed(self.processes):
+            process.terminate()
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        for server in (getattr(self, 'transbank', None), getattr(self, 'rates', None)):
+            if server is not None:
+                server.shutdown()
+        return False
+
+
+# --- Medición ---
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.scenario_of = {}
+        self.elapsed = {}
+
+    def add(self, scenario, op, seconds, ok=True):
+        with self._lock:
+            self.scenario_of[op] = scenario
+            self.latencies[op].append(seconds)
+            if not ok:
+                self.errors[op] += 1
+
+    def timed(self, scenario, op, call, ok=lambda result: True):
+        # Ejecuta call(); una excepción de red/RPC o ok(result) falso cuentan como error
+        started = time.perf_counter()
+        result = None
+        try:
+            result = call()
+            success = ok(result)
+        except (requests.RequestException, grpc.RpcError, ValueError):
+            success = False
+        self.add(scenario, op, time.perf_counter() - started, success)
+        return result if success else None
+
+    def summary(self):
+        rows = {}
+        for op, values in self.latencies.items():
+            values = sorted(values)
+            elapsed = self.elapsed.get(self.scenario_of[op]) or 1
+            rows[op] = {
+                'scenario': self.scenario_of[op],
+                'count': len(values),
+                'errors': self.errors[op],
+                'rps': round(len(values) / elapsed, 2),
+                'p50': round(percentile(values, 50) * 1000, 2),
+                'p95': round(percentile(values, 95) * 1000, 2),
+                'p99': round(percentile(values, 99) * 1000, 2),
+                'mean': round(sum(values) / len(values) * 1000, 2),
+            }
+        return rows
+
+
+def run_concurrently(total, concurrency, work):
+    # work(i, session) en `concurrency` hilos; cada hilo reutiliza su propia sesión HTTP
+    local = threading.local()
+
+    def one(i):
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        work(i, local.session)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [executor.submit(one, i) for i in range(total)]:
+            future.result()
+    return time.perf_counter() - started
+
+
+def is_ok(response):
+    return response.status_code < 400
+
+
+# --- Escenarios ---
+def scenario_search(ctx):
+    args, recorder, base = ctx['args'], ctx['recorder'], ctx['servers'].http_url
+    rng = random.Random(1)
+    # (operación, peso, parámetros): los términos frecuentes se repiten (caché caliente); 'search.cold'
+    # usa el id del producto en la consulta, así que casi siempre es un miss de la caché
+    mix = [('search.hot', 50), ('search.cold', 15), ('search.fields', 10), ('search.currency', 10), ('product.detail', 15)]
+    plan = rng.choices([op for op, _ in mix], weights=[weight for _, weight in mix], k=args.requests)
+    picks = [(rng.choice(WORDS), rng.choice(BRANDS), rng.randint(1, args.products)) for _ in plan]
+
+    def work(i, session):
+        op = plan[i]
+        word, brand, producto_id = picks[i]
+        if op == 'product.detail':
+            url, params = f'{base}/api/productos/{producto_id}', None
+        else:
+            params = {'q': f'{word} {brand}', 'limit': 20}
+            if op == 'search.cold':
+                params['q'] = f'{WORDS[producto_id % len(WORDS)]} {producto_id}'
+            elif op == 'search.fields':
+                params['fields'] = 'id,nombre,price'
+            elif op == 'search.currency':
+                params['currency'] = 'USD'
+        # 404 = búsqueda sin resultados: respuesta válida
+        recorder.timed('search', op, lambda: session.get(url if op == 'product.detail' else f'{base}/api/productos/buscar',
+                                                          params=params, timeout=30),
+                       lambda r: r.status_code < 400 or r.status_code == 404)
+
+    recorder.elapsed['search'] = run_concurrently(args.requests, args.concurrency, work)
+
+
+def checkout(recorder, scenario, prefix, session, base, buy_order, items):
+    # Crea la orden (esperando el outbox si responde 202) y confirma el pago; devuelve True si quedó pagada
+    def create():
+        response = session.post(f'{base}/api/webpay/create', json={
+            'buy_order': buy_order, 'session_id': f'bench-{buy_order}', 'cart_items': items}, timeout=60)
+        deadline = time.monotonic() + 60
+        while response.status_code == 202 and time.monotonic() < deadline:
+            time.sleep(0.05)
+            response = session.get(base + response.json()['poll_url'], timeout=30)
+        return response
+
+    created = recorder.timed(scenario, f'{prefix}.create', create, lambda r: r.status_code == 200 and 'token' in r.json())
+    if created is None:
+        return False
+    token = created.json()['token']
+    committed = recorder.timed(scenario, f'{prefix}.commit',
+                               lambda: session.get(f'{base}/api/webpay/commit', params={'token_ws': token}, timeout=60),
+                               lambda r: r.status_code == 200)
+    return committed is not None
+
+
+def scenario_cart(ctx):
+    args, recorder, base = ctx['args'], ctx['recorder'], ctx['servers'].http_url
+    rng = random.Random(2)
+    carts = [[{'product_id': rng.randint(1, args.products), 'sucursal_id': rng.randint(1, args.branches),
+               'quantity': rng.randint(1, 3)} for _ in range(rng.randint(1, 4))] for _ in range(args.requests)]
+    run_id = ctx['run_id']
+
+    def work(i, session):
+        recorder.timed('cart', 'cart.quote',
+                       lambda: session.post(f'{base}/api/cart/quote', params={'currency': 'USD'},
+                                            json={'cart_items': carts[i]}, timeout=30), is_ok)
+        checkout(recorder, 'cart', 'checkout', session, base, f'C{run_id}-{i}', carts[i])
+
+    # Cada compra pasa por Transbank (2 llamadas): se limita a un tercio de las peticiones del resto
+    total = max(1, args.requests // 3)
+    recorder.elapsed['cart'] = run_concurrently(total, args.concurrency, work)
+
+
+def scenario_ingest(ctx):
+    args, recorder = ctx['args'], ctx['recorder']
+    run_id = ctx['run_id']
+    images = [png_bytes(10_000 + i) for i in range(8)]
+    channel = grpc.insecure_channel(ctx['servers'].grpc_target)
+    stub = product_pb2_grpc.ProductServiceStub(channel)
+
+    def add(i, session):
+        request = product_pb2.AddProductRequest(name=f'Ingesta {run_id}-{i}', description='producto de la suite de carga',
+                                                price=1000 + i, image=images[i % len(images)] if i % 2 else b'')
+        recorder.timed('ingest', 'grpc.add_product', lambda: stub.AddProduct(request, timeout=60),
+                       lambda response: response.success)
+
+    def bulk(i, session):
+        requests_iter = (product_pb2.AddProductRequest(name=f'Lote {run_id}-{i}-{j}', description='lote', price=500 + j)
+                         for j in range(args.bulk_size))
+        recorder.timed('ingest', 'grpc.bulk_add', lambda: stub.BulkAddProducts(requests_iter, timeout=600),
+                       lambda response: response.failed == 0)
+
+    try:
+        elapsed = run_concurrently(args.requests, args.concurrency, add)
+        batches = max(1, args.requests // args.bulk_size)
+        elapsed += run_concurrently(batches, min(args.concurrency, 4), bulk)
+    finally:
+        channel.close()
+    recorder.elapsed['ingest'] = elapsed
+
+
+def scenario_sse(ctx):
+    args, recorder, base = ctx['args'], ctx['recorder'], ctx['servers'].http_url
+    sse_ids = list(range(args.products + 1, args.products + args.sse_events + 1))
+    if not sse_ids or not args.sse_listeners:
+        return
+    sent_at = {}
+    received = defaultdict(dict) # oyente -> {producto_id: instante}
+    connected = threading.Semaphore(0)
+
+    def listen(listener):
+        # Hilo daemon: termina cuando se detiene la app al final de la corrida
+        try:
+            with requests.get(f'{base}/events/low-stock', stream=True, timeout=(5, None)) as response:
+                connected.release()
+                for line in response.iter_lines(decode_unicode=True):
+                    if line and line.startswith('data: '):
+                        data = json.loads(line[len('data: '):])
+                        received[listener].setdefault(data.get('product_id'), time.perf_counter())
+        except requests.RequestException:
+            pass
+
+    threads = [threading.Thread(target=listen, args=(k,), daemon=True) for k in range(args.sse_listeners)]
+    for thread in threads:
+        thread.start()
+    for _ in threads:
+        if not connected.acquire(timeout=30):
+            raise RuntimeError("Los oyentes SSE no lograron conectarse (¿hilos suficientes en el servidor?)")
+
+    run_id = ctx['run_id']
+
+    def buy(i, session):
+        producto_id = sse_ids[i]
+        sent_at[producto_id] = time.perf_counter()
+        checkout(recorder, 'sse', 'sse.checkout', session, base, f'S{run_id}-{i}', [{'product_id': producto_id, 'sucursal_id': 1, 'quantity': 1}])
+
+    started = time.perf_counter()
+    run_concurrently(len(sse_ids), min(args.concurrency, 8), buy)
+    expected = len(sse_ids) * args.sse_listeners
+    deadline = time.monotonic() + 30
+    while sum(len(got) for got in received.values()) < expected and time.monotonic() < deadline:
+        time.sleep(0.05)
+    recorder.elapsed['sse'] = time.perf_counter() - started
+    for listener in range(args.sse_listeners):
+        for producto_id, at in sent_at.items():
+            got = received[listener].get(producto_id)
+            recorder.add('sse', 'sse.delivery', (got - at) if got else time.perf_counter() - at, got is not None)
+
+
+SCENARIO_RUNNERS = {'search': scenario_search, 'cart': scenario_cart, 'ingest': scenario_ingest, 'sse': scenario_sse}
+
+
+# --- Informe y línea base ---
+def print_table(rows, baseline_rows=None):
+    print(f"\n{'operación':<22}{'n':>7}{'err':>6}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+          + (f"{'Δp95':>9}{'Δreq/s':>9}" if baseline_rows else ''))
+    for op in sorted(rows, key=lambda name: (SCENARIOS.index(rows[name]['scenario']), name)):
+        row = rows[op]
+        line = (f"{op:<22}{row['count']:>7}{row['errors']:>6}{row['rps']:>10.1f}{row['p50']:>10.2f}"
+                f"{row['p95']:>10.2f}{row['p99']:>10.2f}")
+        base = (baseline_rows or {}).get(op)
+        if base:
+            line += f"{relative_change(row['p95'], base['p95']):>9}{relative_change(row['rps'], base['rps']):>9}"
+        print(line)
+
+
+def relative_change(value, reference):
+    if not reference:
+        return '-'
+    return f'{(value - reference) / reference * 100:+.0f}%'
+
+
+def compare(rows, baseline, tolerance):
+    # Regresión: p95 sube o req/s baja más que la tolerancia, o aparecen errores que no había
+    regressions = []
+    for op, row in rows.items():
+        base = baseline['results'].get(op)
+        if base is None:
+            continue
+        if row['p95'] > base['p95'] * (1 + tolerance):
+            regressions.append(f"{op}: p95 {base['p95']:.2f} -> {row['p95']:.2f} ms")
+        if row['rps'] < base['rps'] * (1 - tolerance):
+            regressions.append(f"{op}: req/s {base['rps']:.1f} -> {row['rps']:.1f}")
+        if row['errors'] > base['errors']:
+            regressions.append(f"{op}: errores {base['errors']} -> {row['errors']}")
+    return regressions
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Suite de carga de Ferremas (Flask + gRPC)')
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--database-url', help='Por defecto, una base SQLite temporal nueva')
+    parser.add_argument('--products', type=int, default=5000)
+    parser.add_argument('--branches', type=int, default=4)
+    parser.add_argument('--images', type=int, default=50, help='Imágenes distintas repartidas entre los productos')
+    parser.add_argument('--requests', type=int, default=1000, help='Operaciones por escenario')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--bulk-size', type=int, default=200, help='Productos por stream de BulkAddProducts')
+    parser.add_argument('--sse-listeners', type=int, default=50)
+    parser.add_argument('--sse-events', type=int, default=20, help='Alertas de stock bajo a emitir')
+    parser.add_argument('--payment-workers', type=int, default=4, help='Hilos del outbox de pagos en cada worker de la app')
+    parser.add_argument('--upstream-latency-ms', type=int, default=20, help='Latencia de Transbank y del tipo de cambio falsos')
+    parser.add_argument('--server', choices=('werkzeug', 'gunicorn'), default='werkzeug')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--threads', type=int, default=128, help='Hilos por worker con gthread (los oyentes SSE ocupan uno cada uno)')
+    parser.add_argument('--http-port', type=int, default=5081)
+    parser.add_argument('--grpc-port', type=int, default=50581)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='Guarda los resultados como nueva línea base')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Cambio relativo admitido antes de marcar regresión')
+    parser.add_argument('--output', help='Archivo JSON donde guardar los resultados de esta corrida')
+    args = parser.parse_args()
+
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    args.database_url = args.database_url or f"sqlite:///{tempfile.mkdtemp(prefix='ferremas_load_')}/load.db"
+    dialect = prepare_database(args)
+    recorder = Recorder()
+    with Servers(args) as servers:
+        print(f"Servidores listos (logs en {servers.log_dir}).")
+        ctx = {'args': args, 'recorder': recorder, 'servers': servers, 'run_id': time.time_ns() % 10**9}
+        for name in args.scenarios:
+            print(f"Escenario {name}...")
+            SCENARIO_RUNNERS[name](ctx)
+        upstream = {'transbank': dict(servers.transbank.fake.calls), 'exchange_rate': dict(servers.rates.fake.calls)}
+
+    params = {name: getattr(args, name) for name in COMPARABLE_PARAMS if name != 'dialect'}
+    params['dialect'] = dialect
+    results = {
+        'meta': {'revision': git_revision(), 'python': platform.python_version(), 'platform': platform.platform(),
+                 'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()), 'params': params, 'upstream_calls': upstream},
+        'results': recorder.summary(),
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    baseline = None
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_table(results['results'], baseline['results'] if baseline else None)
+    print(f"Llamadas a servicios externos falsos: {upstream}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Línea base guardada en {args.baseline}.")
+        return 0
+    if baseline is None:
+        print(f"Sin línea base en {args.baseline}; use --save-baseline para crearla.")
+        return 0
+    differing = [f"{name}={baseline['meta']['params'].get(name)}->{params[name]}"
+                 for name in COMPARABLE_PARAMS if baseline['meta']['params'].get(name) != params[name]]
+    if differing:
+        print(f"Aviso: parámetros distintos a los de la línea base ({', '.join(differing)}); la comparación es orientativa.")
+    regressions = compare(results['results'], baseline, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESIÓN {regression}")
+    print(f"{len(regressions)} regresión(es) respecto de {baseline['meta'].get('revision') or 'la línea base'} "
+          f"(tolerancia {args.tolerance:.0%}).")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,160 @@
+# Archivo: benchmarks/query_plans.py
+# Verificación de planes de consulta: siembra un volumen grande de datos y comprueba con
+# EXPLAIN que el inventario por sucursal y los ítems de una orden usan los índices de
+# migrations/0008_indices_inventario.sql (o de los modelos, en SQLite) y no recorren la tabla.
+# Termina con código 1 si alguna consulta hace un escaneo secuencial de la tabla vigilada.
+#
+# Uso (desde la raíz del repo):
+#   python benchmarks/query_plans.py                       # SQLite temporal nueva
+#   python benchmarks/query_plans.py --database-url postgresql://... --products 200000
+# Con --database-url la base debe estar vacía o ya sembrada por este script (no borra nada).
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+
+
+def load_app(database_url):
+    # app.py lee DATABASE_URL al importarse y resuelve rutas relativas a backend/
+    os.environ['DATABASE_URL'] = database_url
+    os.environ.setdefault('PAYMENT_WORKERS', '0')
+    sys.path.insert(0, BACKEND_DIR)
+    os.chdir(BACKEND_DIR)
+    import app
+    return app
+
+
+def seed(app_module, products, branches, orders, batch_size=5000):
+    from sqlalchemy import insert
+    db = app_module.db
+    if db.session.query(app_module.Producto.id).first() is not None:
+        print("Base ya sembrada: se usan los datos existentes.")
+        return
+    rng = random.Random(42)
+    started = time.perf_counter()
+    db.session.execute(insert(app_module.Sucursal), [{'nombre': f'Sucursal {i}'} for i in range(1, branches + 1)])
+    for first in range(1, products + 1, batch_size):
+        ids = range(first, min(first + batch_size, products + 1))
+        db.session.execute(insert(app_module.Producto), [
+            {'id': i, 'nombre': f'Producto {i}', 'marca': f'Marca {i % 50}', 'price': rng.randint(500, 90000)}
+            for i in ids
+        ])
+        db.session.execute(insert(app_module.ProductoSucursal), [
+            {'producto_id': i, 'sucursal_id': s, 'precio': rng.randint(500, 90000),
+             'stock': rng.randint(0, 500)}
+            for i in ids for s in range(1, branches + 1)
+        ])
+        db.session.commit()
+    for first in range(1, orders + 1, batch_size):
+        ids = range(first, min(first + batch_size, orders + 1))
+        db.session.execute(insert(app_module.Orden), [
+            {'id': i, 'buy_order': f'QP{i}', 'session_id': 'query-plans', 'amount': 1000, 'status': 'PAID'} for i in ids
+        ])
+        db.session.execute(insert(app_module.OrderItem), [
+            {'orden_id': i, 'producto_id': rng.randint(1, products), 'sucursal_id': rng.randint(1, branches),
+             'quantity': 1, 'price_at_purchase': 1000}
+            for i in ids for _ in range(3)
+        ])
+        db.session.commit()
+    print(f"Sembrados {products} productos x {branches} sucursales y {orders} órdenes "
+          f"en {time.perf_counter() - started:.1f}s.")
+
+
+def checked_queries(app_module, products):
+    from sqlalchemy import select
+    import branch_inventory
+    OrderItem = app_module.OrderItem
+    middle = products // 2
+    return [
+        ('inventario por producto', 'productos_sucursales',
+         branch_inventory.inventory_page_stmt(1, 'producto', limit=50)),
+        ('inventario por producto (página siguiente)', 'productos_sucursales',
+         branch_inventory.inventory_page_stmt(1, 'producto', limit=50, after=(middle, middle))),
+        ('inventario por stock desc', 'productos_sucursales',
+         branch_inventory.inventory_page_stmt(2, 'stock', descending=True, limit=50, after=(250, middle))),
+        ('inventario con bajo stock', 'productos_sucursales',
+         branch_inventory.inventory_page_stmt(1, 'stock', limit=50, max_stock=10)),
+        ('inventario por precio', 'productos_sucursales',
+         branch_inventory.inventory_page_stmt(3, 'precio', limit=50)),
+        ('ítems de una orden', 'orden_items',
+         select(OrderItem.producto_id, OrderItem.quantity).where(OrderItem.orden_id == 10)),
+        ('ventas de un producto', 'orden_items',
+         select(OrderItem.orden_id).where(OrderItem.producto_id == middle)),
+    ]
+
+
+def sqlite_plan(conn, sql):
+    rows = conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}').all()
+    return [row[-1] for row in rows]
+
+
+def sqlite_full_scans(plan, table):
+    # "SCAN productos_sucursales" sin "USING ... INDEX" es un recorrido completo de la tabla
+    return [line for line in plan
+            if line.startswith(f'SCAN {table}') and 'INDEX' not in line]
+
+
+def postgres_plan(conn, sql):
+    return conn.exec_driver_sql(f'EXPLAIN (FORMAT JSON) {sql}').scalar()[0]['Plan']
+
+
+def postgres_full_scans(plan, table):
+    scans = []
+    pending = [plan]
+    while pending:
+        node = pending.pop()
+        if node.get('Node Type') == 'Seq Scan' and node.get('Relation Name') == table:
+            scans.append(f"Seq Scan on {table}")
+        pending.extend(node.get('Plans', ()))
+    return scans
+
+
+def describe_postgres(plan):
+    nodes, pending = [], [plan]
+    while pending:
+        node = pending.pop(0)
+        nodes.append(f"{node['Node Type']}{' ' + node['Index Name'] if 'Index Name' in node else ''}")
+        pending.extend(node.get('Plans', ()))
+    return nodes
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Verifica que las consultas de inventario usen índices')
+    parser.add_argument('--database-url', help='Por defecto, una base SQLite temporal nueva')
+    parser.add_argument('--products', type=int, default=50000)
+    parser.add_argument('--branches', type=int, default=5)
+    parser.add_argument('--orders', type=int, default=20000)
+    args = parser.parse_args()
+
+    database_url = args.database_url or f"sqlite:///{tempfile.mkdtemp(prefix='ferremas_plans_')}/plans.db"
+    app_module = load_app(database_url)
+    failures = 0
+    with app_module.app.app_context():
+        db = app_module.db
+        db.create_all()
+        app_module.apply_migrations()
+        seed(app_module, args.products, args.branches, args.orders)
+        dialect = db.engine.dialect
+        with db.engine.connect() as conn:
+            conn.exec_driver_sql('ANALYZE')
+            for name, table, stmt in checked_queries(app_module, args.products):
+                sql = str(stmt.compile(dialect=dialect, compile_kwargs={'literal_binds': True}))
+                if dialect.name == 'postgresql':
+                    plan = postgres_plan(conn, sql)
+                    full_scans, description = postgres_full_scans(plan, table), describe_postgres(plan)
+                else:
+                    plan = sqlite_plan(conn, sql)
+                    full_scans, description = sqlite_full_scans(plan, table), plan
+                status = 'FALLA' if full_scans else 'ok'
+                failures += bool(full_scans)
+                print(f"[{status}] {name}: {' | '.join(description)}")
+    print(f"{failures} consulta(s) con escaneo completo.")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
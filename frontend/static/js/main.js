@@ -44,7 +44,6 @@ document.addEventListener('DOMContentLoaded', () => {
 
     // --- Variables de estado ---
     let selectedProductInfo = null; // Objeto que almacenará info del producto/sucursal seleccionado para la venta
-    let currentExchangeRate = 0; // Guardará el tipo de cambio USD/CLP
 
     // --- Formateadores de moneda ---
     const clpFormatter = new Intl.NumberFormat('es-CL', {
@@ -98,10 +97,11 @@ document.addEventListener('DOMContentLoaded', () => {
                 productHeader.textContent = `${product.nombre} (${product.marca || 'N/A'}) - ID: ${product.id}`;
                 productItem.appendChild(productHeader);
 
-                // Si el producto tiene imagen en base64, mostrarla
-                if (product.imagen_base64) {
+                // Si el producto tiene imagen, mostrar la miniatura servida por el backend
+                if (product.imagen_url) {
                     const img = document.createElement('img');
-                    img.src = `data:image/jpeg;base64,${product.imagen_base64}`; 
+                    img.src = `${product.imagen_url}&size=100`;
+                    img.loading = 'lazy';
                     img.alt = `Imagen de ${product.nombre}`;
                     img.style.maxWidth = '100px';
                     img.style.maxHeight = '100px';
@@ -122,11 +122,13 @@ document.addEventListener('DOMContentLoaded', () => {
                         li.dataset.productName = product.nombre;
                         li.dataset.branchId = branch.sucursal_id;
                         li.dataset.price = branch.precio;
-                        li.dataset.stock = branch.stock;
+                        // Disponible = stock - unidades reservadas por órdenes en curso
+                        const available = branch.disponible ?? branch.stock;
+                        li.dataset.stock = available;
                         li.dataset.branchName = branch.nombre;
 
                         li.innerHTML = `
-                            ${branch.nombre}: Cant: <span class="branch-stock">${branch.stock}</span> | Precio: <span class="branch-price">${clpFormatter.format(branch.precio)}</span>
+                            ${branch.nombre}: Cant: <span class="branch-stock">${available}</span> | Precio: <span class="branch-price">${clpFormatter.format(branch.precio)}</span>
                             <button class="select-product-btn">Seleccionar</button>
                         `;
                         branchListForProduct.appendChild(li);
@@ -165,6 +167,45 @@ document.addEventListener('DOMContentLoaded', () => {
         calculateTotals();
         displayMessage(`Producto seleccionado en ${selectedProductInfo.branchName}. Stock disponible: ${selectedProductInfo.stock}`, 'info', statusMessagePara);
         validateQuantity();
+        refreshQuote();
+    }
+
+    // Consulta al servidor el precio y el disponible vigentes de la línea seleccionada
+    async function refreshQuote() {
+        if (!selectedProductInfo) {
+            return;
+        }
+        const quantity = parseInt(quantityInput.value, 10);
+        try {
+            // El servidor convierte el total a USD en la misma cotización (sin pedir el tipo de cambio aparte)
+            const response = await fetch('/api/cart/quote?currency=USD', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({
+                    cart_items: [{
+                        product_id: selectedProductInfo.productId,
+                        sucursal_id: selectedProductInfo.branchId,
+                        quantity: isNaN(quantity) || quantity <= 0 ? 1 : quantity
+                    }]
+                })
+            });
+            if (!response.ok) {
+                return;
+            }
+            const quote = await response.json();
+            const line = quote.lines[0];
+            if (line && line.unit_price !== undefined) {
+                selectedProductInfo.price = line.unit_price;
+                selectedProductInfo.stock = line.available;
+                selectedProductInfo.usdRate = quote.converted ? parseFloat(quote.converted.rate) : 0;
+                unitPriceClpSpan.textContent = clpFormatter.format(line.unit_price);
+                selectedProductStockSpan.textContent = line.available;
+                calculateTotals();
+                validateQuantity();
+            }
+        } catch (error) {
+            console.error('Error al cotizar el carro:', error);
+        }
     }
 
     // Función para resetear la sección de detalle de venta
@@ -200,8 +241,8 @@ document.addEventListener('DOMContentLoaded', () => {
         const totalClp = quantity * price;
         totalClpSpan.textContent = clpFormatter.format(totalClp);
 
-        if (currentExchangeRate > 0) {
-            const totalUsd = totalClp / currentExchangeRate;
+        if (selectedProductInfo.usdRate > 0) {
+            const totalUsd = totalClp * selectedProductInfo.usdRate;
             totalUsdSpan.textContent = usdFormatter.format(totalUsd);
         } else {
             totalUsdSpan.textContent = 'N/A';
@@ -291,7 +332,17 @@ document.addEventListener('DOMContentLoaded', () => {
                 throw new Error(errorData.error || errorData.message || `HTTP error! status: ${response.status}`);
             }
 
-            const data = await response.json();
+            let data = await response.json();
+
+            // 202: la transacción sigue en cola; se consulta su estado hasta obtener url y token
+            for (let attempt = 0; response.status === 202 && data.poll_url && attempt < 60; attempt++) {
+                await new Promise(resolve => setTimeout(resolve, 1000));
+                const pollResponse = await fetch(data.poll_url);
+                data = await pollResponse.json();
+                if (pollResponse.status !== 202) {
+                    break;
+                }
+            }
 
             if (data.url && data.token) {
                 console.log('DEBUG (Frontend): Redireccionando a URL de Transbank:', data.url); // LOG DEPURACIÓN
@@ -318,31 +369,6 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
-    // Función para obtener el tipo de cambio USD/CLP
-    async function getExchangeRate() {
-        try {
-            const response = await fetch('/api/exchange_rate');
-            if (!response.ok) {
-                console.warn(`HTTP error getting exchange rate! status: ${response.status}`);
-                return response.json().catch(() => ({}));
-            }
-            const data = await response.json();
-            if (data && data.rate) {
-                currentExchangeRate = data.rate;
-                console.log('DEBUG (Frontend): Tipo de cambio obtenido del backend:', currentExchangeRate);
-                calculateTotals();
-            } else {
-                console.warn('DEBUG (Frontend): No se pudo obtener un tipo de cambio válido del backend.');
-                currentExchangeRate = 0;
-                totalUsdSpan.textContent = 'N/A';
-            }
-        } catch (error) {
-            console.error('DEBUG (Frontend): Error obteniendo tipo de cambio del backend:', error);
-            currentExchangeRate = 0;
-            totalUsdSpan.textContent = 'N/A';
-        }
-    }
-
     // --- Implementación de Server-Sent Events (SSE) para Stock Bajo ---
     function setupLowStockSSE() {
         if (typeof EventSource !== "undefined") {
@@ -372,6 +398,16 @@ document.addEventListener('DOMContentLoaded', () => {
                 }
             });
 
+            // El servidor no pudo reenviar todas las alertas perdidas: se vuelve a consultar el estado
+            eventSource.addEventListener('reset', function() {
+                lowStockNotificationsDiv.innerHTML = '';
+                const resetElement = document.createElement('p');
+                resetElement.textContent = `Se perdieron alertas de stock durante la desconexión; se muestran solo las más recientes.`;
+                resetElement.className = 'low-stock-alert message warning';
+                lowStockNotificationsDiv.appendChild(resetElement);
+                refreshQuote();
+            });
+
             eventSource.onerror = function(error) {
                 console.error('Error en la conexión SSE:', error);
                 const errorElement = document.createElement('p');
@@ -572,7 +608,6 @@ document.addEventListener('DOMContentLoaded', () => {
 
 
     // --- Inicialización ---
-    getExchangeRate();
     setupLowStockSSE();
     resetSaleDetails();
 });
@@ -0,0 +1,51 @@
+# Archivo: tests/conftest.py
+# Las pruebas corren sin servicios externos (desde la raíz del repo: python -m pytest -q tests).
+# Los módulos del backend se importan como en producción (cd backend), y los proveedores falsos
+# de benchmarks/ hacen de APIs externas.
+import os
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'benchmarks'))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'backend'))
+
+
+@pytest.fixture(scope='session')
+def app_module(tmp_path_factory):
+    # app.py lee la configuración al importarse: base SQLite propia y sin hilos de pagos
+    os.environ['DATABASE_URL'] = f"sqlite:///{tmp_path_factory.mktemp('db') / 'ferremas.db'}"
+    os.environ['PAYMENT_WORKERS'] = '0'
+    os.environ['SSE_RELAY'] = 'none'
+    import app
+    return app
+
+
+@pytest.fixture
+def db(app_module):
+    # Tablas nuevas en cada prueba, dentro del contexto de la app
+    with app_module.app.app_context():
+        app_module.db.create_all()
+        yield app_module.db
+        app_module.db.session.remove()
+        app_module.db.drop_all()
+    app_module.reset_product_index()
+    app_module.search_results_cache.clear()
+
+
+@pytest.fixture
+def catalog(app_module, db):
+    # Dos sucursales y tres productos; stock 5 en Centro y 50 en Matriz
+    centro = app_module.Sucursal(nombre='Centro', direccion='Av. Principal 123')
+    matriz = app_module.Sucursal(nombre='Casa Matriz')
+    productos = [app_module.Producto(nombre=nombre, marca=marca, price=price)
+                 for nombre, marca, price in (('Martillo', 'ToolCo', 8500), ('Destornillador', 'FixIt', 3200),
+                                              ('Sierra', 'CutMaster', 15000))]
+    db.session.add_all([centro, matriz, *productos])
+    db.session.flush()
+    for producto in productos:
+        db.session.add(app_module.ProductoSucursal(producto_id=producto.id, sucursal_id=centro.id, precio=producto.price, stock=5))
+        db.session.add(app_module.ProductoSucursal(producto_id=producto.id, sucursal_id=matriz.id, precio=producto.price, stock=50))
+    db.session.commit()
+    return {'centro': centro.id, 'matriz': matriz.id, 'productos': [producto.id for producto in productos]}
@@ -0,0 +1,127 @@
+# Archivo: tests/test_branch_inventory.py
+# Paginación por cursor (keyset) de branch_inventory.py sobre SQLite, con empates en la columna de orden.
+import base64
+from decimal import Decimal
+
+import pytest
+
+import branch_inventory
+
+# (stock, precio) por producto: varios empates en stock y en precio para cruzar los bordes de página
+STOCKS_AND_PRICES = [(3, '1990.50'), (7, '500'), (3, '1990.50'), (1, '500'), (3, '12000'),
+                     (7, '1990.50'), (9, '500'), (3, '750.25')]
+
+
+@pytest.fixture
+def branch(app_module, db):
+    sucursal = app_module.Sucursal(nombre='Centro')
+    otra = app_module.Sucursal(nombre='Norte')
+    db.session.add_all([sucursal, otra])
+    db.session.flush()
+    expected = []
+    for position, (stock, precio) in enumerate(STOCKS_AND_PRICES):
+        producto = app_module.Producto(nombre=f'Producto {position}', marca='Gen', price=Decimal(precio))
+        db.session.add(producto)
+        db.session.flush()
+        db.session.add(app_module.ProductoSucursal(producto_id=producto.id, sucursal_id=sucursal.id,
+                                                   precio=Decimal(precio), stock=stock))
+        db.session.add(app_module.ProductoSucursal(producto_id=producto.id, sucursal_id=otra.id,
+                                                   precio=Decimal(precio), stock=100))
+        expected.append({'producto_id': producto.id, 'stock': stock, 'precio': Decimal(precio)})
+    db.session.commit()
+    return sucursal.id, expected
+
+
+def walk(db, sucursal_id, sort, descending=False, limit=3, max_stock=None):
+    # Recorre todas las páginas pasando el cursor por encode/decode como lo haría el cliente
+    pages, cursor = [], None
+    while True:
+        after = branch_inventory.decode_cursor(cursor, sort) if cursor else None
+        rows = db.session.execute(branch_inventory.inventory_page_stmt(
+            sucursal_id, sort=sort, descending=descending, limit=limit, max_stock=max_stock, after=after))
+        items, cursor = branch_inventory.page_from_rows(rows, sort, limit)
+        pages.append([item['producto_id'] for item in items])
+        if cursor is None:
+            return pages
+
+
+def expected_order(expected, sort, descending=False):
+    key = (lambda row: row['producto_id']) if sort == 'producto' else (lambda row: (row[sort], row['producto_id']))
+    return [row['producto_id'] for row in sorted(expected, key=key, reverse=descending)]
+
+
+@pytest.mark.parametrize('sort', ['producto', 'stock', 'precio'])
+@pytest.mark.parametrize('descending', [False, True])
+def test_pages_cover_every_row_once_across_ties(db, branch, sort, descending):
+    sucursal_id, expected = branch
+
+    pages = walk(db, sucursal_id, sort, descending)
+
+    assert [producto_id for page in pages for producto_id in page] == expected_order(expected, sort, descending)
+    assert [len(page) for page in pages] == [3, 3, 2]
+
+
+def test_exact_multiple_of_limit_has_no_empty_last_page(db, branch):
+    sucursal_id, expected = branch
+
+    pages = walk(db, sucursal_id, 'stock', limit=4)
+
+    assert [len(page) for page in pages] == [4, 4]
+
+
+def test_descending_cursor_inside_a_tie_continues_with_lower_ids(db, branch):
+    sucursal_id, expected = branch
+    tied = sorted(row['producto_id'] for row in expected if row['stock'] == 3)
+
+    # Cursor en el segundo de los empatados con stock 3, de mayor a menor id
+    after = (3, tied[-2])
+    rows = db.session.execute(branch_inventory.inventory_page_stmt(sucursal_id, 'stock', descending=True, limit=10, after=after))
+
+    assert [(row.stock, row.producto_id) for row in rows] == [(3, pid) for pid in reversed(tied[:-2])] + [(1, expected[3]['producto_id'])]
+
+
+def test_price_cursor_keeps_decimals(db, branch):
+    sucursal_id, expected = branch
+
+    rows = list(db.session.execute(branch_inventory.inventory_page_stmt(sucursal_id, 'precio', limit=4)))
+    _, cursor = branch_inventory.page_from_rows(rows, 'precio', 4)
+
+    assert branch_inventory.decode_cursor(cursor, 'precio') == (Decimal('750.25'), expected[7]['producto_id'])
+
+
+def test_max_stock_filters_before_paginating(db, branch):
+    sucursal_id, expected = branch
+
+    pages = walk(db, sucursal_id, 'stock', limit=2, max_stock=3)
+
+    assert [producto_id for page in pages for producto_id in page] == \
+        expected_order([row for row in expected if row['stock'] <= 3], 'stock')
+
+
+@pytest.mark.parametrize('cursor, sort', [
+    ('no-es-base64!', 'stock'),
+    (base64.urlsafe_b64encode(b'{"o":"stock","v":3}').decode().rstrip('='), 'stock'),
+    (branch_inventory.encode_cursor('stock', 3, 1), 'precio'),
+    (base64.urlsafe_b64encode(b'{"o":"precio","v":"abc","id":1}').decode().rstrip('='), 'precio'),
+])
+def test_decode_cursor_rejects_malformed_cursors(cursor, sort):
+    with pytest.raises(ValueError, match='Cursor inválido'):
+        branch_inventory.decode_cursor(cursor, sort)
+
+
+def test_route_follows_next_cursor_and_rejects_bad_params(app_module, db, branch):
+    sucursal_id, expected = branch
+    http = app_module.app.test_client()
+
+    seen, url = [], f'/api/sucursales/{sucursal_id}/inventario?sort=precio&order=desc&limit=5'
+    while url:
+        response = http.get(url)
+        assert response.status_code == 200
+        seen.extend(item['producto_id'] for item in response.json['items'])
+        cursor = response.json['next_cursor']
+        url = f'/api/sucursales/{sucursal_id}/inventario?sort=precio&order=desc&limit=5&cursor={cursor}' if cursor else None
+
+    assert seen == expected_order(expected, 'precio', descending=True)
+    assert http.get(f'/api/sucursales/{sucursal_id}/inventario?sort=nombre').status_code == 400
+    assert http.get(f'/api/sucursales/{sucursal_id}/inventario?sort=stock&cursor=xyz').status_code == 400
+    assert http.get('/api/sucursales/999/inventario').status_code == 404
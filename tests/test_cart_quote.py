@@ -0,0 +1,102 @@
+# Archivo: tests/test_cart_quote.py
+# Validación del carro y cotización de cart_quote.py sobre SQLite.
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import insert
+
+import cart_quote
+import catalog_queries
+import inventory
+
+
+@pytest.mark.parametrize('items, message', [
+    ([], 'lista no vacía'),
+    ({'product_id': 1}, 'lista no vacía'),
+    ([{'product_id': 1, 'sucursal_id': 1, 'quantity': 1}] * (cart_quote.MAX_CART_LINES + 1), 'como máximo'),
+    ([{'product_id': 1, 'sucursal_id': 1}], 'Línea 0'),
+    ([{'product_id': 1, 'sucursal_id': 1, 'quantity': 1}, {'product_id': 'x', 'sucursal_id': 1, 'quantity': 1}], 'Línea 1'),
+    ([{'product_id': 1, 'sucursal_id': None, 'quantity': 1}], 'enteros'),
+    ([{'product_id': 1, 'sucursal_id': 1, 'quantity': 0}], 'mayor que cero'),
+    ([{'product_id': 1, 'sucursal_id': 1, 'quantity': -2}], 'mayor que cero'),
+])
+def test_parse_cart_items_rejects_invalid_carts(items, message):
+    with pytest.raises(ValueError, match=message):
+        cart_quote.parse_cart_items(items)
+
+
+def test_parse_cart_items_converts_to_int_tuples():
+    items = [{'product_id': '3', 'sucursal_id': 1, 'quantity': '2'}, {'product_id': 3, 'sucursal_id': 1, 'quantity': 1}]
+    assert cart_quote.parse_cart_items(items) == [(3, 1, 2), (3, 1, 1)]
+
+
+def test_quote_compares_split_lines_against_total_requested(db, catalog):
+    martillo, destornillador = catalog['productos'][:2]
+    centro = catalog['centro']
+
+    quote = cart_quote.quote_cart(db.session, [(martillo, centro, 3), (destornillador, centro, 1), (martillo, centro, 3)])
+
+    assert [line['ok'] for line in quote['lines']] == [False, True, False]
+    assert quote['lines'][0]['error'] == 'Stock insuficiente.'
+    assert quote['lines'][0]['available'] == 5
+    assert quote['total'] == Decimal('8500') * 6 + Decimal('3200')
+    assert quote['currency'] == 'CLP'
+    assert not quote['ok']
+
+
+def test_quote_totals_lines_in_request_order(db, catalog):
+    martillo, destornillador, sierra = catalog['productos']
+    centro, matriz = catalog['centro'], catalog['matriz']
+
+    quote = cart_quote.quote_cart(db.session, [(sierra, matriz, 10), (martillo, centro, 2), (destornillador, centro, 3)])
+
+    assert quote['ok']
+    assert [(line['product_name'], line['sucursal_name'], line['subtotal']) for line in quote['lines']] == [
+        ('Sierra', 'Casa Matriz', Decimal('150000')),
+        ('Martillo', 'Centro', Decimal('17000')),
+        ('Destornillador', 'Centro', Decimal('9600')),
+    ]
+    assert quote['total'] == Decimal('176600')
+
+
+def test_quote_flags_missing_branch_rows_without_pricing_them(db, catalog):
+    martillo, centro = catalog['productos'][0], catalog['centro']
+
+    quote = cart_quote.quote_cart(db.session, [(martillo, centro, 1), (martillo, 99, 1), (999, centro, 1)])
+
+    assert [line['ok'] for line in quote['lines']] == [True, False, False]
+    assert quote['lines'][1]['error'] == 'Producto no disponible en esta sucursal.'
+    assert 'subtotal' not in quote['lines'][2]
+    assert quote['total'] == Decimal('8500')
+    assert not quote['ok']
+
+
+def test_quote_subtracts_active_holds(app_module, db, catalog):
+    martillo, centro = catalog['productos'][0], catalog['centro']
+    order = app_module.Orden(buy_order='Q-1', session_id='s', amount=1000, status='PENDING')
+    db.session.add(order)
+    db.session.flush()
+    inventory.reserve_stock(db.session, order.id, [(martillo, centro, 4)], 900)
+    db.session.execute(insert(catalog_queries.reservas_stock), {
+        'orden_id': order.id, 'producto_id': martillo, 'sucursal_id': centro, 'quantity': 1,
+        'status': 'ACTIVE', 'expires_at': inventory.utcnow() - timedelta(seconds=1)})
+    db.session.commit()
+
+    quote = cart_quote.quote_cart(db.session, [(martillo, centro, 2)])
+
+    assert quote['lines'][0]['available'] == 1
+    assert not quote['ok']
+
+
+def test_quote_reuses_cached_rows_until_cleared(app_module, db, catalog):
+    martillo, centro = catalog['productos'][0], catalog['centro']
+    cache = cart_quote.BranchRowCache(ttl=60)
+    assert cart_quote.quote_cart(db.session, [(martillo, centro, 5)], cache)['ok']
+
+    db.session.query(app_module.ProductoSucursal).filter_by(producto_id=martillo, sucursal_id=centro).update({'stock': 0})
+    db.session.commit()
+    assert cart_quote.quote_cart(db.session, [(martillo, centro, 5)], cache)['ok']
+
+    cache.clear()
+    assert not cart_quote.quote_cart(db.session, [(martillo, centro, 5)], cache)['ok']
@@ -0,0 +1,145 @@
+# Archivo: tests/test_catalog_import.py
+# Importación en stream de catalog_import.py por el camino genérico (SQLite), vía app.run_catalog_import.
+import io
+import json
+
+from sqlalchemy import func, select
+
+import availability
+import catalog_import
+from catalog_queries import productos, productos_sucursales
+
+
+def csv_stream(*lines):
+    return io.BytesIO(('\n'.join(lines) + '\n').encode('utf-8'))
+
+
+def jsonl_stream(*rows):
+    return io.BytesIO(''.join((row if isinstance(row, str) else json.dumps(row)) + '\n' for row in rows).encode('utf-8'))
+
+
+def product_rows(db):
+    return {row.nombre: (row.marca, float(row.price))
+            for row in db.session.execute(select(productos.c.nombre, productos.c.marca, productos.c.price))}
+
+
+def test_productos_csv_is_merged_by_batches(app_module, db, catalog):
+    stream = csv_stream(
+        '\ufeffnombre,marca,description,price', # BOM de Excel
+        'Taladro,Bosch,Percutor,45990',
+        ',SinNombre,,1000',
+        'Martillo,ToolCo,,9100.499',
+        'Lija,3M,,abc',
+        'Taladro,Makita,Percutor,47990',
+        'Destornillador,FixIt,,3200',
+        'Brocha,Tumi,,1500,extra',
+        'Serrucho,Bellota,,12990',
+    )
+
+    report = app_module.run_catalog_import(stream, 'productos', 'csv', batch_size=2).to_dict()
+
+    assert {key: report[key] for key in ('processed', 'inserted', 'updated', 'unchanged', 'duplicates', 'rejected', 'batches')} == \
+        {'processed': 8, 'inserted': 2, 'updated': 2, 'unchanged': 1, 'duplicates': 0, 'rejected': 3, 'batches': 3}
+    assert [(reject['line'], reject['message']) for reject in report['rejects']] == [
+        (3, 'nombre es obligatorio'), (5, 'price debe ser un número'), (8, 'La fila tiene más columnas que el encabezado.')]
+    rows = product_rows(db)
+    assert rows['Martillo'] == ('ToolCo', 9100.5)
+    assert rows['Taladro'] == ('Makita', 47990.0) # el lote siguiente lo actualiza
+    assert rows['Serrucho'] == ('Bellota', 12990.0)
+    new_ids = db.session.execute(select(productos.c.id).where(productos.c.nombre.in_(['Taladro', 'Serrucho']))).scalars().all()
+    assert set(availability.load_documents(db.session, new_ids)) == set(new_ids)
+
+
+def test_duplicate_names_in_a_batch_keep_the_last_row(app_module, db):
+    stream = jsonl_stream({'nombre': 'Taladro', 'price': 100}, {'nombre': 'Taladro', 'marca': 'Bosch', 'price': 200})
+
+    report = app_module.run_catalog_import(stream, 'productos', 'jsonl', batch_size=10)
+
+    assert (report.inserted, report.duplicates) == (1, 1)
+    assert product_rows(db) == {'Taladro': ('Bosch', 200.0)}
+
+
+def test_inventario_jsonl_resolves_names_and_rejects_unknown_keys(app_module, db, catalog):
+    martillo, destornillador, sierra = catalog['productos']
+    centro, matriz = catalog['centro'], catalog['matriz']
+    db.session.execute(productos_sucursales.delete().where(productos_sucursales.c.producto_id == sierra,
+                                                           productos_sucursales.c.sucursal_id == matriz))
+    db.session.commit()
+
+    stream = jsonl_stream(
+        {'producto_id': martillo, 'sucursal_id': centro, 'precio': 8990, 'stock': 12},
+        {'nombre': 'Destornillador', 'sucursal_id': centro, 'precio': 3200, 'stock': 5},
+        '{no es json',
+        {'nombre': 'Sierra', 'sucursal_id': matriz, 'precio': 14990, 'stock': 3},
+        {'producto_id': 999, 'sucursal_id': centro, 'precio': 100, 'stock': 1},
+        {'producto_id': martillo, 'sucursal_id': 999, 'precio': 100, 'stock': 1},
+        {'producto_id': martillo, 'sucursal_id': matriz, 'precio': 100, 'stock': -1},
+        '[1, 2]',
+    )
+
+    report = app_module.run_catalog_import(stream, 'inventario', 'jsonl', batch_size=3)
+
+    assert (report.processed, report.inserted, report.updated, report.unchanged, report.rejected) == (8, 1, 1, 1, 5)
+    assert [reject['line'] for reject in report.rejects] == [3, 7, 8, 5, 6]
+    stock = {(row.producto_id, row.sucursal_id): row.stock for row in db.session.execute(select(productos_sucursales))}
+    assert stock[(martillo, centro)] == 12
+    assert stock[(destornillador, centro)] == 5
+    assert stock[(sierra, matriz)] == 3
+    documents = availability.load_documents(db.session, [martillo, sierra])
+    assert documents[martillo]['stock_total'] == 62
+    assert documents[sierra]['stock_total'] == 8
+
+
+def test_batches_are_committed_while_the_stream_is_read(app_module, db):
+    lines_read = []
+
+    def rows():
+        yield 'nombre,price\n'
+        for position in range(10):
+            lines_read.append(position)
+            yield f'Producto {position},{1000 + position}\n'
+
+    class Stream(io.RawIOBase):
+        # Stream de solo lectura que entrega el CSV a medida que se pide, como request.stream
+        def __init__(self):
+            self.chunks = (chunk.encode('utf-8') for chunk in rows())
+            self.pending = b''
+
+        def readable(self):
+            return True
+
+        def readinto(self, buffer):
+            while not self.pending:
+                self.pending = next(self.chunks, None)
+                if self.pending is None:
+                    return 0
+            size = min(len(buffer), len(self.pending))
+            buffer[:size] = self.pending[:size]
+            self.pending = self.pending[size:]
+            return size
+
+    committed = []
+
+    def progress(report):
+        # Otra conexión ve cada lote confirmado antes de que se lea el resto del archivo
+        with db.engine.connect() as connection:
+            committed.append((connection.execute(select(func.count()).select_from(productos)).scalar(), len(lines_read)))
+
+    report = catalog_import.import_stream(db.session, io.BufferedReader(Stream(), buffer_size=16), 'productos', 'csv',
+                                          batch_size=4, progress=progress)
+
+    assert report.inserted == 10
+    assert [count for count, _ in committed] == [4, 8, 10]
+    assert all(read < 10 for _, read in committed[:-1])
+
+
+def test_import_route_detects_format_and_validates_params(app_module, db):
+    http = app_module.app.test_client()
+
+    response = http.post('/api/import/productos', data='nombre,price\nTaladro,45990\n', content_type='text/csv')
+    assert response.status_code == 200
+    assert (response.json['inserted'], response.json['format']) == (1, 'csv')
+
+    assert http.post('/api/import/productos', data='{}', content_type='text/plain').status_code == 415
+    assert http.post('/api/import/productos?format=jsonl&batch_size=0', data='{}').status_code == 400
+    assert http.post('/api/import/clientes', data='', content_type='text/csv').status_code == 404
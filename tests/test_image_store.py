@@ -0,0 +1,22 @@
+# Archivo: tests/test_image_store.py
+from sqlalchemy.dialects import postgresql
+
+import catalog_queries
+
+
+def test_insert_images_stmt_ignores_existing_hash():
+    sql = str(catalog_queries.insert_images_stmt('postgresql').compile(dialect=postgresql.dialect()))
+    assert 'ON CONFLICT (sha256) DO NOTHING' in sql
+
+
+def test_store_image_tolerates_row_committed_by_another_worker(app_module, db):
+    data = b'\x89PNG\r\n\x1a\n' + b'0' * 64
+    # Otro worker guardó los mismos bytes entre medio: la fila ya existe y no se vio antes
+    with db.engine.begin() as conn:
+        conn.execute(catalog_queries.insert_images_stmt(db.engine.dialect.name),
+                     {'sha256': app_module.image_store.content_hash(data), 'mime_type': 'image/png',
+                      'size': len(data), 'data': data})
+    sha256 = app_module.store_image(data)
+    assert app_module.store_image(data) == sha256
+    db.session.commit()
+    assert db.session.query(app_module.Imagen).filter_by(sha256=sha256).count() == 1
@@ -0,0 +1,183 @@
+# Archivo: tests/test_inventory.py
+# Reservas de stock de inventory.py sobre SQLite: vencimiento, liberación, contención y pago.
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import select, update
+from sqlalchemy.dialects import postgresql
+
+import availability
+import catalog_queries
+import inventory
+
+
+@pytest.fixture
+def new_order(app_module, db):
+    def create(buy_order):
+        order = app_module.Orden(buy_order=buy_order, session_id='s', amount=1000, status='PENDING')
+        db.session.add(order)
+        db.session.flush()
+        return order.id
+    return create
+
+
+def available(db, producto_id, sucursal_id):
+    row = inventory.current_rows(db.session, [(producto_id, sucursal_id)])[(producto_id, sucursal_id)]
+    return row.stock - row.reservado
+
+
+def hold_statuses(db, orden_id):
+    return db.session.execute(select(catalog_queries.reservas_stock.c.status)
+                              .where(catalog_queries.reservas_stock.c.orden_id == orden_id)).scalars().all()
+
+
+def expire_holds(db, orden_id):
+    db.session.execute(update(catalog_queries.reservas_stock)
+                       .where(catalog_queries.reservas_stock.c.orden_id == orden_id)
+                       .values(expires_at=inventory.utcnow() - timedelta(seconds=1)))
+
+
+def test_reservation_holds_units_without_touching_stock(app_module, db, catalog, new_order):
+    martillo, centro = catalog['productos'][0], catalog['centro']
+    orden_id = new_order('A-1')
+
+    result = inventory.reserve_stock(db.session, orden_id, [(martillo, centro, 2), (martillo, centro, 1)], 900)
+    db.session.commit()
+
+    assert result['ok']
+    assert hold_statuses(db, orden_id) == ['ACTIVE']
+    assert available(db, martillo, centro) == 2
+    assert db.session.get(app_module.ProductoSucursal, 1).stock == 5
+    document = db.session.get(app_module.ProductoDisponibilidad, martillo)
+    assert document.disponible_total == 52
+
+
+def test_reservation_rejects_the_whole_cart_when_a_line_is_short(db, catalog, new_order):
+    martillo, sierra = catalog['productos'][0], catalog['productos'][2]
+    centro = catalog['centro']
+
+    result = inventory.reserve_stock(db.session, new_order('A-1'), [(martillo, centro, 1), (sierra, centro, 6), (sierra, 99, 1)], 900)
+
+    assert not result['ok']
+    assert result['insufficient'] == [{'producto_id': sierra, 'sucursal_id': centro, 'requested': 6, 'available': 5}]
+    assert result['missing'] == [{'producto_id': sierra, 'sucursal_id': 99, 'requested': 1}]
+
+
+def test_expired_reservation_stops_counting_and_is_swept(db, catalog, new_order):
+    martillo, centro = catalog['productos'][0], catalog['centro']
+    orden_id = new_order('A-1')
+    inventory.reserve_stock(db.session, orden_id, [(martillo, centro, 5)], 900)
+    db.session.commit()
+    assert not inventory.reserve_stock(db.session, new_order('A-2'), [(martillo, centro, 1)], 900)['ok']
+    db.session.rollback()
+
+    expire_holds(db, orden_id)
+    # Vencida pero sin barrer: ya no aparta unidades
+    assert available(db, martillo, centro) == 5
+    assert inventory.expire_reservations(db.session) == 1
+    assert inventory.expire_reservations(db.session) == 0
+    db.session.commit()
+
+    assert hold_statuses(db, orden_id) == ['EXPIRED']
+    assert inventory.reserve_stock(db.session, new_order('A-3'), [(martillo, centro, 5)], 900)['ok']
+
+
+def test_release_returns_units_once(db, catalog, new_order):
+    martillo, sierra, centro = catalog['productos'][0], catalog['productos'][2], catalog['centro']
+    orden_id = new_order('A-1')
+    inventory.reserve_stock(db.session, orden_id, [(martillo, centro, 3), (sierra, centro, 4)], 900)
+    db.session.commit()
+
+    assert inventory.release_reservations(db.session, [orden_id]) == 2
+    assert inventory.release_reservations(db.session, [orden_id]) == 0
+    db.session.commit()
+
+    assert hold_statuses(db, orden_id) == ['RELEASED', 'RELEASED']
+    assert available(db, martillo, centro) == 5
+    assert available(db, sierra, centro) == 1 + 4
+
+
+def test_contending_reservations_keep_the_first_holds_up_to_stock(db, catalog, new_order):
+    # Venta relámpago: 5 unidades y siete carros de 1 o 2; ganan los primeros hasta cubrir el stock
+    martillo, centro = catalog['productos'][0], catalog['centro']
+    results = []
+    for position, quantity in enumerate([2, 2, 2, 1, 1, 2, 1]):
+        result = inventory.reserve_stock(db.session, new_order(f'A-{position}'), [(martillo, centro, quantity)], 900)
+        if result['ok']:
+            db.session.commit()
+        else:
+            db.session.rollback()
+        results.append(result['ok'])
+
+    assert results == [True, True, False, True, False, False, False]
+    assert available(db, martillo, centro) == 0
+    held = db.session.execute(select(catalog_queries.reservas_stock.c.quantity)
+                              .where(catalog_queries.reservas_stock.c.status == 'ACTIVE')).scalars().all()
+    assert sum(held) == 5
+
+
+def test_reservation_lock_is_taken_per_stock_row_in_id_order():
+    sql = str(inventory.reservation_lock_stmt({12, 3}).compile(dialect=postgresql.dialect(),
+                                                                 compile_kwargs={'literal_binds': True}))
+
+    assert sql == 'SELECT pg_advisory_xact_lock(4, 3) AS pg_advisory_xact_lock_1, pg_advisory_xact_lock(4, 12) AS pg_advisory_xact_lock_2'
+
+
+def test_convert_takes_stock_for_held_and_expired_lines(db, catalog, new_order):
+    martillo, sierra, centro = catalog['productos'][0], catalog['productos'][2], catalog['centro']
+    paid, late = new_order('A-1'), new_order('A-2')
+    inventory.reserve_stock(db.session, paid, [(martillo, centro, 2)], 900)
+    inventory.reserve_stock(db.session, late, [(sierra, centro, 4)], 900)
+    db.session.commit()
+    expire_holds(db, late)
+    # Mientras tanto otra orden tomó parte del stock que liberó la reserva vencida
+    inventory.reserve_stock(db.session, new_order('A-3'), [(sierra, centro, 3)], 900)
+    db.session.commit()
+
+    result = inventory.convert_reservations(db.session, paid, [(martillo, centro, 2)])
+    assert [(item['producto_id'], item['stock']) for item in result['updated']] == [(martillo, 3)]
+    assert hold_statuses(db, paid) == ['CONVERTED']
+    assert available(db, martillo, centro) == 3
+
+    result = inventory.convert_reservations(db.session, late, [(sierra, centro, 4)])
+    assert result['updated'] == []
+    assert result['insufficient'] == [{'producto_id': sierra, 'sucursal_id': centro, 'requested': 4, 'available': 2}]
+    assert hold_statuses(db, late) == ['EXPIRED']
+
+
+def test_convert_never_leaves_negative_stock(app_module, db, catalog, new_order):
+    martillo, sierra, centro = catalog['productos'][0], catalog['productos'][2], catalog['centro']
+    orden_id = new_order('A-1')
+    inventory.reserve_stock(db.session, orden_id, [(martillo, centro, 4), (sierra, centro, 2)], 900)
+    db.session.commit()
+    # El stock se corrigió a mano por debajo de la reserva mientras estaba vigente
+    db.session.get(app_module.ProductoSucursal, 1).stock = 1
+    db.session.commit()
+
+    result = inventory.convert_reservations(db.session, orden_id, [(martillo, centro, 4), (sierra, centro, 2)])
+    db.session.commit()
+
+    assert [(item['producto_id'], item['stock']) for item in result['updated']] == [(sierra, 3)]
+    assert result['insufficient'] == [{'producto_id': martillo, 'sucursal_id': centro, 'requested': 4, 'available': 1}]
+    assert db.session.get(app_module.ProductoSucursal, 1).stock == 1
+    assert sorted(hold_statuses(db, orden_id)) == ['CONVERTED', 'RELEASED']
+
+
+def test_availability_document_is_refreshed_after_commit(app_module, db, catalog, new_order):
+    martillo, centro = catalog['productos'][0], catalog['centro']
+
+    def disponible_total():
+        with db.engine.connect() as connection:
+            return availability.load_documents(connection, [martillo])[martillo]['disponible_total']
+
+    inventory.reserve_stock(db.session, new_order('A-1'), [(martillo, centro, 2)], 900)
+    # El checkout no escribe el documento: se recalcula recién tras confirmar
+    assert db.session.info['availability_deferred'] == {martillo}
+    assert disponible_total() == 55
+    db.session.commit()
+    assert disponible_total() == 53
+
+    inventory.reserve_stock(db.session, new_order('A-2'), [(martillo, centro, 1)], 900)
+    db.session.rollback()
+    assert 'availability_deferred' not in db.session.info
+    assert disponible_total() == 53
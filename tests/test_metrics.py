@@ -0,0 +1,91 @@
+# Archivo: tests/test_metrics.py
+# /metrics de metrics.py leído con el parser de prometheus_client: un proceso (la app de pruebas)
+# y varios workers reales con PROMETHEUS_MULTIPROC_DIR, uno de ellos ya terminado.
+import os
+import subprocess
+import sys
+
+import pytest
+from prometheus_client.parser import text_string_to_metric_families
+
+from conftest import ROOT_DIR
+
+# Maestro con dos workers (fork) que atienden peticiones; el primero termina y el maestro hace lo
+# mismo que gunicorn en child_exit. Imprime el /metrics que ve el worker que sigue vivo.
+WORKERS_SCRIPT = '''
+import multiprocessing, os, sys
+from prometheus_client import multiprocess
+import metrics
+
+@metrics.register_collector
+def collect():
+    return [('demo_subscribers', 'gauge', 'Suscriptores.', [({}, 2)]),
+            ('demo_published_total', 'counter', 'Publicados.', [({'kind': 'sse'}, 5)])]
+
+def serve(requests, ready, done, out):
+    for _ in range(requests):
+        metrics.HTTP_REQUEST_DURATION.labels(route='/api/productos', method='GET', status=200).observe(0.05)
+    metrics.render()
+    ready.set()
+    done.wait(10)
+    if out is not None:
+        out.send(metrics.render().decode('utf-8'))
+
+context = multiprocessing.get_context('fork')
+first_ready, first_done = context.Event(), context.Event()
+second_ready, second_done = context.Event(), context.Event()
+receiver, sender = context.Pipe(duplex=False)
+first = context.Process(target=serve, args=(3, first_ready, first_done, None))
+second = context.Process(target=serve, args=(2, second_ready, second_done, sender))
+first.start(); second.start()
+assert first_ready.wait(10) and second_ready.wait(10)
+first_done.set(); first.join(10)
+multiprocess.mark_process_dead(first.pid)
+second_done.set()
+sys.stdout.write(receiver.recv())
+second.join(10)
+'''
+
+
+def families(text):
+    return {family.name: family for family in text_string_to_metric_families(text)}
+
+
+def samples(family, name):
+    return [(sample.labels, sample.value) for sample in family.samples if sample.name == name]
+
+
+def test_metrics_endpoint_is_valid_exposition(app_module, db):
+    http = app_module.app.test_client()
+    http.get('/api/grpc/status')
+
+    response = http.get('/metrics')
+
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain; version=0.0.4')
+    parsed = families(response.get_data(as_text=True))
+    counts = samples(parsed['ferremas_http_request_duration_seconds'], 'ferremas_http_request_duration_seconds_count')
+    assert any(labels['route'] == '/api/grpc/status' and value >= 1 for labels, value in counts)
+    assert parsed['ferremas_sse_subscribers'].type == 'gauge'
+    assert parsed['ferremas_search_cache_lookups'].type == 'counter'
+    assert {labels['result'] for labels, _ in samples(parsed['ferremas_search_cache_lookups'], 'ferremas_search_cache_lookups_total')} == {'hit', 'miss'}
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='requiere fork')
+def test_workers_are_summed_and_a_dead_worker_keeps_only_its_counters(tmp_path):
+    env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(tmp_path), PYTHONPATH=os.path.join(ROOT_DIR, 'backend'))
+    result = subprocess.run([sys.executable, '-c', WORKERS_SCRIPT], env=env, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+
+    parsed = families(result.stdout)
+
+    counts = samples(parsed['ferremas_http_request_duration_seconds'], 'ferremas_http_request_duration_seconds_count')
+    assert counts == [({'route': '/api/productos', 'method': 'GET', 'status': '200'}, 5.0)]
+    buckets = dict((labels['le'], value) for labels, value in
+                   samples(parsed['ferremas_http_request_duration_seconds'], 'ferremas_http_request_duration_seconds_bucket'))
+    assert (buckets['0.025'], buckets['0.05'], buckets['+Inf']) == (0.0, 5.0, 5.0)
+    assert samples(parsed['demo_published'], 'demo_published_total') == [({'kind': 'sse'}, 10.0)]
+    # Solo el worker vivo sigue informando su gauge
+    subscribers = samples(parsed['demo_subscribers'], 'demo_subscribers')
+    assert [value for _, value in subscribers] == [2.0]
+    assert len(list(tmp_path.glob('gauge_liveall_*.db'))) == 1
@@ -0,0 +1,164 @@
+# Archivo: tests/test_payments.py
+# Trabajos de pago de app.py contra el Transbank falso de benchmarks/fake_transbank.py.
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import select, update
+
+import fake_transbank
+import inventory
+import payments
+
+
+@pytest.fixture
+def transbank(app_module, monkeypatch):
+    # Cliente apuntando al Transbank falso; registra si había transacción abierta en cada llamada
+    server, base_url = fake_transbank.serve_in_thread()
+    client = payments.WebpayClient(app_module.TRANSBANK_COMMERCE_CODE, app_module.TRANSBANK_API_KEY, base_url)
+    client.in_transaction = []
+    client.during_call = None
+    request = client._request
+
+    def spy(operation, *args, **kwargs):
+        client.in_transaction.append(app_module.db.session().in_transaction())
+        if client.during_call:
+            client.during_call()
+        return request(operation, *args, **kwargs)
+
+    monkeypatch.setattr(client, '_request', spy)
+    monkeypatch.setattr(app_module, 'webpay_client', client)
+    yield server.fake, client
+    server.shutdown()
+
+
+@pytest.fixture
+def pending_order(app_module, db, catalog):
+    def create(buy_order, quantity=2):
+        martillo, centro = catalog['productos'][0], catalog['centro']
+        order = app_module.Orden(buy_order=buy_order, session_id='s', amount=8500 * quantity, status='PENDING')
+        db.session.add(order)
+        db.session.flush()
+        db.session.add(app_module.OrderItem(orden_id=order.id, producto_id=martillo, sucursal_id=centro,
+                                            quantity=quantity, price_at_purchase=8500))
+        inventory.reserve_stock(db.session, order.id, [(martillo, centro, quantity)], 900)
+        job_id = app_module.enqueue_payment_job(order.id, payments.JOB_CREATE)
+        db.session.commit()
+        return order.id, job_id
+    return create
+
+
+def job_row(db, job_id):
+    db.session.rollback()
+    return db.session.execute(select(payments.pagos_outbox).where(payments.pagos_outbox.c.id == job_id)).first()
+
+
+def test_transbank_is_called_without_an_open_transaction(app_module, db, transbank, pending_order):
+    fake, client = transbank
+    orden_id, job_id = pending_order('P-1')
+
+    assert app_module.process_next_payment_job()
+    token = payments.job_result(job_row(db, job_id))['token']
+    assert db.session.get(app_module.Orden, orden_id).token_ws == token
+
+    commit_job = payments.enqueue_once(db.session, payments.new_job_values(orden_id, payments.JOB_COMMIT, token))
+    db.session.commit()
+    assert app_module.process_next_payment_job()
+
+    assert job_row(db, commit_job).status == payments.JOB_DONE
+    order = db.session.get(app_module.Orden, orden_id)
+    assert order.status == 'PAID'
+    assert order.authorization_code
+    assert fake.calls['create'] == 1 and fake.calls['commit'] == 1
+    assert client.in_transaction == [False, False]
+
+
+def test_result_is_discarded_when_the_lease_is_lost(app_module, db, transbank, pending_order):
+    fake, client = transbank
+    orden_id, job_id = pending_order('P-1')
+    other_lease = inventory.utcnow() + timedelta(seconds=600)
+
+    def reclaimed_by_other_worker():
+        with db.engine.begin() as connection:
+            connection.execute(update(payments.pagos_outbox).where(payments.pagos_outbox.c.id == job_id)
+                               .values(locked_until=other_lease))
+
+    client.during_call = reclaimed_by_other_worker
+    assert app_module.process_next_payment_job()
+
+    assert fake.calls['create'] == 1
+    job = job_row(db, job_id)
+    assert (job.status, job.locked_until, job.result) == (payments.JOB_PROCESSING, other_lease, None)
+    assert db.session.get(app_module.Orden, orden_id).token_ws is None
+
+
+def test_failed_call_reschedules_the_job(app_module, db, transbank, pending_order):
+    fake, client = transbank
+    fake.error_rate = 1.0
+    orden_id, job_id = pending_order('P-1')
+
+    assert app_module.process_next_payment_job()
+
+    job = job_row(db, job_id)
+    assert (job.status, job.attempts, job.locked_until) == (payments.JOB_PENDING, 1, None)
+    assert 'Transbank respondió 503' in job.last_error
+    assert db.session.get(app_module.Orden, orden_id).status == 'PENDING'
+
+
+@pytest.fixture
+def commit_route(app_module, db, transbank, pending_order, monkeypatch):
+    # Orden con transacción creada; /api/webpay/commit responde sin esperar al worker
+    monkeypatch.setattr(app_module, 'PAYMENT_COMMIT_WAIT', 0)
+    monkeypatch.setattr(app_module, 'commit_outcomes', payments.OutcomeCache())
+    orden_id, job_id = pending_order('P-1')
+    app_module.process_next_payment_job()
+    token = payments.job_result(job_row(db, job_id))['token']
+    db.session.rollback()
+    return app_module.app.test_client(), token
+
+
+def test_repeated_commit_renders_the_same_success(app_module, db, transbank, commit_route, monkeypatch):
+    fake, client = transbank
+    http, token = commit_route
+
+    assert http.get(f'/api/webpay/commit?token_ws={token}').status_code == 202
+    assert http.post('/api/webpay/commit', data={'token_ws': token}).status_code == 202
+    assert app_module.process_next_payment_job()
+    assert not app_module.process_next_payment_job()
+
+    first = http.get(f'/api/webpay/commit?token_ws={token}')
+    assert first.status_code == 200
+    assert '¡Pago exitoso!' in first.get_data(as_text=True)
+    assert 'P-1' in first.get_data(as_text=True)
+    repeated = http.post('/api/webpay/commit', data={'token_ws': token})
+    assert (repeated.status_code, repeated.data) == (200, first.data)
+    # Otro proceso, sin el resultado en memoria, responde desde el registro de la orden
+    monkeypatch.setattr(app_module, 'commit_outcomes', payments.OutcomeCache())
+    from_record = http.get(f'/api/webpay/commit?token_ws={token}')
+    assert (from_record.status_code, from_record.data) == (200, first.data)
+
+    assert fake.calls['commit'] == 1
+    assert db.session.get(app_module.ProductoSucursal, 1).stock == 3
+
+
+def test_rejected_payment_renders_failure(app_module, db, transbank, commit_route):
+    fake, client = transbank
+    fake.reject_rate = 1.0
+    http, token = commit_route
+
+    http.get(f'/api/webpay/commit?token_ws={token}')
+    app_module.process_next_payment_job()
+
+    for _ in range(2):
+        response = http.get(f'/api/webpay/commit?token_ws={token}')
+        assert response.status_code == 400
+        assert 'Pago fallido. Código de respuesta: -1.' in response.get_data(as_text=True)
+    assert fake.calls['commit'] == 1
+
+
+def test_commit_without_known_token_renders_failure(app_module, db):
+    http = app_module.app.test_client()
+
+    assert http.get('/api/webpay/commit').status_code == 400
+    response = http.get('/api/webpay/commit?token_ws=desconocido')
+    assert response.status_code == 404
+    assert 'Orden no encontrada' in response.get_data(as_text=True)
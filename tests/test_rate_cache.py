@@ -0,0 +1,137 @@
+# Archivo: tests/test_rate_cache.py
+# RateCache contra el proveedor falso de benchmarks/fake_exchange_rate.py.
+import threading
+import time
+
+import pytest
+
+import fake_exchange_rate
+import rate_cache
+
+
+@pytest.fixture
+def upstream():
+    servers = []
+
+    def start(**options):
+        server, url = fake_exchange_rate.serve_in_thread(**options)
+        servers.append(server)
+        return server.fake, url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+
+
+def make_cache(tmp_path, url, **options):
+    # Sin reintentos HTTP: cada refresco es una sola llamada al proveedor
+    return rate_cache.RateCache(url, store_path=str(tmp_path / 'rates.json'),
+                                session=rate_cache.build_session(retries=0), **options)
+
+
+def test_concurrent_misses_call_upstream_once(tmp_path, upstream):
+    fake, url = upstream(latency_ms=200)
+    cache = make_cache(tmp_path, url)
+    results = []
+
+    def worker():
+        entry, stale = cache.get()
+        results.append((entry['conversion_rates']['USD'], stale))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [(fake.rates['USD'], False)] * 8
+    assert fake.calls['latest'] == 1
+
+
+def test_second_cache_reuses_shared_store(tmp_path, upstream):
+    fake, url = upstream()
+    make_cache(tmp_path, url).get()
+    entry, stale = make_cache(tmp_path, url).get() # otro proceso: mismo archivo
+
+    assert not stale
+    assert entry['conversion_rates']['USD'] == fake.rates['USD']
+    assert fake.calls['latest'] == 1
+
+
+def test_stale_entry_is_served_while_refreshing(tmp_path, upstream):
+    fake, url = upstream(latency_ms=300)
+    cache = make_cache(tmp_path, url, ttl=60)
+    first, _ = cache.get()
+    cache._save(dict(first, fetched_at=first['fetched_at'] - 120)) # venció hace un minuto
+
+    started = time.perf_counter()
+    entry, stale = cache.get()
+    again, stale_again = cache.get()
+    elapsed = time.perf_counter() - started
+
+    assert stale and stale_again
+    assert entry['fetched_at'] == again['fetched_at'] == first['fetched_at'] - 120
+    assert elapsed < 0.2 # no esperó al proveedor
+
+    deadline = time.monotonic() + 5
+    while cache._load()['fetched_at'] < first['fetched_at'] and time.monotonic() < deadline:
+        time.sleep(0.02)
+    entry, stale = cache.get()
+    assert not stale
+    assert entry['fetched_at'] >= first['fetched_at']
+    assert fake.calls['latest'] == 2 # un solo refresco en segundo plano para ambas lecturas
+
+
+def test_failures_back_off_before_calling_upstream_again(tmp_path, upstream):
+    fake, url = upstream(error_rate=1.0)
+    cache = make_cache(tmp_path, url)
+    assert cache.error_backoff == 30
+
+    with pytest.raises(rate_cache.RateUnavailable):
+        cache.get()
+    with pytest.raises(rate_cache.RateUnavailable):
+        cache.get()
+    assert fake.calls['errors'] == 1 # el segundo intento no llegó al proveedor
+
+    fake.error_rate = 0.0
+    with pytest.raises(rate_cache.RateUnavailable):
+        cache.get()
+    cache._last_failure -= 31 # pasaron los 30 s de espera
+    entry, stale = cache.get()
+
+    assert not stale
+    assert entry['conversion_rates']['USD'] == fake.rates['USD']
+    assert fake.calls == {'latest': 1, 'errors': 1}
+
+
+def test_scheduler_renews_the_table_before_it_expires(tmp_path, upstream):
+    fake, url = upstream()
+    cache = make_cache(tmp_path, url, ttl=1.0, refresh_interval=0.4)
+    try:
+        first, _ = cache.get()
+        time.sleep(1.5) # sin peticiones: solo el hilo programado llama al proveedor
+        entry, stale = cache.get()
+    finally:
+        cache.stop_scheduler()
+
+    assert not stale
+    assert entry['fetched_at'] > first['fetched_at']
+    assert fake.calls['latest'] >= 2
+
+
+def test_converted_responses_report_the_rate_table_age(app_module, db, catalog, tmp_path, upstream, monkeypatch):
+    fake, url = upstream()
+    cache = make_cache(tmp_path, url)
+    entry, _ = cache.get()
+    cache._save(dict(entry, fetched_at=entry['fetched_at'] - 90))
+    monkeypatch.setattr(app_module, 'exchange_rate_cache', cache)
+    http = app_module.app.test_client()
+
+    for _ in range(2): # la segunda búsqueda sale de la caché de resultados
+        response = http.get('/api/productos/buscar?q=martillo&currency=USD')
+        assert response.headers['X-Currency'] == 'USD'
+        assert response.headers['X-Currency-Rate-Date'].endswith(' GMT')
+        assert 90 <= int(response.headers['X-Currency-Rate-Age']) < 100
+
+    response = http.get(f"/api/sucursales/{catalog['centro']}/inventario")
+    assert 'X-Currency-Rate-Age' not in response.headers
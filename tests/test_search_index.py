@@ -0,0 +1,67 @@
+# Archivo: tests/test_search_index.py
+# Tope de coincidencias de search_index: siempre las mejores por (score desc, id) y páginas estables.
+import re
+
+import catalog_queries
+import search_index
+
+
+def build_index(count):
+    # "taladro" en el nombre pesa más que en la descripción; los mejores quedan al final por id
+    index = search_index.InvertedIndex()
+    for doc_id in range(1, count + 1):
+        if doc_id > count - 3:
+            index.add(doc_id, {'nombre': f'Taladro {doc_id}', 'marca': 'Bosch', 'description': ''})
+        else:
+            index.add(doc_id, {'nombre': f'Accesorio {doc_id}', 'marca': 'Gen', 'description': 'para taladro'})
+    return index
+
+
+def walk(index, query, limit, max_candidates):
+    pages, after = [], None
+    while True:
+        ranked = index.search(query, limit + 1, after=after, max_candidates=max_candidates)
+        page = ranked[:limit]
+        pages.append([doc_id for _, doc_id in page])
+        if len(ranked) <= limit:
+            return pages
+        after = page[-1]
+
+
+def test_cap_keeps_the_best_matches_and_pages_over_the_same_set():
+    index = build_index(30)
+    uncapped = [doc_id for _, doc_id in index.search('taladro', 100)]
+
+    pages = walk(index, 'taladro', limit=4, max_candidates=10)
+    seen = [doc_id for page in pages for doc_id in page]
+
+    assert uncapped[:3] == [28, 29, 30]
+    assert seen == uncapped[:10]
+    assert len(set(seen)) == len(seen)
+
+
+def test_cap_never_hides_rows_of_a_page_larger_than_the_cap():
+    index = build_index(30)
+
+    assert len(index.search('taladro', 25, max_candidates=10)) == 25
+
+
+def test_postgres_candidates_are_ordered_before_the_cap():
+    sql = ' '.join(search_index.POSTGRES_SEARCH_SQL.text.split())
+    candidates = re.search(r'WITH candidates AS \((.*?)\) SELECT', sql).group(1).strip()
+
+    assert candidates.endswith('ORDER BY score DESC, p.id LIMIT :max_candidates')
+
+
+def test_like_search_treats_wildcards_literally(app_module, db):
+    for nombre in ('Descuento 50%', 'Descuento 500', 'Tubo a_b', 'Tubo axb', 'Ruta C:\\x'):
+        db.session.add(app_module.Producto(nombre=nombre, marca='X', price=1000))
+    db.session.commit()
+
+    def names(query):
+        ids = db.session.execute(catalog_queries.like_search_stmt(query, 10)).scalars().all()
+        return [db.session.get(app_module.Producto, id).nombre for id in ids]
+
+    assert names('50%') == ['Descuento 50%']
+    assert names('a_b') == ['Tubo a_b']
+    assert names('c:\\') == ['Ruta C:\\x']
@@ -0,0 +1,86 @@
+# Archivo: tests/test_sse_broadcaster.py
+# Reenvío desde Last-Event-ID de sse_broadcaster.Broadcaster (sin relay entre procesos).
+import json
+
+import sse_broadcaster
+
+
+def publish_many(broadcaster, count, start=0):
+    return [broadcaster.publish({'n': n}, event='low_stock_alert')['id'] for n in range(start, start + count)]
+
+
+def read_events(broadcaster, subscriber):
+    # Primer bloque de eventos del stream (tras la línea retry:), como lo recibe el cliente
+    stream = broadcaster.stream(subscriber)
+    assert next(stream).startswith('retry:')
+    chunk = next(stream)
+    stream.close()
+    events = []
+    for block in chunk.strip().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.splitlines())
+        events.append((fields.get('event'), int(fields['id']), json.loads(fields['data'])))
+    return events
+
+
+def test_reconnect_with_a_large_backlog_is_capped_with_a_reset():
+    broadcaster = sse_broadcaster.Broadcaster(max_pending=100, replay_size=1000, keepalive_interval=0.01)
+    cursor = publish_many(broadcaster, 1)[0]
+    ids = publish_many(broadcaster, 150, start=1)
+
+    subscriber = broadcaster.subscribe(cursor)
+    events = read_events(broadcaster, subscriber)
+
+    assert not subscriber.evicted
+    assert len(events) == 100
+    assert events[0][:2] == (sse_broadcaster.RESET_EVENT, ids[50])
+    assert [event_id for _, event_id, _ in events[1:]] == ids[51:]
+    assert broadcaster.stats()['evicted'] == 0 and broadcaster.stats()['replay_resets'] == 1
+
+    # Reconectar con el id del reset no vuelve a truncar: ya no queda nada pendiente
+    again = broadcaster.subscribe(ids[50])
+    assert len(again.take(0)) == 99
+    assert broadcaster.stats()['replay_resets'] == 1
+
+
+def test_small_backlog_is_replayed_without_reset():
+    broadcaster = sse_broadcaster.Broadcaster(max_pending=100, keepalive_interval=0.01)
+    cursor = publish_many(broadcaster, 1)[0]
+    ids = publish_many(broadcaster, 100, start=1)
+
+    events = read_events(broadcaster, broadcaster.subscribe(cursor))
+
+    assert [event_id for _, event_id, _ in events] == ids
+    assert all(event == 'low_stock_alert' for event, _, _ in events)
+
+
+def test_cursor_older_than_the_ring_gets_a_reset():
+    broadcaster = sse_broadcaster.Broadcaster(max_pending=100, replay_size=10, keepalive_interval=0.01)
+    cursor = publish_many(broadcaster, 1)[0]
+    ids = publish_many(broadcaster, 20, start=1)
+
+    events = read_events(broadcaster, broadcaster.subscribe(cursor))
+
+    assert events[0][:2] == (sse_broadcaster.RESET_EVENT, ids[9])
+    assert [event_id for _, event_id, _ in events[1:]] == ids[10:]
+
+
+def test_replay_coalesces_by_key_before_capping():
+    broadcaster = sse_broadcaster.Broadcaster(max_pending=3, keepalive_interval=0.01)
+    cursor = publish_many(broadcaster, 1)[0]
+    for round_ in range(50):
+        for product in (1, 2):
+            broadcaster.publish({'product': product, 'round': round_}, event='low_stock_alert', key=(product, 1))
+
+    events = read_events(broadcaster, broadcaster.subscribe(cursor))
+
+    assert [data for _, _, data in events] == [{'product': 1, 'round': 49}, {'product': 2, 'round': 49}]
+
+
+def test_live_slow_subscriber_is_still_evicted():
+    broadcaster = sse_broadcaster.Broadcaster(max_pending=5)
+    subscriber = broadcaster.subscribe()
+
+    publish_many(broadcaster, 6)
+
+    assert subscriber.evicted
+    assert broadcaster.stats()['evicted'] == 1